@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Libro, Prestamo, Multa, HistorialMovimiento, ConfiguracionSistema
+from .models import (
+    Libro, Alumno, Prestamo, Multa, HistorialMovimiento, HistorialArchivado, ResumenMovimientos,
+    ConfiguracionSistema,
+)
 
 @admin.register(Libro)
 class LibroAdmin(admin.ModelAdmin):
@@ -29,11 +32,31 @@ class LibroAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(Alumno)
+class AlumnoAdmin(admin.ModelAdmin):
+    list_display = ['matricula', 'nombre', 'grado', 'grupo', 'prestamos_activos', 'multas_pendientes', 'saldo_pendiente']
+    list_filter = ['grado', 'grupo']
+    search_fields = ['matricula', 'nombre']
+    list_per_page = 30
+    readonly_fields = ['prestamos_activos', 'multas_pendientes', 'saldo_pendiente', 'total_pagado', 'total_condonado']
+    
+    fieldsets = (
+        ('Datos del Alumno', {
+            'fields': ('matricula', 'nombre', 'grado', 'grupo', 'telefono')
+        }),
+        ('Contadores', {
+            'fields': ('prestamos_activos', 'multas_pendientes', 'saldo_pendiente', 'total_pagado', 'total_condonado')
+        }),
+    )
+
+
 @admin.register(Prestamo)
 class PrestamoAdmin(admin.ModelAdmin):
-    list_display = ['libro', 'alumno_nombre', 'alumno_matricula', 'fecha_prestamo', 'fecha_vencimiento', 'estado', 'activo']
+    list_display = ['libro', 'alumno', 'fecha_prestamo', 'fecha_vencimiento', 'estado', 'activo']
     list_filter = ['estado', 'activo', 'fecha_prestamo', 'fecha_vencimiento']
-    search_fields = ['alumno_nombre', 'alumno_matricula', 'libro__titulo']
+    search_fields = ['alumno__nombre', 'alumno__matricula', 'libro__titulo']
+    list_select_related = ['libro', 'alumno']
+    raw_id_fields = ['libro', 'alumno']
     date_hierarchy = 'fecha_prestamo'
     list_per_page = 20
     
@@ -42,7 +65,7 @@ class PrestamoAdmin(admin.ModelAdmin):
             'fields': ('libro',)
         }),
         ('Información del Alumno', {
-            'fields': ('alumno_nombre', 'alumno_matricula', 'alumno_grado', 'alumno_grupo', 'alumno_telefono')
+            'fields': ('alumno',)
         }),
         ('Fechas', {
             'fields': ('fecha_prestamo', 'fecha_vencimiento', 'fecha_devolucion_real')
@@ -64,18 +87,21 @@ class PrestamoAdmin(admin.ModelAdmin):
 
 @admin.register(Multa)
 class MultaAdmin(admin.ModelAdmin):
-    list_display = ['id', 'alumno_nombre', 'tipo', 'monto', 'estado', 'fecha_multa']
+    list_display = ['id', 'alumno', 'tipo', 'monto', 'estado', 'fecha_multa']
     list_filter = ['tipo', 'estado', 'fecha_multa']
-    search_fields = ['alumno_nombre', 'alumno_matricula', 'descripcion']
+    search_fields = ['alumno__nombre', 'alumno__matricula', 'descripcion']
+    list_select_related = ['alumno']
+    raw_id_fields = ['alumno', 'prestamo', 'libro']
     date_hierarchy = 'fecha_multa'
     list_per_page = 20
 
 
 @admin.register(HistorialMovimiento)
 class HistorialMovimientoAdmin(admin.ModelAdmin):
-    list_display = ['tipo', 'fecha', 'libro', 'alumno_nombre', 'usuario_responsable']
+    list_display = ['tipo', 'fecha', 'libro', 'alumno', 'usuario_responsable']
     list_filter = ['tipo', 'fecha']
-    search_fields = ['descripcion', 'alumno_nombre', 'usuario_responsable']
+    search_fields = ['descripcion', 'alumno__nombre', 'usuario_responsable']
+    list_select_related = ['libro', 'alumno']
     date_hierarchy = 'fecha'
     list_per_page = 30
     
@@ -86,6 +112,37 @@ class HistorialMovimientoAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(HistorialArchivado)
+class HistorialArchivadoAdmin(admin.ModelAdmin):
+    # Tabla fría: sin date_hierarchy ni conteo total, que la recorrerían completa
+    list_display = ['tipo', 'fecha', 'libro', 'alumno', 'usuario_responsable']
+    list_filter = ['tipo']
+    search_fields = ['descripcion', 'usuario_responsable']
+    list_select_related = ['libro', 'alumno']
+    show_full_result_count = False
+    list_per_page = 30
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumenMovimientos)
+class ResumenMovimientosAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'tipo', 'total']
+    list_filter = ['tipo']
+    date_hierarchy = 'fecha'
+    list_per_page = 50
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ConfiguracionSistema)
 class ConfiguracionSistemaAdmin(admin.ModelAdmin):
     fieldsets = (
@@ -0,0 +1,143 @@
+# app1/alumnos.py
+"""
+Alumnos y sus contadores de préstamos y multas.
+
+Cada ``Alumno`` guarda cuántos préstamos activos tiene, cuántas multas tiene
+pendientes y los importes pendiente, pagado y condonado. Las señales de
+Prestamo y Multa los ajustan con ``UPDATE ... SET campo = campo + delta``
+dentro de la misma transacción que el préstamo o la multa, así que revisar
+si un alumno puede llevarse otro libro es una lectura por llave primaria.
+``reconciliar()`` los recalcula desde las tablas (comando
+``reconciliar_estadisticas``).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Alumno, Prestamo, Multa
+
+# Importe de la multa según su estado
+CAMPO_POR_ESTADO = {
+    'pendiente': 'saldo_pendiente',
+    'pagada': 'total_pagado',
+    'condonada': 'total_condonado',
+}
+CAMPOS_PRESTAMO = ['activo', 'alumno_id']
+CAMPOS_MULTA = ['estado', 'monto', 'alumno_id']
+CONTADORES = ['prestamos_activos', 'multas_pendientes', 'saldo_pendiente', 'total_pagado', 'total_condonado']
+
+
+def registrar(matricula, nombre, bloquear=False, **datos):
+    """
+    Devuelve el alumno con esa matrícula (una lectura por llave primaria),
+    creándolo o actualizando sus datos si cambiaron.
+
+    Con ``bloquear`` la fila queda bloqueada (``SELECT ... FOR UPDATE``) hasta
+    el final de la transacción, para revisar sus contadores sin carreras.
+    """
+    datos['nombre'] = nombre
+    consulta = Alumno.objects.select_for_update() if bloquear else Alumno.objects
+    alumno, creado = consulta.get_or_create(matricula=matricula, defaults=datos)
+    if not creado:
+        cambios = [campo for campo, valor in datos.items() if valor and getattr(alumno, campo) != valor]
+        if cambios:
+            for campo in cambios:
+                setattr(alumno, campo, datos[campo])
+            alumno.save(update_fields=cambios + ['actualizado_en'])
+    return alumno
+
+
+def ajustar(matricula, cambios):
+    """Suma (o resta) a los contadores del alumno el valor indicado en ``cambios``."""
+    cambios = {campo: delta for campo, delta in cambios.items() if delta}
+    if not cambios or matricula is None:
+        return
+    Alumno.objects.filter(matricula=matricula).update(
+        actualizado_en=timezone.now(),
+        **{campo: F(campo) + delta for campo, delta in cambios.items()}
+    )
+
+
+def _registrar_cambio(anterior, nuevo, aporte):
+    por_alumno = defaultdict(lambda: defaultdict(int))
+    for datos, signo in ((anterior, -1), (nuevo, 1)):
+        if not datos:
+            continue
+        for campo, delta in aporte(datos, signo).items():
+            por_alumno[datos['alumno_id']][campo] += delta
+    for matricula, cambios in por_alumno.items():
+        ajustar(matricula, cambios)
+
+
+def _aporte_prestamo(datos, signo):
+    return {'prestamos_activos': signo} if datos['activo'] else {}
+
+
+def _aporte_multa(datos, signo):
+    """Lo que una multa suma (signo 1) o resta (signo -1) a los contadores del alumno."""
+    cambios = {}
+    campo = CAMPO_POR_ESTADO.get(datos['estado'])
+    if campo:
+        cambios[campo] = signo * Decimal(str(datos['monto'] or 0))
+    if datos['estado'] == 'pendiente':
+        cambios['multas_pendientes'] = signo
+    return cambios
+
+
+def registrar_prestamo(anterior, nuevo):
+    """
+    Ajusta los contadores por el cambio de un préstamo. ``anterior`` y
+    ``nuevo`` son diccionarios con ``CAMPOS_PRESTAMO`` (None al crear o eliminar).
+    """
+    _registrar_cambio(anterior, nuevo, _aporte_prestamo)
+
+
+def registrar_multa(anterior, nuevo):
+    """Igual que ``registrar_prestamo`` para una multa (``CAMPOS_MULTA``)."""
+    _registrar_cambio(anterior, nuevo, _aporte_multa)
+
+
+def calcular():
+    """Calcula los contadores de los alumnos con préstamos o multas directamente sobre las tablas."""
+    cero = Decimal('0.00')
+    contadores = defaultdict(lambda: {
+        'prestamos_activos': 0,
+        'multas_pendientes': 0,
+        'saldo_pendiente': cero,
+        'total_pagado': cero,
+        'total_condonado': cero,
+    })
+    activos = Prestamo.objects.filter(activo=True).order_by().values('alumno').annotate(total=Count('id'))
+    for fila in activos:
+        contadores[fila['alumno']]['prestamos_activos'] = fila['total']
+    multas = Multa.objects.order_by().values('alumno').annotate(
+        multas_pendientes=Count('id', filter=Q(estado='pendiente')),
+        saldo_pendiente=Sum('monto', filter=Q(estado='pendiente'), default=cero),
+        total_pagado=Sum('monto', filter=Q(estado='pagada'), default=cero),
+        total_condonado=Sum('monto', filter=Q(estado='condonada'), default=cero),
+    )
+    for fila in multas:
+        matricula = fila.pop('alumno')
+        contadores[matricula].update(fila)
+    return contadores
+
+
+@transaction.atomic
+def reconciliar():
+    """
+    Sobrescribe los contadores con los valores reales. Devuelve las matrículas
+    corregidas. Como en ``estadisticas.reconciliar``, se bloquea antes de contar.
+    """
+    actuales_por_alumno = list(Alumno.objects.select_for_update().values_list('matricula', *CONTADORES))
+    esperados = calcular()
+    cero = {campo: 0 for campo in CONTADORES}
+    corregidas = []
+    for matricula, *actuales in actuales_por_alumno:
+        esperado = esperados.get(matricula, cero)
+        if actuales != [esperado[campo] for campo in CONTADORES]:
+            Alumno.objects.filter(pk=matricula).update(**esperado)
+            corregidas.append(matricula)
+    return corregidas
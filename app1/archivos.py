@@ -0,0 +1,242 @@
+# app1/archivos.py
+"""
+Archivos estáticos y de media servidos por Django (despliegue solo con gunicorn).
+
+``collectstatic`` guarda cada archivo con el hash de su contenido en el
+nombre (``style.3f2a9c1b0d4e.css``, ver ``ManifestComprimido``) y deja junto
+a él las variantes ``.gz`` y ``.br`` precomprimidas. ``servir`` entrega el
+archivo con:
+
+* ``Cache-Control: immutable`` de un año cuando el nombre lleva hash (los
+  estáticos del manifiesto y las portadas, ver ``portadas``); si el
+  contenido cambia, cambia la URL. Los demás se revalidan.
+* ``ETag``/``Last-Modified`` para responder 304 a ``If-None-Match`` e
+  ``If-Modified-Since`` sin mandar el cuerpo.
+* La variante comprimida que acepte el navegador (``Accept-Encoding``).
+* ``Range`` de un solo intervalo (206/416), sin comprimir.
+
+El cuerpo completo va en un ``FileResponse``, que gunicorn entrega con
+``sendfile``.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:  # Brotli es opcional: sin él solo se genera .gz
+    brotli = None
+
+UN_ANIO = 365 * 24 * 60 * 60
+REVALIDAR = 'public, max-age=0, must-revalidate'
+INMUTABLE = f'public, max-age={UN_ANIO}, immutable'
+
+# Extensiones que vale la pena comprimir (las imágenes ya vienen comprimidas)
+COMPRIMIBLES = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot'}
+# Solo se guarda la variante si ahorra al menos esta fracción
+AHORRO_MINIMO = 0.05
+
+# (Content-Encoding, extensión) en orden de preferencia
+CODIFICACIONES = [('br', '.br'), ('gzip', '.gz')]
+
+# Carpetas de MEDIA_ROOT que se sirven públicamente (los reportes van por su vista)
+MEDIA_PUBLICO = ('portadas/',)
+
+# nombre.<12 hex>.ext del manifiesto, o <sha256>.ext / <sha256>-80.webp de las portadas
+_NOMBRE_CON_HASH = re.compile(r'(\.[0-9a-f]{12}\.[^/]+|(^|/)[0-9a-f]{64}(-\d+)?\.[^/.]+)$')
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+class ManifestComprimido(ManifestStaticFilesStorage):
+    """Manifiesto con hash en el nombre más variantes .gz y .br precomprimidas"""
+
+    # Sin collectstatic (checkout nuevo, pruebas) las páginas se renderizan
+    # igual: lo que no está en el manifiesto se enlaza con su nombre original
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Tampoco está en STATIC_ROOT, así que no hay de dónde sacar el hash
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        procesados = set()
+        for nombre, nombre_hash, procesado in super().post_process(paths, dry_run, **options):
+            if not isinstance(procesado, Exception):
+                procesados.add(nombre)
+                if nombre_hash:
+                    procesados.add(nombre_hash)
+            yield nombre, nombre_hash, procesado
+        if dry_run:
+            return
+        for nombre in sorted(procesados):
+            if os.path.splitext(nombre)[1].lower() in COMPRIMIBLES:
+                self.comprimir(nombre)
+
+    def comprimir(self, nombre):
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        variantes = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(contenido)
+        for extension, comprimido in variantes.items():
+            if len(comprimido) <= len(contenido) * (1 - AHORRO_MINIMO):
+                with open(ruta + extension, 'wb') as archivo:
+                    archivo.write(comprimido)
+
+
+def es_inmutable(ruta):
+    return bool(_NOMBRE_CON_HASH.search(ruta))
+
+
+def _codificaciones_aceptadas(cabecera):
+    aceptadas = set()
+    for parte in cabecera.split(','):
+        token, _, parametros = parte.strip().partition(';')
+        calidad = parametros.strip()
+        if calidad.startswith('q='):
+            try:
+                if float(calidad[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        aceptadas.add(token.strip().lower())
+    return aceptadas
+
+
+def _rango(cabecera, tamano):
+    """
+    Intervalo ``(inicio, fin)`` inclusivo pedido en ``Range``. Devuelve
+    ``None`` si la cabecera no aplica (varios intervalos, sintaxis
+    desconocida: se manda el archivo completo) y ``False`` si no se puede
+    satisfacer (416).
+    """
+    coincidencia = _RANGO.match(cabecera.strip())
+    if coincidencia is None:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        if not fin:
+            return None
+        sufijo = int(fin)
+        if sufijo == 0 or tamano == 0:
+            return False
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(inicio)
+    if fin and int(fin) < inicio:
+        return None
+    if inicio >= tamano:
+        return False
+    return inicio, min(int(fin), tamano - 1) if fin else tamano - 1
+
+
+def _leer_intervalo(ruta, inicio, longitud):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while longitud > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, longitud))
+            if not bloque:
+                break
+            longitud -= len(bloque)
+            yield bloque
+
+
+def servir(request, ruta, raiz):
+    """Entrega ``raiz/ruta`` con caché, validación condicional, compresión y rangos"""
+    try:
+        completa = safe_join(raiz, ruta)
+    except SuspiciousFileOperation:
+        raise Http404('Archivo no encontrado')
+    if not os.path.isfile(completa):
+        raise Http404('Archivo no encontrado')
+
+    content_type = mimetypes.guess_type(completa)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+        content_type += '; charset=utf-8'
+
+    # Con Range se usa siempre el archivo sin comprimir: los bytes pedidos son de él
+    variante, codificacion = completa, None
+    rango_pedido = request.headers.get('Range')
+    if not rango_pedido:
+        aceptadas = _codificaciones_aceptadas(request.headers.get('Accept-Encoding', ''))
+        for nombre, extension in CODIFICACIONES:
+            if nombre in aceptadas and os.path.isfile(completa + extension):
+                variante, codificacion = completa + extension, nombre
+                break
+
+    estado = os.stat(variante)
+    etag = f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+    cabeceras = {
+        'ETag': etag,
+        'Last-Modified': http_date(int(estado.st_mtime)),
+        'Cache-Control': INMUTABLE if es_inmutable(ruta) else REVALIDAR,
+        'Vary': 'Accept-Encoding',
+        'Accept-Ranges': 'bytes',
+    }
+
+    no_modificado = get_conditional_response(request, etag=etag, last_modified=int(estado.st_mtime))
+    if no_modificado is not None:
+        for cabecera, valor in cabeceras.items():
+            no_modificado[cabecera] = valor
+        return no_modificado
+
+    rango = None
+    if rango_pedido:
+        # If-Range: si el archivo cambió desde que se pidió la primera parte, va completo
+        si_rango = request.headers.get('If-Range')
+        if si_rango is None or si_rango == etag:
+            rango = _rango(rango_pedido, estado.st_size)
+
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{estado.st_size}'
+    elif rango is not None:
+        inicio, fin = rango
+        longitud = fin - inicio + 1
+        response = StreamingHttpResponse(
+            _leer_intervalo(variante, inicio, longitud), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{estado.st_size}'
+        response['Content-Length'] = str(longitud)
+    else:
+        response = FileResponse(
+            open(variante, 'rb'), filename=os.path.basename(completa), content_type=content_type
+        )
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+    for cabecera, valor in cabeceras.items():
+        response[cabecera] = valor
+    return response
+
+
+@require_safe
+def servir_estatico(request, ruta):
+    """Archivos de STATIC_ROOT (los que deja ``collectstatic``)"""
+    return servir(request, ruta, settings.STATIC_ROOT)
+
+
+@require_safe
+def servir_media(request, ruta):
+    """Portadas y miniaturas de MEDIA_ROOT"""
+    # Se normaliza antes de comparar: 'portadas/../reportes/x' sigue dentro de
+    # MEDIA_ROOT (safe_join no lo rechaza) pero no es público
+    ruta = posixpath.normpath(ruta)
+    if not ruta.startswith(MEDIA_PUBLICO):
+        raise Http404('Archivo no encontrado')
+    return servir(request, ruta, settings.MEDIA_ROOT)
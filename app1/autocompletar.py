@@ -0,0 +1,62 @@
+# app1/autocompletar.py
+"""
+Opciones de los select con búsqueda (``forms.SelectAutocompletar``).
+
+En lugar de mandar todo el catálogo como ``<option>``, el formulario solo
+incluye la opción elegida y el navegador pide las demás a
+``api_autocompletar`` mientras se escribe. Cada búsqueda es una consulta
+con ``LIMIT``: los libros se buscan por prefijo en el índice FTS5 (ver
+``busqueda``) y los préstamos se recorren por el índice de fecha
+filtrando por su libro, la matrícula o el nombre del alumno.
+"""
+from django.db.models import Q
+
+from .models import Libro, Prestamo
+from . import busqueda
+
+MAX_RESULTADOS = 20
+MIN_CARACTERES = 2
+
+
+def buscar_libros(query, parametros):
+    libros = Libro.objects.only('id', 'titulo', 'autor')
+    if parametros.get('disponible') in ('1', 'true'):
+        libros = libros.filter(disponible=True)
+    libros = busqueda.buscar_libros(libros, query)
+    if not busqueda.ordena_por_relevancia():
+        libros = libros.order_by('titulo')
+    return libros
+
+
+def buscar_prestamos(query, parametros):
+    prestamos = (
+        Prestamo.objects.select_related('libro', 'alumno')
+        .only('id', 'libro__titulo', 'alumno__nombre')
+        .filter(
+            busqueda.q_libro(query) |
+            Q(alumno__matricula__startswith=query) |
+            Q(alumno__nombre__istartswith=query)
+        )
+        .order_by('-fecha_prestamo', '-id')
+    )
+    if parametros.get('activo') in ('1', 'true'):
+        prestamos = prestamos.filter(activo=True)
+    return prestamos
+
+
+BUSQUEDAS = {
+    'libros': buscar_libros,
+    'prestamos': buscar_prestamos,
+}
+
+
+def opciones(tipo, query, parametros):
+    """
+    Devuelve hasta ``MAX_RESULTADOS`` pares ``(id, texto)`` con el mismo
+    texto que muestra el select (``__str__`` del modelo).
+    """
+    query = (query or '').strip()
+    if len(query) < MIN_CARACTERES:
+        return []
+    resultados = BUSQUEDAS[tipo](query, parametros)[:MAX_RESULTADOS]
+    return [(objeto.pk, str(objeto)) for objeto in resultados]
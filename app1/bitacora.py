@@ -0,0 +1,180 @@
+# app1/bitacora.py
+"""
+Escritura diferida del historial de movimientos.
+
+``registrar`` no inserta en la transacción de la operación: al confirmarse
+(``transaction.on_commit``; si la transacción se revierte los movimientos se
+descartan con ella) los movimientos pasan a una cola del proceso y un hilo
+en segundo plano la vacía cada ``INTERVALO`` segundos, o antes si se juntan
+``MAX_COLA``, con un solo ``bulk_create`` por tanda. Así el préstamo o la
+devolución no paga el INSERT del historial ni alarga el bloqueo de
+escritura de SQLite.
+
+Si una tanda falla se vuelve a encolar y se reintenta en la siguiente
+vuelta. Al terminar el proceso (``atexit``; gunicorn sale así al reiniciar
+o detener un worker) lo que se registre desde ese momento se escribe en el
+acto y lo que quede en la cola se escribe esperando la tanda que el hilo
+tenga en curso; si la base de datos falla se reintenta
+``REINTENTOS_SALIDA`` veces con una conexión nueva y, si aun así no se
+puede, los movimientos quedan en el log con nivel ERROR.
+
+Lo que se puede perder: si el proceso muere sin pasar por ``atexit``
+(SIGKILL, el ``--timeout`` o ``--graceful-timeout`` de gunicorn vencido,
+falta de memoria) se pierden los movimientos confirmados que aún estaban
+en la cola, es decir, los de los últimos ``INTERVALO`` segundos como
+máximo (a lo más ``MAX_COLA`` más la tanda que se estuviera escribiendo).
+
+Con ``BITACORA_SINCRONA = True`` en settings (pruebas, scripts) se escribe
+en el momento, dentro de la misma transacción, también con un solo INSERT.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connections, transaction
+
+from .models import Libro, Prestamo, Alumno, HistorialMovimiento
+
+logger = logging.getLogger(__name__)
+
+INTERVALO = 1.0
+MAX_COLA = 500
+TAMANO_LOTE = 500
+REINTENTOS_SALIDA = 3
+PAUSA_REINTENTO = 0.5
+
+_cola = []
+_candado = threading.Lock()
+# Lo tiene quien está escribiendo tandas: al salir se espera a que termine
+_vaciando = threading.Lock()
+_saliendo = False
+_despertar = threading.Event()
+_hilo = None
+_pid = None
+
+
+def sincrona():
+    return getattr(settings, 'BITACORA_SINCRONA', False)
+
+
+def registrar(*movimientos):
+    """
+    Guarda ``movimientos`` (``HistorialMovimiento`` sin guardar) cuando se
+    confirme la transacción actual. Su fecha es la de creación del objeto,
+    no la de la escritura.
+    """
+    if not movimientos:
+        return
+    if sincrona() or _saliendo:
+        HistorialMovimiento.objects.bulk_create(movimientos)
+        return
+    transaction.on_commit(lambda: _encolar(movimientos))
+
+
+def _encolar(movimientos):
+    with _candado:
+        _cola.extend(movimientos)
+        llena = len(_cola) >= MAX_COLA
+    _iniciar_hilo()
+    if llena:
+        _despertar.set()
+
+
+def _iniciar_hilo():
+    global _hilo, _pid
+    # Después de un fork (gunicorn --preload) el hilo del padre no existe en el hijo
+    if _hilo is not None and _hilo.is_alive() and _pid == os.getpid():
+        return
+    with _candado:
+        if _hilo is not None and _hilo.is_alive() and _pid == os.getpid():
+            return
+        _pid = os.getpid()
+        _hilo = threading.Thread(target=_trabajar, name='bitacora', daemon=True)
+        _hilo.start()
+
+
+def _trabajar():
+    while True:
+        _despertar.wait(INTERVALO)
+        _despertar.clear()
+        close_old_connections()
+        vaciar()
+
+
+def _quitar_borrados(movimientos):
+    """
+    El libro, préstamo o alumno de un movimiento pudo borrarse antes de
+    escribirlo: se deja en NULL, como haría ``on_delete=SET_NULL``.
+    """
+    for campo, modelo in [('libro', Libro), ('prestamo', Prestamo), ('alumno', Alumno)]:
+        ids = {getattr(movimiento, f'{campo}_id') for movimiento in movimientos} - {None}
+        existentes = set(modelo.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        for movimiento in movimientos:
+            if getattr(movimiento, f'{campo}_id') not in existentes:
+                # También se quita el objeto en caché: bulk_create tomaría su pk
+                setattr(movimiento, campo, None)
+
+
+def _escribir(movimientos):
+    try:
+        with transaction.atomic():
+            HistorialMovimiento.objects.bulk_create(movimientos)
+    except IntegrityError:
+        _quitar_borrados(movimientos)
+        with transaction.atomic():
+            HistorialMovimiento.objects.bulk_create(movimientos)
+
+
+def vaciar():
+    """Escribe ahora todo lo encolado; devuelve cuántos movimientos guardó"""
+    escritos = 0
+    with _vaciando:
+        while True:
+            with _candado:
+                tanda = _cola[:TAMANO_LOTE]
+                del _cola[:TAMANO_LOTE]
+            if not tanda:
+                return escritos
+            try:
+                _escribir(tanda)
+            except DatabaseError:
+                logger.exception('No se pudieron escribir %s movimientos del historial; se reintentará', len(tanda))
+                with _candado:
+                    _cola[:0] = tanda
+                return escritos
+            escritos += len(tanda)
+
+
+def pendientes():
+    with _candado:
+        return len(_cola)
+
+
+def _al_salir():
+    """Escribe lo encolado al terminar el proceso; lo que no se pueda queda en el log"""
+    global _saliendo
+    _saliendo = True
+    for intento in range(REINTENTOS_SALIDA):
+        if intento:
+            time.sleep(PAUSA_REINTENTO)
+            # La conexión pudo quedar rota (servidor reiniciado, timeout)
+            connections.close_all()
+        vaciar()
+        if not pendientes():
+            return
+    with _candado:
+        perdidos = _cola[:]
+        del _cola[:]
+    logger.error('%s movimientos del historial no se pudieron escribir al terminar el proceso', len(perdidos))
+    for registro in perdidos:
+        logger.error(
+            'Movimiento sin escribir: %s %s libro=%s prestamo=%s alumno=%s usuario=%s: %s',
+            registro.fecha.isoformat(), registro.tipo, registro.libro_id, registro.prestamo_id,
+            registro.alumno_id, registro.usuario_responsable, registro.descripcion,
+        )
+
+
+atexit.register(_al_salir)
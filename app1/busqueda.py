@@ -0,0 +1,235 @@
+# app1/busqueda.py
+"""
+Servicio de búsqueda del catálogo de libros.
+
+En SQLite se apoya en un índice FTS5 (tabla virtual ``app1_libro_fts``) que
+se mantiene sincronizado con ``Libro`` mediante señales. El tokenizador
+``unicode61 remove_diacritics 2`` hace que la búsqueda ignore acentos
+("tecnologia" encuentra "Tecnología") y cada término se busca como prefijo.
+
+En MySQL y PostgreSQL se usan sus índices de texto completo (migración
+0012_indices_por_motor), que el motor mantiene solo: ``MATCH ... AGAINST``
+en modo booleano (la intercalación ``_ai_ci`` ignora los acentos) y
+``tsvector`` sin acentos con ``to_tsquery``. En otros motores se usa una
+búsqueda ``icontains`` equivalente.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLA_FTS = 'app1_libro_fts'
+
+# Columnas indexadas y su peso en el ranking bm25 (mismo orden que la tabla)
+CAMPOS_INDEXADOS = [
+    ('titulo', 10.0),
+    ('subtitulo', 4.0),
+    ('autor', 8.0),
+    ('editorial', 2.0),
+    ('descripcion', 1.0),
+    ('codigo_inventario', 10.0),
+]
+CAMPOS_TEXTO = {campo for campo, _ in CAMPOS_INDEXADOS}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# innodb_ft_min_token_size por omisión
+MIN_TOKEN_MYSQL = 3
+
+
+def normalizar(texto):
+    """Convierte el texto a minúsculas y sin acentos."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+# Misma expresión que el índice libro_texto_gin de la migración 0012
+VECTOR_POSTGRESQL = (
+    "to_tsvector('simple', translate(lower("
+    + " || ' ' || ".join(f"coalesce(app1_libro.{campo}, '')" for campo, _ in CAMPOS_INDEXADOS)
+    + "), 'áàäâéèëêíìïîóòöôúùüûñç', 'aaaaeeeeiiiioooouuuunc'))"
+)
+MATCH_MYSQL = (
+    'MATCH (' + ', '.join(f'app1_libro.{campo}' for campo, _ in CAMPOS_INDEXADOS) + ') '
+    'AGAINST (%s IN BOOLEAN MODE)'
+)
+
+
+def usa_fts():
+    """Indica si la base de datos actual cuenta con el índice FTS5."""
+    return connection.vendor == 'sqlite'
+
+
+def ordena_por_relevancia():
+    """Indica si ``buscar_libros`` ordena los resultados por relevancia."""
+    return connection.vendor in ('sqlite', 'mysql', 'postgresql')
+
+
+def expresion_fts(query):
+    """
+    Construye la expresión MATCH de FTS5 a partir del texto del usuario.
+
+    Cada palabra se busca como prefijo y todas deben aparecer (AND).
+    Devuelve None si el texto no contiene palabras buscables.
+    """
+    tokens = _TOKEN_RE.findall(normalizar(query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def expresion_motor(query):
+    """
+    Expresión para el índice de texto completo de MySQL o PostgreSQL: todas
+    las palabras, cada una como prefijo. None si no hay palabras buscables.
+    """
+    tokens = _TOKEN_RE.findall(normalizar(query))
+    if connection.vendor == 'mysql':
+        # InnoDB no indexa palabras más cortas: como término obligatorio
+        # harían que no se encontrara nada ("T-0101" -> "0101")
+        tokens = [token for token in tokens if len(token) >= MIN_TOKEN_MYSQL]
+    if not tokens:
+        return None
+    if connection.vendor == 'mysql':
+        return ' '.join(f'+{token}*' for token in tokens)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def _condicion_motor():
+    """``(condición SQL, relevancia SQL)`` del índice de MySQL o PostgreSQL"""
+    if connection.vendor == 'mysql':
+        return MATCH_MYSQL, MATCH_MYSQL
+    consulta = "to_tsquery('simple', %s)"
+    return f'{VECTOR_POSTGRESQL} @@ {consulta}', f'ts_rank({VECTOR_POSTGRESQL}, {consulta})'
+
+
+def buscar_libros(libros, query):
+    """
+    Filtra un queryset de Libro por el texto buscado.
+
+    Con FTS5 los resultados se ordenan por relevancia (bm25) y el queryset
+    conserva cualquier filtro previo (categoría, disponibilidad, etc.).
+    """
+    query = (query or '').strip()
+    if not query:
+        return libros
+
+    if connection.vendor in ('mysql', 'postgresql'):
+        expresion = expresion_motor(query)
+        if expresion is None:
+            return libros.none()
+        condicion, rango = _condicion_motor()
+        return libros.extra(
+            select={'rango': rango},
+            select_params=[expresion],
+            where=[condicion],
+            params=[expresion],
+            order_by=['-rango'],
+        )
+
+    if not usa_fts():
+        return libros.filter(
+            Q(titulo__icontains=query) |
+            Q(subtitulo__icontains=query) |
+            Q(autor__icontains=query) |
+            Q(editorial__icontains=query) |
+            Q(codigo_inventario__icontains=query)
+        )
+
+    expresion = expresion_fts(query)
+    if expresion is None:
+        return libros.none()
+
+    pesos = ', '.join(str(peso) for _, peso in CAMPOS_INDEXADOS)
+    return libros.extra(
+        select={'rango': f'bm25({TABLA_FTS}, {pesos})'},
+        tables=[TABLA_FTS],
+        where=[
+            f'{TABLA_FTS}.rowid = app1_libro.id',
+            f'{TABLA_FTS} MATCH %s',
+        ],
+        params=[expresion],
+        order_by=['rango'],
+    )
+
+
+def q_libro(query, relacion='libro'):
+    """
+    Condición para filtrar otro modelo (préstamos, multas) por el texto
+    buscado en su libro. Con un índice de texto completo es una subconsulta
+    sobre él, así que se puede combinar con ``|`` y otras condiciones.
+    """
+    if connection.vendor in ('mysql', 'postgresql'):
+        expresion = expresion_motor(query)
+        if expresion is None:
+            return Q(pk__in=[])
+        condicion, _ = _condicion_motor()
+        return Q(**{f'{relacion}__in': RawSQL(
+            f'SELECT app1_libro.id FROM app1_libro WHERE {condicion}', [expresion]
+        )})
+    if not usa_fts():
+        return (
+            Q(**{f'{relacion}__titulo__icontains': query}) |
+            Q(**{f'{relacion}__autor__icontains': query}) |
+            Q(**{f'{relacion}__codigo_inventario__icontains': query})
+        )
+    expresion = expresion_fts(query)
+    if expresion is None:
+        return Q(pk__in=[])
+    return Q(**{f'{relacion}__in': RawSQL(
+        f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [expresion]
+    )})
+
+
+def _sql_insertar():
+    columnas = ', '.join(campo for campo, _ in CAMPOS_INDEXADOS)
+    marcadores = ', '.join(['%s'] * len(CAMPOS_INDEXADOS))
+    return f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) VALUES (%s, {marcadores})'
+
+
+def _fila_indice(libro):
+    return [libro.pk] + [getattr(libro, campo) or '' for campo, _ in CAMPOS_INDEXADOS]
+
+
+def indexar_libro(libro):
+    """Inserta o actualiza un libro en el índice de búsqueda."""
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [libro.pk])
+        cursor.execute(_sql_insertar(), _fila_indice(libro))
+
+
+def indexar_libros(libros):
+    """
+    Agrega al índice libros recién creados con ``bulk_create``, que no
+    dispara las señales de guardado.
+    """
+    if not usa_fts() or not libros:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(_sql_insertar(), [_fila_indice(libro) for libro in libros])
+
+
+def desindexar_libro(pk):
+    """Elimina un libro del índice de búsqueda."""
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [pk])
+
+
+def reconstruir_indice():
+    """Vuelve a generar el índice completo a partir de la tabla de libros."""
+    if not usa_fts():
+        return
+    columnas = ', '.join(campo for campo, _ in CAMPOS_INDEXADOS)
+    origen = ', '.join(f"COALESCE({campo}, '')" for campo, _ in CAMPOS_INDEXADOS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        cursor.execute(
+            f'INSERT INTO {TABLA_FTS} (rowid, {columnas}) '
+            f'SELECT id, {origen} FROM app1_libro'
+        )
@@ -0,0 +1,413 @@
+# app1/circulacion.py
+"""
+Préstamo, devolución y renovación de libros.
+
+Cada operación corre en una sola transacción y toma los bloqueos en el
+mismo orden (alumno, luego libro) para que dos mostradores no presten el
+mismo ejemplar ni rebasen el límite de préstamos de un alumno:
+
+* la fila del alumno se lee con ``SELECT ... FOR UPDATE``, así su contador
+  ``prestamos_activos`` no cambia mientras se revisa el límite;
+* el libro se marca con un ``UPDATE ... WHERE disponible = true``; si otro
+  worker lo ganó, el ``UPDATE`` no afecta filas y el préstamo se rechaza;
+* la restricción única parcial ``prestamo_libro_activo_uniq`` impide en la
+  base de datos dos préstamos activos del mismo libro.
+
+El préstamo, la multa y el libro se escriben con ``bulk_create`` y
+``UPDATE`` (sin señales ni reindexar el libro) y los contadores se ajustan
+al final: todos los del dashboard en una sentencia y los del alumno en
+otra. Un préstamo a un alumno que ya existe son 7 sentencias contando
+``BEGIN`` y ``COMMIT``, las mismas que antes hacía la vista sin transacción
+(con SQLite, una sola confirmación en disco en lugar de una por
+sentencia); registrar a un alumno nuevo agrega su INSERT dentro de un
+savepoint. Una devolución son 7 sin multa y 8 con multa (antes 10). Las
+vistas muestran el mensaje de ``ErrorCirculacion`` cuando la operación no
+procede.
+
+``prestar_lote`` y ``devolver_lote`` atienden el mostrador con lector de
+códigos de barras: procesan todos los ejemplares escaneados en una sola
+transacción con un número fijo de consultas (``bulk_create`` y
+``bulk_update``), sin importar cuántos libros traiga el alumno. Como esas
+operaciones no disparan señales, los contadores se ajustan aquí mismo.
+
+Los movimientos del historial se entregan a ``bitacora``, que los escribe
+después de confirmar la transacción y fuera de ella.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Alumno, Libro, Prestamo, Multa, HistorialMovimiento, ConfiguracionSistema
+from . import alumnos
+from . import bitacora
+from . import estadisticas
+
+CAMPOS_DEVOLUCION = [
+    'activo', 'estado', 'fecha_devolucion_real', 'notas_devolucion', 'recibido_por',
+    'tiene_multa', 'monto_multa', 'actualizado_en',
+]
+CAMPOS_RENOVACION = [
+    'renovaciones', 'fecha_vencimiento', 'estado', 'tiene_multa', 'monto_multa', 'actualizado_en',
+]
+MAX_LOTE = 50
+
+
+class ErrorCirculacion(Exception):
+    """
+    La operación no procede; el mensaje se muestra al usuario y ``codigos``
+    indica los ejemplares que la impidieron, si aplica.
+    """
+
+    def __init__(self, mensaje, codigos=()):
+        super().__init__(mensaje)
+        self.codigos = list(codigos)
+
+
+def _bloquear_prestamo(pk):
+    """Lee el préstamo con su libro y su alumno, bloqueando el préstamo y el alumno."""
+    return (
+        Prestamo.objects.select_related('libro', 'alumno')
+        .select_for_update(of=('self', 'alumno'))
+        .get(pk=pk)
+    )
+
+
+def marcar_libro(libro, disponible):
+    """
+    Cambia la disponibilidad del libro solo si aún tiene el valor contrario.
+    Devuelve True si esta llamada hizo el cambio; el UPDATE no dispara
+    señales y quien llama ajusta el contador ``LIBROS_DISPONIBLES``.
+    """
+    actualizados = Libro.objects.filter(pk=libro.pk, disponible=not disponible).update(
+        disponible=disponible,
+        actualizado_en=timezone.now(),
+    )
+    libro.disponible = disponible
+    return bool(actualizados)
+
+
+def movimiento(tipo, prestamo, descripcion, usuario):
+    return HistorialMovimiento(
+        tipo=tipo,
+        libro_id=prestamo.libro_id,
+        prestamo=prestamo,
+        alumno_id=prestamo.alumno_id,
+        descripcion=descripcion,
+        usuario_responsable=usuario,
+    )
+
+
+def registrar_movimiento(tipo, prestamo, descripcion, usuario):
+    registro = movimiento(tipo, prestamo, descripcion, usuario)
+    bitacora.registrar(registro)
+    return registro
+
+
+def prestar(prestamo, datos_alumno, usuario='Sistema'):
+    """
+    Guarda ``prestamo`` (sin guardar, con libro y fechas) para el alumno
+    descrito por ``datos_alumno`` (ver ``alumnos.registrar``).
+    """
+    config = ConfiguracionSistema.load()
+    try:
+        with transaction.atomic():
+            alumno = alumnos.registrar(bloquear=True, **datos_alumno)
+            if alumno.prestamos_activos >= config.max_prestamos_simultaneos:
+                raise ErrorCirculacion(
+                    f'El alumno ya tiene {alumno.prestamos_activos} préstamos activos. '
+                    f'Máximo permitido: {config.max_prestamos_simultaneos}'
+                )
+
+            if not marcar_libro(prestamo.libro, disponible=False):
+                raise ErrorCirculacion('Este libro no está disponible para préstamo.')
+
+            prestamo.alumno = alumno
+            prestamo.activo = True
+            prestamo.estado = 'activo'
+            prestamo.prestado_por = usuario
+            if not prestamo.fecha_vencimiento:
+                prestamo.fecha_vencimiento = timezone.localdate() + timedelta(days=config.dias_prestamo)
+            Prestamo.objects.bulk_create([prestamo])
+            _asignar_ids([prestamo])
+
+            registrar_movimiento(
+                'prestamo', prestamo,
+                f'Préstamo de "{prestamo.libro.titulo}" a {alumno.nombre}',
+                usuario,
+            )
+            estadisticas.ajustar({
+                estadisticas.LIBROS_DISPONIBLES: -1,
+                estadisticas.PRESTAMOS_ACTIVOS: 1,
+            })
+            alumnos.ajustar(alumno.pk, {'prestamos_activos': 1})
+            alumno.prestamos_activos += 1
+    except IntegrityError:
+        # Respaldo de la restricción única: el libro ya tiene un préstamo activo
+        raise ErrorCirculacion('Este libro no está disponible para préstamo.')
+    return prestamo
+
+
+def calcular_multa(prestamo, config, hoy):
+    """Devuelve ``(dias_retraso, dias_multa, monto)`` si se devuelve ``hoy``."""
+    dias_retraso = max((hoy - prestamo.fecha_vencimiento).days, 0)
+    dias_multa = max(dias_retraso - config.dias_gracia, 0)
+    return dias_retraso, dias_multa, dias_multa * config.multa_por_dia
+
+
+def _cerrar_prestamo(prestamo, notas, usuario, config, hoy):
+    """
+    Marca el préstamo como devuelto; devuelve su multa por retraso (sin
+    guardar) o None. El monto que dejó ``barrer_vencidos`` se reemplaza por
+    el definitivo, que puede ser cero.
+    """
+    prestamo.activo = False
+    prestamo.estado = 'devuelto'
+    prestamo.fecha_devolucion_real = hoy
+    prestamo.notas_devolucion = notas
+    prestamo.recibido_por = usuario
+
+    _, dias_multa, monto = calcular_multa(prestamo, config, hoy)
+    prestamo.tiene_multa = bool(dias_multa)
+    prestamo.monto_multa = monto
+    if not dias_multa:
+        return None
+    return Multa(
+        prestamo=prestamo,
+        libro_id=prestamo.libro_id,
+        alumno_id=prestamo.alumno_id,
+        tipo='retraso',
+        monto=monto,
+        descripcion=f'Multa por {dias_multa} días de retraso en la devolución de "{prestamo.libro.titulo}"'
+    )
+
+
+@transaction.atomic
+def devolver(pk, notas='', usuario='Sistema', hoy=None):
+    """
+    Registra la devolución del préstamo ``pk`` y, si hubo retraso fuera de
+    los días de gracia, su multa. Devuelve ``(prestamo, multa o None)``.
+    """
+    hoy = hoy or timezone.localdate()
+    config = ConfiguracionSistema.load()
+    prestamo = _bloquear_prestamo(pk)
+    if not prestamo.activo:
+        raise ErrorCirculacion('Este préstamo ya fue devuelto.')
+
+    multa = _cerrar_prestamo(prestamo, notas, usuario, config, hoy)
+    prestamo.actualizado_en = timezone.now()
+    if multa:
+        Multa.objects.bulk_create([multa])
+
+    liberado = marcar_libro(prestamo.libro, disponible=True)
+    Prestamo.objects.filter(pk=prestamo.pk).update(
+        **{campo: getattr(prestamo, campo) for campo in CAMPOS_DEVOLUCION}
+    )
+
+    registrar_movimiento(
+        'devolucion', prestamo,
+        f'Devolución de "{prestamo.libro.titulo}" por {prestamo.alumno.nombre}',
+        usuario,
+    )
+    _contar_devoluciones([(prestamo, multa)], int(liberado))
+    return prestamo, multa
+
+
+def _contar_devoluciones(devoluciones, liberados):
+    """Ajusta los contadores por ``[(prestamo, multa o None)]`` ya guardados."""
+    por_alumno = defaultdict(Counter)
+    multas = 0
+    for prestamo, multa in devoluciones:
+        por_alumno[prestamo.alumno_id]['prestamos_activos'] -= 1
+        if multa:
+            multas += 1
+            por_alumno[prestamo.alumno_id]['multas_pendientes'] += 1
+            por_alumno[prestamo.alumno_id]['saldo_pendiente'] += multa.monto
+    estadisticas.ajustar({
+        estadisticas.LIBROS_DISPONIBLES: liberados,
+        estadisticas.PRESTAMOS_ACTIVOS: -len(devoluciones),
+        estadisticas.MULTAS_PENDIENTES: multas,
+    })
+    for matricula, cambios in por_alumno.items():
+        alumnos.ajustar(matricula, cambios)
+
+
+def validar_renovacion(prestamo, config):
+    """Lanza ``ErrorCirculacion`` si el préstamo no se puede renovar."""
+    if not prestamo.activo:
+        raise ErrorCirculacion('No se puede renovar un préstamo que ya fue devuelto.')
+    if prestamo.renovaciones >= config.max_renovaciones:
+        raise ErrorCirculacion(
+            f'Este préstamo ya alcanzó el máximo de renovaciones ({config.max_renovaciones}).'
+        )
+    if prestamo.alumno.multas_pendientes:
+        raise ErrorCirculacion('El alumno tiene multas pendientes. Debe pagarlas antes de renovar.')
+
+
+@transaction.atomic
+def renovar(pk, usuario='Sistema', hoy=None):
+    """
+    Extiende el vencimiento del préstamo ``pk`` otro periodo de préstamo.
+    Deja de estar vencido, así que pierde la multa acumulada por el barrido.
+    """
+    hoy = hoy or timezone.localdate()
+    config = ConfiguracionSistema.load()
+    prestamo = _bloquear_prestamo(pk)
+    validar_renovacion(prestamo, config)
+
+    prestamo.renovaciones += 1
+    prestamo.fecha_vencimiento = hoy + timedelta(days=config.dias_prestamo)
+    prestamo.estado = 'renovado'
+    prestamo.tiene_multa = False
+    prestamo.monto_multa = 0
+    prestamo.save(update_fields=CAMPOS_RENOVACION)
+
+    registrar_movimiento(
+        'renovacion', prestamo,
+        f'Renovación #{prestamo.renovaciones} de "{prestamo.libro.titulo}" para {prestamo.alumno.nombre}',
+        usuario,
+    )
+    return prestamo
+
+
+def _codigos_escaneados(codigos):
+    """Códigos sin espacios ni repetidos, en el orden en que se escanearon."""
+    codigos = list(dict.fromkeys(str(codigo).strip() for codigo in codigos))
+    if '' in codigos:
+        codigos.remove('')
+    if not codigos:
+        raise ErrorCirculacion('No se escaneó ningún código.')
+    if len(codigos) > MAX_LOTE:
+        raise ErrorCirculacion(f'Se pueden procesar hasta {MAX_LOTE} libros a la vez.')
+    return codigos
+
+
+def _asignar_ids(prestamos):
+    """Recupera los ids si el motor no los devuelve desde ``bulk_create``."""
+    if not prestamos or prestamos[0].pk is not None:
+        return
+    ids = dict(
+        Prestamo.objects.filter(activo=True, libro_id__in=[prestamo.libro_id for prestamo in prestamos])
+        .values_list('libro_id', 'id')
+    )
+    for prestamo in prestamos:
+        prestamo.pk = ids[prestamo.libro_id]
+
+
+@transaction.atomic
+def prestar_lote(matricula, codigos, usuario='Sistema', nombre=None, hoy=None):
+    """
+    Presta al alumno ``matricula`` los libros con esos ``codigo_inventario``.
+    Si alguno no procede no se presta ninguno. Un alumno nuevo se registra
+    solo si se indica ``nombre``. Devuelve ``(alumno, prestamos)``.
+    """
+    hoy = hoy or timezone.localdate()
+    codigos = _codigos_escaneados(codigos)
+    config = ConfiguracionSistema.load()
+
+    if nombre:
+        alumno = alumnos.registrar(matricula, nombre, bloquear=True)
+    else:
+        alumno = Alumno.objects.select_for_update().filter(pk=matricula).first()
+        if alumno is None:
+            raise ErrorCirculacion(f'No hay un alumno con matrícula {matricula}. Indique su nombre para registrarlo.')
+    if alumno.prestamos_activos + len(codigos) > config.max_prestamos_simultaneos:
+        raise ErrorCirculacion(
+            f'El alumno ya tiene {alumno.prestamos_activos} préstamos activos y pide {len(codigos)}. '
+            f'Máximo permitido: {config.max_prestamos_simultaneos}'
+        )
+
+    libros = {
+        libro.codigo_inventario: libro
+        for libro in Libro.objects.select_for_update()
+        .filter(codigo_inventario__in=codigos)
+        .only('id', 'codigo_inventario', 'titulo', 'disponible')
+    }
+    faltantes = [codigo for codigo in codigos if codigo not in libros]
+    if faltantes:
+        raise ErrorCirculacion('Hay códigos que no están en el catálogo.', faltantes)
+    prestados = [codigo for codigo in codigos if not libros[codigo].disponible]
+    if prestados:
+        raise ErrorCirculacion('Hay libros que no están disponibles para préstamo.', prestados)
+
+    ahora = timezone.now()
+    tomados = Libro.objects.filter(pk__in=[libro.pk for libro in libros.values()], disponible=True).update(
+        disponible=False,
+        actualizado_en=ahora,
+    )
+    if tomados != len(codigos):
+        raise ErrorCirculacion('Otro préstamo tomó alguno de los libros. Vuelva a escanearlos.')
+
+    vencimiento = hoy + timedelta(days=config.dias_prestamo)
+    prestamos = Prestamo.objects.bulk_create([
+        Prestamo(
+            libro=libros[codigo],
+            alumno=alumno,
+            fecha_vencimiento=vencimiento,
+            prestado_por=usuario,
+        )
+        for codigo in codigos
+    ])
+    _asignar_ids(prestamos)
+    bitacora.registrar(*[
+        movimiento('prestamo', prestamo, f'Préstamo de "{prestamo.libro.titulo}" a {alumno.nombre}', usuario)
+        for prestamo in prestamos
+    ])
+
+    estadisticas.ajustar({
+        estadisticas.LIBROS_DISPONIBLES: -len(prestamos),
+        estadisticas.PRESTAMOS_ACTIVOS: len(prestamos),
+    })
+    alumnos.ajustar(alumno.pk, {'prestamos_activos': len(prestamos)})
+    alumno.prestamos_activos += len(prestamos)
+    return alumno, prestamos
+
+
+@transaction.atomic
+def devolver_lote(codigos, usuario='Sistema', notas='', hoy=None):
+    """
+    Registra la devolución de los libros con esos ``codigo_inventario`` y
+    genera la multa por retraso de cada uno. Si alguno no tiene préstamo
+    activo no se devuelve ninguno. Devuelve ``[(prestamo, multa o None)]``.
+    """
+    hoy = hoy or timezone.localdate()
+    codigos = _codigos_escaneados(codigos)
+    config = ConfiguracionSistema.load()
+
+    activos = {
+        prestamo.libro.codigo_inventario: prestamo
+        for prestamo in Prestamo.objects.select_related('libro', 'alumno')
+        .select_for_update(of=('self', 'alumno'))
+        .filter(activo=True, libro__codigo_inventario__in=codigos)
+    }
+    faltantes = [codigo for codigo in codigos if codigo not in activos]
+    if faltantes:
+        raise ErrorCirculacion('Hay libros sin préstamo activo.', faltantes)
+
+    ahora = timezone.now()
+    devoluciones = []
+    for codigo in codigos:
+        prestamo = activos[codigo]
+        multa = _cerrar_prestamo(prestamo, notas, usuario, config, hoy)
+        prestamo.actualizado_en = ahora
+        devoluciones.append((prestamo, multa))
+
+    prestamos = [prestamo for prestamo, _ in devoluciones]
+    multas = [multa for _, multa in devoluciones if multa]
+    Prestamo.objects.bulk_update(prestamos, CAMPOS_DEVOLUCION)
+    Multa.objects.bulk_create(multas)
+    liberados = Libro.objects.filter(pk__in=[prestamo.libro_id for prestamo in prestamos], disponible=False).update(
+        disponible=True,
+        actualizado_en=ahora,
+    )
+    bitacora.registrar(*[
+        movimiento(
+            'devolucion', prestamo,
+            f'Devolución de "{prestamo.libro.titulo}" por {prestamo.alumno.nombre}',
+            usuario,
+        )
+        for prestamo in prestamos
+    ])
+    _contar_devoluciones(devoluciones, liberados)
+    return devoluciones
@@ -0,0 +1,194 @@
+# app1/datos_prueba.py
+"""
+Datos sintéticos para medir consultas y tiempos con volúmenes distintos.
+
+``sembrar(n)`` crea ``n`` libros con alumnos, préstamos (activos, vencidos
+y devueltos), multas y movimientos del historial en proporción, o las
+cantidades que se le pidan de cada modelo (el comando ``generar_datos``
+llega a millones de filas). Todo se inserta con ``bulk_create`` por lotes
+que se generan sobre la marcha, así que la memoria no crece con el volumen;
+después ajusta los contadores y el índice de búsqueda, que esas inserciones
+no actualizan por señales. Los códigos llevan un prefijo para poder
+borrarlos con ``borrar``.
+
+``fecha_prestamo`` se llena con ``auto_now_add`` y queda en el día de la
+carga; los vencimientos, devoluciones y movimientos del historial sí se
+reparten en el tiempo (el historial en ``DIAS_HISTORIAL`` días).
+"""
+import random
+from itertools import islice
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Libro, Alumno, Prestamo, Multa, HistorialMovimiento
+from . import alumnos
+from . import busqueda
+from . import estadisticas
+
+PREFIJO = 'PRB'
+TAMANO_LOTE = 2000
+DIAS_HISTORIAL = 730
+
+PALABRAS = [
+    'historia', 'ciencia', 'viaje', 'mar', 'ciudad', 'noche', 'tiempo', 'jardín', 'sombra', 'luz',
+    'camino', 'montaña', 'río', 'silencio', 'memoria', 'fuego', 'invierno', 'libro', 'sueño', 'voz',
+]
+AUTORES = [
+    'Rulfo', 'Paz', 'Castellanos', 'Fuentes', 'Poniatowska', 'Garro', 'Reyes', 'Sor Juana',
+    'Cervantes', 'Borges', 'Cortázar', 'Neruda', 'Mistral', 'Vasconcelos', 'Pitol',
+]
+
+
+def _titulo(generador):
+    return ' '.join(generador.choice(PALABRAS) for _ in range(generador.randint(2, 4))).capitalize()
+
+
+def _por_lotes(filas, tamano=TAMANO_LOTE):
+    filas = iter(filas)
+    while lote := list(islice(filas, tamano)):
+        yield lote
+
+
+def _toca(i, cuantos, de):
+    """Reparte ``cuantos`` elementos parejo entre ``de`` posiciones"""
+    return (i + 1) * cuantos // de > i * cuantos // de
+
+
+def _insertar(modelo, filas):
+    """``bulk_create`` por lotes; devuelve cada lote ya con pk"""
+    for lote in _por_lotes(filas):
+        creados = modelo.objects.bulk_create(lote)
+        if creados[0].pk is None:
+            # Bases que no devuelven los ids insertados (MySQL): son los últimos de la tabla
+            creados = list(modelo.objects.order_by('-pk')[:len(lote)])[::-1]
+        yield creados
+
+
+@transaction.atomic
+def sembrar(cantidad, prefijo=PREFIJO, semilla=0,
+            num_alumnos=None, num_prestamos=None, num_multas=None, num_movimientos=None):
+    """
+    Crea ``cantidad`` libros y, si no se indican otras cantidades, en
+    proporción: un alumno por cada cinco libros, préstamos para la mitad de
+    los libros, multas para un cuarto de los préstamos y un movimiento del
+    historial por libro. Los préstamos se reparten entre los libros; el
+    primero de cada dos libros queda activo (una parte vencidos) y los demás
+    devueltos. Devuelve un diccionario con lo creado por modelo.
+    """
+    num_alumnos = max(1, cantidad // 5) if num_alumnos is None else max(1, num_alumnos)
+    num_prestamos = cantidad // 2 if num_prestamos is None else num_prestamos
+    num_multas = min(num_prestamos, (num_prestamos + 3) // 4 if num_multas is None else num_multas)
+    num_movimientos = cantidad if num_movimientos is None else num_movimientos
+    if cantidad < 1 and (num_prestamos or num_movimientos):
+        raise ValueError('Los préstamos y movimientos necesitan al menos un libro')
+
+    generador = random.Random(semilla)
+    hoy = timezone.localdate()
+    ahora = timezone.now()
+    categorias = [clave for clave, _ in Libro.CATEGORIAS]
+
+    def activo(i):
+        # Solo la primera vuelta de préstamos sobre los libros puede quedar activa
+        return i < cantidad and i % 2 == 0
+
+    ids_libros = []
+    for lote in _insertar(Libro, (
+        Libro(
+            titulo=_titulo(generador),
+            autor=generador.choice(AUTORES),
+            publicacion=generador.randint(1950, 2025),
+            categoria=generador.choice(categorias),
+            codigo_inventario=f'{prefijo}-{i:07d}',
+            disponible=not (i < num_prestamos and activo(i)),
+        )
+        for i in range(cantidad)
+    )):
+        busqueda.indexar_libros(lote)
+        ids_libros.extend(libro.pk for libro in lote)
+
+    matriculas = [f'{prefijo}{i:07d}' for i in range(num_alumnos)]
+    for _ in _insertar(Alumno, (
+        Alumno(matricula=matricula, nombre=f'Alumno {_titulo(generador)}',
+               grado=str(generador.randint(1, 6)), grupo=generador.choice('ABCD'))
+        for matricula in matriculas
+    )):
+        pass
+
+    def prestamo(i):
+        vence = hoy + timedelta(days=generador.randint(-20, 14))
+        if activo(i):
+            return Prestamo(
+                libro_id=ids_libros[i % cantidad], alumno_id=matriculas[i % num_alumnos],
+                fecha_vencimiento=vence, estado='vencido' if vence < hoy else 'activo',
+                prestado_por='Sistema',
+            )
+        return Prestamo(
+            libro_id=ids_libros[i % cantidad], alumno_id=matriculas[i % num_alumnos],
+            fecha_vencimiento=vence, activo=False, estado='devuelto',
+            fecha_devolucion_real=vence + timedelta(days=generador.randint(-7, 7)),
+            prestado_por='Sistema',
+        )
+
+    total_multas = 0
+    posicion = 0
+    for lote in _insertar(Prestamo, (prestamo(i) for i in range(num_prestamos))):
+        con_multa = []
+        for registro in lote:
+            if _toca(posicion, num_multas, num_prestamos):
+                con_multa.append(registro)
+            posicion += 1
+        Multa.objects.bulk_create([
+            Multa(
+                prestamo=registro,
+                libro_id=registro.libro_id,
+                alumno_id=registro.alumno_id,
+                tipo='retraso',
+                monto=Decimal(generador.randint(5, 100)),
+                estado=generador.choice(['pendiente', 'pendiente', 'pagada']),
+                descripcion='Multa de prueba',
+            )
+            for registro in con_multa
+        ])
+        total_multas += len(con_multa)
+
+    tipos = [clave for clave, _ in HistorialMovimiento.TIPOS]
+    segundos = DIAS_HISTORIAL * 24 * 3600
+    for lote in _por_lotes(
+        HistorialMovimiento(
+            tipo=tipo,
+            libro_id=generador.choice(ids_libros),
+            alumno_id=generador.choice(matriculas),
+            descripcion=f'Movimiento de prueba ({tipo})',
+            usuario_responsable='Sistema',
+            fecha=ahora - timedelta(seconds=generador.randrange(segundos)),
+        )
+        for tipo in (generador.choice(tipos) for _ in range(num_movimientos))
+    ):
+        HistorialMovimiento.objects.bulk_create(lote)
+
+    estadisticas.reconciliar()
+    alumnos.reconciliar()
+    return {
+        'libros': cantidad,
+        'alumnos': num_alumnos,
+        'prestamos': num_prestamos,
+        'multas': total_multas,
+        'movimientos': num_movimientos,
+    }
+
+
+@transaction.atomic
+def borrar(prefijo=PREFIJO):
+    """Borra lo creado por ``sembrar`` con ese prefijo"""
+    libros = Libro.objects.filter(codigo_inventario__startswith=f'{prefijo}-')
+    HistorialMovimiento.objects.filter(libro__in=libros).delete()
+    Multa.objects.filter(libro__in=libros).delete()
+    Prestamo.objects.filter(libro__in=libros).delete()
+    borrados = libros.delete()[0]
+    Alumno.objects.filter(matricula__startswith=prefijo).delete()
+    estadisticas.reconciliar()
+    alumnos.reconciliar()
+    return borrados
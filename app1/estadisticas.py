@@ -0,0 +1,101 @@
+# app1/estadisticas.py
+"""
+Estadísticas del dashboard mantenidas de forma incremental.
+
+Cada contador es una fila de ``ContadorEstadistica`` que las señales de
+Libro, Prestamo y Multa ajustan con ``UPDATE ... SET valor = valor + n``,
+una operación atómica aunque haya varios workers de gunicorn; ``ajustar``
+cambia varios contadores con una sola sentencia. Las operaciones masivas
+(``QuerySet.update``, ``bulk_create``) no disparan señales, por eso
+``reconciliar()`` recalcula todo contra las tablas reales; se ejecuta con
+el comando ``reconciliar_estadisticas``.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+
+from .models import Libro, Prestamo, Multa, ContadorEstadistica
+
+LIBROS = 'libros'
+LIBROS_DISPONIBLES = 'libros_disponibles'
+PRESTAMOS_ACTIVOS = 'prestamos_activos'
+MULTAS_PENDIENTES = 'multas_pendientes'
+PREFIJO_CATEGORIA = 'categoria_'
+
+
+def clave_categoria(categoria):
+    return f'{PREFIJO_CATEGORIA}{categoria}'
+
+
+def ajustar(cambios):
+    """
+    Suma (o resta) a cada contador el valor indicado en ``cambios``, todos
+    en un solo ``UPDATE ... SET valor = valor + CASE clave ... END``.
+    """
+    cambios = {clave: delta for clave, delta in cambios.items() if delta}
+    if not cambios:
+        return
+    actualizados = ContadorEstadistica.objects.filter(clave__in=cambios).update(
+        valor=F('valor') + Case(
+            *[When(clave=clave, then=Value(delta)) for clave, delta in cambios.items()],
+            default=Value(0),
+        )
+    )
+    if actualizados < len(cambios):
+        # Algún contador aún no existe: se recalcula todo desde las tablas
+        reconciliar()
+
+
+def calcular():
+    """Calcula los contadores directamente sobre las tablas."""
+    valores = {
+        LIBROS: Libro.objects.count(),
+        LIBROS_DISPONIBLES: Libro.objects.filter(disponible=True).count(),
+        PRESTAMOS_ACTIVOS: Prestamo.objects.filter(activo=True).count(),
+        MULTAS_PENDIENTES: Multa.objects.filter(estado='pendiente').count(),
+    }
+    for categoria, _ in Libro.CATEGORIAS:
+        valores[clave_categoria(categoria)] = 0
+    por_categoria = Libro.objects.order_by().values('categoria').annotate(total=Count('id'))
+    for stat in por_categoria:
+        valores[clave_categoria(stat['categoria'])] = stat['total']
+    return valores
+
+
+@transaction.atomic
+def reconciliar():
+    """
+    Sobrescribe los contadores con los valores reales. Devuelve las diferencias.
+
+    Primero se bloquean los contadores y después se cuenta: una operación
+    que confirme en medio espera el bloqueo para sumar su cambio, en lugar
+    de que este lo pise con un conteo que no la incluía.
+    """
+    anteriores = dict(ContadorEstadistica.objects.select_for_update().values_list('clave', 'valor'))
+    valores = calcular()
+    diferencias = {}
+    for clave, valor in valores.items():
+        if anteriores.get(clave) != valor:
+            diferencias[clave] = (anteriores.get(clave), valor)
+            ContadorEstadistica.objects.update_or_create(clave=clave, defaults={'valor': valor})
+    return diferencias
+
+
+def obtener():
+    """Lee todos los contadores con una sola consulta."""
+    valores = dict(ContadorEstadistica.objects.values_list('clave', 'valor'))
+    if LIBROS not in valores:
+        reconciliar()
+        valores = dict(ContadorEstadistica.objects.values_list('clave', 'valor'))
+
+    categorias = {
+        clave[len(PREFIJO_CATEGORIA):]: valor
+        for clave, valor in valores.items()
+        if clave.startswith(PREFIJO_CATEGORIA)
+    }
+    return {
+        'total_libros': valores.get(LIBROS, 0),
+        'libros_disponibles': valores.get(LIBROS_DISPONIBLES, 0),
+        'prestamos_activos': valores.get(PRESTAMOS_ACTIVOS, 0),
+        'multas_pendientes': valores.get(MULTAS_PENDIENTES, 0),
+        'categorias_dict': categorias,
+    }
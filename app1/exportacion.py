@@ -0,0 +1,201 @@
+# app1/exportacion.py
+"""
+Exportación de préstamos, multas e historial a CSV y XLSX.
+
+Las filas se leen con ``values_list(...).iterator()`` por bloques, así que
+la memoria no crece con el número de registros: el CSV se entrega como un
+generador para ``StreamingHttpResponse`` y el XLSX se escribe con openpyxl
+en modo ``write_only`` sobre un archivo temporal. Los filtros son los mismos
+de las listas (``app1.filtros``). El historial incluye los movimientos
+archivados.
+"""
+import csv
+import datetime
+import decimal
+import tempfile
+
+import openpyxl
+from django.utils import timezone
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from .models import Prestamo, Multa, HistorialMovimiento, HistorialArchivado
+from .paginacion import orden_keyset
+from . import filtros
+from . import historial
+
+TAMANO_CHUNK = 2000
+FILAS_POR_ESCRITURA = 500
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATOS = ('csv', 'xlsx')
+# Excel y LibreOffice interpretan como fórmula el texto que empieza así
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _si_no(valor):
+    return 'Sí' if valor else 'No'
+
+
+def _opciones(opciones):
+    etiquetas = dict(opciones)
+    return lambda valor: etiquetas.get(valor, valor)
+
+
+def _sin_formula(valor):
+    """Antepone ``'`` al texto que la hoja de cálculo ejecutaría como fórmula"""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _fecha_hora(valor):
+    # openpyxl no acepta fechas con zona horaria
+    return timezone.localtime(valor).replace(tzinfo=None) if valor else None
+
+
+class Exportacion:
+    """
+    Describe una exportación: modelo, función de filtrado y columnas
+    ``(encabezado, campo, conversión)``.
+    """
+
+    def __init__(self, titulo, modelo, filtrar, columnas, archivado=None):
+        self.titulo = titulo
+        self.modelo = modelo
+        self.filtrar = filtrar
+        self.columnas = columnas
+        # Tabla fría con las mismas columnas (ver historial.py)
+        self.archivado = archivado
+
+    @property
+    def encabezados(self):
+        return [encabezado for encabezado, _, _ in self.columnas]
+
+    def queryset(self, parametros):
+        queryset, _ = self.filtrar(parametros, self.modelo.objects.all())
+        campos = [campo for _, campo, _ in self.columnas]
+        if self.archivado is not None:
+            archivados, _ = self.filtrar(parametros, self.archivado.objects.all())
+            return historial.unir(queryset, archivados, campos)
+        return queryset.order_by(*orden_keyset(self.modelo)).values_list(*campos)
+
+    def filas(self, parametros):
+        conversiones = [conversion for _, _, conversion in self.columnas]
+        for valores in self.queryset(parametros).iterator(chunk_size=TAMANO_CHUNK):
+            yield [
+                _sin_formula(conversion(valor) if conversion else valor)
+                for conversion, valor in zip(conversiones, valores)
+            ]
+
+
+EXPORTACIONES = {
+    'prestamos': Exportacion('Préstamos', Prestamo, filtros.filtrar_prestamos, [
+        ('Folio', 'id', None),
+        ('Código', 'libro__codigo_inventario', None),
+        ('Libro', 'libro__titulo', None),
+        ('Alumno', 'alumno__nombre', None),
+        ('Matrícula', 'alumno_id', None),
+        ('Grado', 'alumno__grado', None),
+        ('Grupo', 'alumno__grupo', None),
+        ('Fecha de préstamo', 'fecha_prestamo', None),
+        ('Fecha de vencimiento', 'fecha_vencimiento', None),
+        ('Fecha de devolución', 'fecha_devolucion_real', None),
+        ('Estado', 'estado', _opciones(Prestamo.ESTADOS)),
+        ('Renovaciones', 'renovaciones', None),
+        ('Multa', 'monto_multa', None),
+        ('Multa pagada', 'multa_pagada', _si_no),
+        ('Prestado por', 'prestado_por', None),
+        ('Recibido por', 'recibido_por', None),
+    ]),
+    'multas': Exportacion('Multas', Multa, filtros.filtrar_multas, [
+        ('Folio', 'id', None),
+        ('Alumno', 'alumno__nombre', None),
+        ('Matrícula', 'alumno_id', None),
+        ('Préstamo', 'prestamo_id', None),
+        ('Libro', 'libro__titulo', None),
+        ('Tipo', 'tipo', _opciones(Multa.TIPOS)),
+        ('Monto', 'monto', None),
+        ('Estado', 'estado', _opciones(Multa.ESTADOS)),
+        ('Fecha de multa', 'fecha_multa', None),
+        ('Fecha de pago', 'fecha_pago', None),
+        ('Recibo', 'recibo', None),
+        ('Descripción', 'descripcion', None),
+    ]),
+    'historial': Exportacion('Historial', HistorialMovimiento, filtros.filtrar_historial, [
+        ('Fecha', 'fecha', _fecha_hora),
+        ('Tipo', 'tipo', _opciones(HistorialMovimiento.TIPOS)),
+        ('Libro', 'libro__titulo', None),
+        ('Préstamo', 'prestamo_id', None),
+        ('Alumno', 'alumno__nombre', None),
+        ('Matrícula', 'alumno_id', None),
+        ('Descripción', 'descripcion', None),
+        ('Responsable', 'usuario_responsable', None),
+    ], archivado=HistorialArchivado),
+}
+
+
+# ==================== CSV ====================
+
+class _Eco:
+    """Pseudo-archivo que devuelve lo escrito, para usar ``csv.writer`` en un generador."""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime.datetime):
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, datetime.date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, decimal.Decimal):
+        return f'{valor:.2f}'
+    return valor
+
+
+def csv_en_flujo(exportacion, parametros):
+    """Genera el CSV en bloques de texto (con BOM para que Excel respete los acentos)."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow(exportacion.encabezados)
+    bloque = []
+    for fila in exportacion.filas(parametros):
+        bloque.append(escritor.writerow([_texto_csv(valor) for valor in fila]))
+        if len(bloque) == FILAS_POR_ESCRITURA:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def escribir_csv(exportacion, parametros, destino):
+    """Escribe el CSV completo en ``destino`` (archivo de texto abierto)."""
+    for bloque in csv_en_flujo(exportacion, parametros):
+        destino.write(bloque)
+
+
+# ==================== XLSX ====================
+
+def escribir_xlsx(exportacion, parametros, destino):
+    """Escribe el libro de Excel en ``destino`` (ruta o archivo abierto en binario)."""
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet(exportacion.titulo)
+    negritas = Font(bold=True)
+    encabezado = []
+    for texto in exportacion.encabezados:
+        celda = WriteOnlyCell(hoja, value=texto)
+        celda.font = negritas
+        encabezado.append(celda)
+    hoja.append(encabezado)
+    for fila in exportacion.filas(parametros):
+        hoja.append(fila)
+    libro.save(destino)
+
+
+def xlsx_temporal(exportacion, parametros):
+    """Genera el XLSX en un archivo temporal listo para leerse desde el inicio."""
+    archivo = tempfile.TemporaryFile()
+    escribir_xlsx(exportacion, parametros, archivo)
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,107 @@
+# app1/filtros.py
+"""
+Filtros de las listas (búsqueda, estado, tipo, etc.).
+
+Reciben los parámetros como un diccionario (``request.GET`` en las vistas o
+las opciones de un comando) para que las listas, las exportaciones y los
+comandos de administración filtren exactamente igual.
+"""
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .busqueda import buscar_libros
+
+
+def filtrar_libros(parametros, libros):
+    """Aplica la búsqueda y los filtros de catálogo recibidos"""
+    # Búsqueda
+    query = parametros.get('q')
+    if query:
+        libros = buscar_libros(libros, query)
+    
+    # Filtro por categoría
+    categoria = parametros.get('categoria')
+    if categoria:
+        libros = libros.filter(categoria=categoria)
+    
+    # Filtro por disponibilidad
+    disponible = parametros.get('disponible')
+    if disponible:
+        libros = libros.filter(disponible=disponible == 'true')
+    
+    return libros, query, categoria
+
+
+def filtrar_prestamos(parametros, prestamos):
+    """Aplica los filtros y la búsqueda de préstamos recibidos"""
+    # Filtros
+    estado = parametros.get('estado')
+    if estado:
+        prestamos = prestamos.filter(estado=estado)
+    
+    activo = parametros.get('activo')
+    if activo == 'true':
+        prestamos = prestamos.filter(activo=True)
+    elif activo == 'false':
+        prestamos = prestamos.filter(activo=False)
+    
+    # Búsqueda
+    query = parametros.get('q')
+    if query:
+        prestamos = prestamos.filter(
+            Q(alumno__nombre__icontains=query) |
+            Q(alumno__matricula__icontains=query) |
+            Q(libro__titulo__icontains=query)
+        )
+    
+    return prestamos, query
+
+
+def filtrar_multas(parametros, multas):
+    """Aplica los filtros y la búsqueda de multas recibidos"""
+    # Filtros
+    estado = parametros.get('estado')
+    if estado:
+        multas = multas.filter(estado=estado)
+    
+    tipo = parametros.get('tipo')
+    if tipo:
+        multas = multas.filter(tipo=tipo)
+    
+    # Búsqueda
+    query = parametros.get('q')
+    if query:
+        multas = multas.filter(
+            Q(alumno__nombre__icontains=query) |
+            Q(alumno__matricula__icontains=query) |
+            Q(libro__titulo__icontains=query)
+        )
+    
+    return multas, query
+
+
+def filtrar_historial(parametros, historial):
+    """Aplica los filtros de tipo, fechas y búsqueda del historial recibidos"""
+    # Filtros
+    tipo = parametros.get('tipo')
+    if tipo:
+        historial = historial.filter(tipo=tipo)
+    
+    for parametro, lookup in (('desde', 'fecha__date__gte'), ('hasta', 'fecha__date__lte')):
+        try:
+            fecha = parse_date(parametros.get(parametro) or '')
+        except ValueError:
+            fecha = None
+        if fecha:
+            historial = historial.filter(**{lookup: fecha})
+    
+    # Búsqueda
+    query = parametros.get('q')
+    if query:
+        historial = historial.filter(
+            Q(alumno__nombre__icontains=query) |
+            Q(alumno__matricula__icontains=query) |
+            Q(libro__titulo__icontains=query)
+        )
+    
+    return historial, query
@@ -1,6 +1,58 @@
+from urllib.parse import urlencode
+
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
 from .models import Libro, Prestamo, Multa
 
+
+class SelectAutocompletar(forms.Select):
+    """
+    Select para ``ModelChoiceField`` que solo incluye la opción elegida; las
+    demás se buscan en ``api_autocompletar`` mientras se escribe
+    (app1/js/autocompletar.js), sin recorrer el queryset del campo.
+    """
+
+    class Media:
+        js = ['app1/js/autocompletar.js']
+
+    def __init__(self, tipo, parametros=None, attrs=None):
+        super().__init__(attrs)
+        self.tipo = tipo
+        self.parametros = parametros or {}
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        url = reverse('api_autocompletar', args=[self.tipo])
+        if self.parametros:
+            url = f'{url}?{urlencode(self.parametros)}'
+        context['widget']['attrs']['data-autocompletar'] = url
+        return context
+
+    def _opciones_elegidas(self, valores):
+        campo = self.choices.field
+        opciones = []
+        if campo.empty_label is not None:
+            opciones.append(('', campo.empty_label))
+        elegidos = [valor for valor in valores if valor not in (None, '')]
+        if elegidos:
+            try:
+                objetos = list(campo.queryset.filter(pk__in=elegidos))
+            except (ValueError, ValidationError):
+                objetos = []
+            opciones += [(campo.prepare_value(obj), campo.label_from_instance(obj)) for obj in objetos]
+        return opciones
+
+    def optgroups(self, name, value, attrs=None):
+        todas = self.choices
+        self.choices = self._opciones_elegidas(value)
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = todas
+
+
 class LibroForm(forms.ModelForm):
     class Meta:
         model = Libro
@@ -89,6 +141,28 @@ class LibroForm(forms.ModelForm):
 
 
 class PrestamoForm(forms.ModelForm):
+    # Datos del alumno: se guardan en Alumno (ver app1/alumnos.py)
+    alumno_nombre = forms.CharField(max_length=200, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Nombre completo del alumno'
+    }))
+    alumno_matricula = forms.CharField(max_length=50, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Matrícula del alumno'
+    }))
+    alumno_grado = forms.CharField(max_length=50, required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Ejemplo: 3ro'
+    }))
+    alumno_grupo = forms.CharField(max_length=10, required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Ejemplo: A'
+    }))
+    alumno_telefono = forms.CharField(max_length=15, required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Teléfono de contacto'
+    }))
+    
     class Meta:
         model = Prestamo
         fields = [
@@ -97,29 +171,9 @@ class PrestamoForm(forms.ModelForm):
             'fecha_vencimiento', 'notas_prestamo'
         ]
         widgets = {
-            'libro': forms.Select(attrs={
+            'libro': SelectAutocompletar('libros', {'disponible': 1}, attrs={
                 'class': 'form-control'
             }),
-            'alumno_nombre': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Nombre completo del alumno'
-            }),
-            'alumno_matricula': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Matrícula del alumno'
-            }),
-            'alumno_grado': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Ejemplo: 3ro'
-            }),
-            'alumno_grupo': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Ejemplo: A'
-            }),
-            'alumno_telefono': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Teléfono de contacto'
-            }),
             'fecha_vencimiento': forms.DateInput(attrs={
                 'class': 'form-control',
                 'type': 'date'
@@ -135,6 +189,17 @@ class PrestamoForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Mostrar solo libros disponibles
         self.fields['libro'].queryset = Libro.objects.filter(disponible=True)
+    
+    def datos_alumno(self):
+        """Datos para ``alumnos.registrar``"""
+        datos = self.cleaned_data
+        return {
+            'matricula': datos['alumno_matricula'],
+            'nombre': datos['alumno_nombre'],
+            'grado': datos['alumno_grado'] or None,
+            'grupo': datos['alumno_grupo'] or None,
+            'telefono': datos['alumno_telefono'] or None,
+        }
 
 
 class DevolucionForm(forms.Form):
@@ -151,6 +216,15 @@ class DevolucionForm(forms.Form):
 
 
 class MultaForm(forms.ModelForm):
+    alumno_nombre = forms.CharField(max_length=200, label='Nombre del Alumno', widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Nombre completo del alumno'
+    }))
+    alumno_matricula = forms.CharField(max_length=50, label='Matrícula', widget=forms.TextInput(attrs={
+        'class': 'form-control',
+        'placeholder': 'Matrícula del alumno'
+    }))
+    
     class Meta:
         model = Multa
         fields = [
@@ -158,20 +232,12 @@ class MultaForm(forms.ModelForm):
             'tipo', 'monto', 'descripcion'
         ]
         widgets = {
-            'prestamo': forms.Select(attrs={
+            'prestamo': SelectAutocompletar('prestamos', attrs={
                 'class': 'form-control'
             }),
-            'libro': forms.Select(attrs={
+            'libro': SelectAutocompletar('libros', attrs={
                 'class': 'form-control'
             }),
-            'alumno_nombre': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Nombre completo del alumno'
-            }),
-            'alumno_matricula': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Matrícula del alumno'
-            }),
             'tipo': forms.Select(attrs={
                 'class': 'form-control'
             }),
@@ -189,9 +255,35 @@ class MultaForm(forms.ModelForm):
         labels = {
             'prestamo': 'Préstamo (opcional)',
             'libro': 'Libro (opcional)',
-            'alumno_nombre': 'Nombre del Alumno',
-            'alumno_matricula': 'Matrícula',
             'tipo': 'Tipo de Multa',
             'monto': 'Monto',
             'descripcion': 'Descripción',
-        }
\ No newline at end of file
+        }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # El texto del préstamo usa su libro y su alumno
+        self.fields['prestamo'].queryset = Prestamo.objects.select_related('libro', 'alumno')
+
+
+class LibroImportacionForm(LibroForm):
+    """
+    Valida una fila de la importación masiva con las mismas reglas que LibroForm.
+    La unicidad de ``codigo_inventario`` se revisa por lote en ``importacion``.
+    """
+    class Meta(LibroForm.Meta):
+        fields = [campo for campo in LibroForm.Meta.fields if campo != 'portada']
+
+    def validate_unique(self):
+        pass
+
+
+class ImportarLibrosForm(forms.Form):
+    """Formulario para subir el archivo de la importación masiva"""
+    archivo = forms.FileField(
+        widget=forms.FileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx'
+        }),
+        label='Archivo CSV o XLSX'
+    )
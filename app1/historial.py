@@ -0,0 +1,150 @@
+# app1/historial.py
+"""
+Archivo y resumen diario del historial de movimientos.
+
+``HistorialMovimiento`` solo crece. Para que la página de inicio, el admin
+y las búsquedas recorran una tabla acotada, ``archivar_historial`` (cron
+diario) hace dos cosas:
+
+* ``resumir`` cuenta los movimientos de cada día cerrado por tipo en
+  ``ResumenMovimientos``, que el admin muestra y ``conteos`` consulta sin
+  importar cuántos movimientos haya; los días sin resumir se cuentan en
+  vivo.
+* ``archivar`` mueve a ``HistorialArchivado`` (tabla fría, mismas columnas
+  e ids) los movimientos de más de ``HISTORIAL_DIAS_ACTIVO`` días, por
+  lotes, cada uno en su transacción.
+
+``unir`` y ``movimientos`` consultan las dos tablas como si fueran una
+(``UNION ALL`` ordenado por fecha), para la exportación y cualquier
+consulta que necesite el historial completo.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import HistorialMovimiento, HistorialArchivado, ResumenMovimientos
+
+DIAS_ACTIVO = 180
+TAMANO_LOTE = 1000
+
+CAMPOS = ['id', 'tipo', 'libro_id', 'prestamo_id', 'alumno_id', 'descripcion', 'usuario_responsable', 'fecha']
+
+
+def dias_activo():
+    return getattr(settings, 'HISTORIAL_DIAS_ACTIVO', DIAS_ACTIVO)
+
+
+def _inicio(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def ultimo_resumido():
+    return ResumenMovimientos.objects.aggregate(ultimo=Max('fecha'))['ultimo']
+
+
+def _contar(movimientos):
+    return (
+        movimientos.annotate(dia=TruncDate('fecha'))
+        .order_by()
+        .values_list('dia', 'tipo')
+        .annotate(total=Count('id'))
+    )
+
+
+@transaction.atomic
+def resumir(hoy=None):
+    """
+    Cuenta por tipo los días cerrados que faltan en ``ResumenMovimientos``.
+    El último día resumido se vuelve a contar por si llegaron movimientos
+    después (la bitácora escribe con unos segundos de retraso). Devuelve
+    cuántos días quedaron resumidos.
+    """
+    hoy = hoy or timezone.localdate()
+    ultimo = ultimo_resumido()
+    movimientos = HistorialMovimiento.objects.filter(fecha__lt=_inicio(hoy))
+    if ultimo is not None:
+        movimientos = movimientos.filter(fecha__gte=_inicio(ultimo))
+        ResumenMovimientos.objects.filter(fecha__gte=ultimo).delete()
+    filas = [
+        ResumenMovimientos(fecha=dia, tipo=tipo, total=total)
+        for dia, tipo, total in _contar(movimientos)
+    ]
+    ResumenMovimientos.objects.bulk_create(filas)
+    return len({fila.fecha for fila in filas})
+
+
+def archivar(dias=None, hoy=None):
+    """
+    Mueve a ``HistorialArchivado`` los movimientos de más de ``dias`` días
+    ya resumidos. Cada lote se copia y se borra en la misma transacción,
+    así que interrumpirlo no duplica ni pierde movimientos. Devuelve
+    cuántos movimientos se archivaron.
+    """
+    dias = dias_activo() if dias is None else dias
+    hoy = hoy or timezone.localdate()
+    ultimo = ultimo_resumido()
+    if ultimo is None:
+        return 0
+    # Solo días que ya no se vuelven a resumir
+    limite = min(_inicio(hoy - timedelta(days=dias)), _inicio(ultimo))
+
+    archivados = 0
+    while True:
+        with transaction.atomic():
+            filas = list(
+                HistorialMovimiento.objects.filter(fecha__lt=limite)
+                .order_by('fecha')
+                .values(*CAMPOS)[:TAMANO_LOTE]
+            )
+            if not filas:
+                return archivados
+            HistorialArchivado.objects.bulk_create([HistorialArchivado(**fila) for fila in filas])
+            HistorialMovimiento.objects.filter(pk__in=[fila['id'] for fila in filas]).delete()
+        archivados += len(filas)
+
+
+def conteos(desde, hasta):
+    """
+    ``{dia: {tipo: total}}`` entre ``desde`` y ``hasta`` (fechas,
+    inclusive): los días resumidos salen de ``ResumenMovimientos`` y los
+    demás se cuentan en la tabla activa.
+    """
+    ultimo = ultimo_resumido()
+    resultado = {}
+    resumen = ResumenMovimientos.objects.filter(fecha__range=(desde, hasta)).values_list('fecha', 'tipo', 'total')
+    en_vivo = HistorialMovimiento.objects.filter(fecha__lt=_inicio(hasta + timedelta(days=1)))
+    if ultimo is not None:
+        en_vivo = en_vivo.filter(fecha__gte=_inicio(max(desde, ultimo + timedelta(days=1))))
+    else:
+        en_vivo = en_vivo.filter(fecha__gte=_inicio(desde))
+    for dia, tipo, total in list(resumen) + list(_contar(en_vivo)):
+        resultado.setdefault(dia, {})[tipo] = total
+    return dict(sorted(resultado.items()))
+
+
+def unir(activos, archivados, campos):
+    """
+    ``values_list`` de ``campos`` de los movimientos activos y archivados
+    (cada queryset ya filtrado), los más recientes primero. Los filtros
+    van antes porque no se pueden aplicar a una unión.
+    """
+    orden = ['-fecha'] + (['-id'] if 'id' in campos else [])
+    return (
+        activos.order_by().values_list(*campos)
+        .union(archivados.order_by().values_list(*campos), all=True)
+        .order_by(*orden)
+    )
+
+
+def movimientos(filtrar=None, campos=CAMPOS):
+    """Historial completo; ``filtrar`` recibe cada queryset y devuelve el filtrado"""
+    activos = HistorialMovimiento.objects.all()
+    archivados = HistorialArchivado.objects.all()
+    if filtrar is not None:
+        activos = filtrar(activos)
+        archivados = filtrar(archivados)
+    return unir(activos, archivados, campos)
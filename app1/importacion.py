@@ -0,0 +1,223 @@
+# app1/importacion.py
+"""
+Importación masiva del catálogo de libros desde CSV o XLSX.
+
+El archivo se lee fila por fila (``csv`` o ``openpyxl`` en modo de solo
+lectura) y se procesa en lotes: cada fila se valida con las reglas de
+``LibroForm``, se descartan los códigos de inventario repetidos (dentro del
+archivo y contra la base de datos) y los libros válidos se insertan con
+``bulk_create`` junto con sus movimientos de alta, un lote por transacción.
+
+Como ``bulk_create`` no dispara señales, aquí mismo se actualizan el índice
+de búsqueda y los contadores del dashboard.
+"""
+import csv
+import io
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+import openpyxl
+from django.db import transaction
+
+from .busqueda import normalizar
+from .forms import LibroImportacionForm
+from .models import Libro, HistorialMovimiento
+from . import busqueda
+from . import estadisticas
+
+TAMANO_LOTE = 500
+FORMATOS = ('.csv', '.xlsx')
+MAX_DETALLES = 100
+
+
+class ResultadoImportacion:
+    """Resumen de una importación: filas leídas, creadas, duplicadas y con error."""
+
+    def __init__(self):
+        self.leidas = 0
+        self.creados = 0
+        self.duplicados = 0
+        self.invalidas = 0
+        self.detalles = []
+        self.segundos = 0.0
+
+    def anotar(self, fila, mensaje):
+        if len(self.detalles) < MAX_DETALLES:
+            self.detalles.append((fila, mensaje))
+
+    @property
+    def omitidas(self):
+        return self.duplicados + self.invalidas
+
+    @property
+    def filas_por_segundo(self):
+        return self.leidas / self.segundos if self.segundos else 0.0
+
+
+def _columnas():
+    """Encabezados aceptados (nombre del campo o etiqueta, sin acentos) -> campo."""
+    columnas = {}
+    for nombre, campo in LibroImportacionForm.base_fields.items():
+        columnas[nombre] = nombre
+        columnas[normalizar(str(campo.label)).strip()] = nombre
+    return columnas
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    primera = texto.readline()
+    # Excel en español guarda los CSV separados por punto y coma
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    yield next(csv.reader([primera], delimiter=delimitador), [])
+    yield from csv.reader(texto, delimiter=delimitador)
+
+
+def _filas_xlsx(archivo):
+    libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera ``(numero_de_fila, datos)`` para cada fila no vacía del archivo.
+
+    La primera fila debe traer los encabezados; las columnas que no
+    correspondan a un campo de ``LibroForm`` se ignoran.
+    """
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == '.csv':
+        filas = _filas_csv(archivo)
+    elif extension == '.xlsx':
+        filas = _filas_xlsx(archivo)
+    else:
+        raise ValueError(f'Formato no soportado: use un archivo {" o ".join(FORMATOS)}.')
+
+    aceptadas = _columnas()
+    encabezados = [aceptadas.get(normalizar(_texto(celda))) for celda in next(filas, [])]
+    if 'codigo_inventario' not in encabezados:
+        raise ValueError('El archivo no tiene la columna codigo_inventario.')
+
+    for numero, fila in enumerate(filas, start=2):
+        datos = {
+            campo: _texto(valor)
+            for campo, valor in zip(encabezados, fila)
+            if campo
+        }
+        if any(datos.values()):
+            yield numero, datos
+
+
+def _con_predeterminados(datos):
+    """Completa las celdas vacías con el valor por defecto del modelo."""
+    datos = dict(datos)
+    for nombre in LibroImportacionForm.base_fields:
+        campo = Libro._meta.get_field(nombre)
+        if not datos.get(nombre) and campo.has_default():
+            datos[nombre] = campo.get_default()
+    return datos
+
+
+def _asignar_ids(libros):
+    """Recupera los ids si el motor no los devuelve desde ``bulk_create``."""
+    if not libros or libros[0].pk is not None:
+        return
+    ids = dict(
+        Libro.objects.filter(codigo_inventario__in=[libro.codigo_inventario for libro in libros])
+        .values_list('codigo_inventario', 'id')
+    )
+    for libro in libros:
+        libro.pk = ids[libro.codigo_inventario]
+
+
+def _procesar_lote(lote, vistos, usuario, resultado):
+    candidatos = []
+    for numero, datos in lote:
+        form = LibroImportacionForm(_con_predeterminados(datos))
+        if not form.is_valid():
+            resultado.invalidas += 1
+            errores = '; '.join(
+                f'{campo}: {" ".join(mensajes)}' for campo, mensajes in form.errors.items()
+            )
+            resultado.anotar(numero, errores)
+            continue
+        libro = form.save(commit=False)
+        if libro.codigo_inventario in vistos:
+            resultado.duplicados += 1
+            resultado.anotar(numero, f'Código {libro.codigo_inventario} repetido en el archivo.')
+            continue
+        vistos.add(libro.codigo_inventario)
+        candidatos.append((numero, libro))
+
+    with transaction.atomic():
+        existentes = set(
+            Libro.objects.filter(codigo_inventario__in=[libro.codigo_inventario for _, libro in candidatos])
+            .values_list('codigo_inventario', flat=True)
+        )
+        nuevos = []
+        for numero, libro in candidatos:
+            if libro.codigo_inventario in existentes:
+                resultado.duplicados += 1
+                resultado.anotar(numero, f'Código {libro.codigo_inventario} ya registrado.')
+            else:
+                nuevos.append(libro)
+        if not nuevos:
+            return
+
+        creados = Libro.objects.bulk_create(nuevos)
+        _asignar_ids(creados)
+        HistorialMovimiento.objects.bulk_create([
+            HistorialMovimiento(
+                tipo='alta',
+                libro=libro,
+                descripcion=f'Alta de libro: {libro.titulo}',
+                usuario_responsable=usuario,
+            )
+            for libro in creados
+        ])
+        busqueda.indexar_libros(creados)
+
+        cambios = Counter({
+            estadisticas.LIBROS: len(creados),
+            estadisticas.LIBROS_DISPONIBLES: sum(1 for libro in creados if libro.disponible),
+        })
+        cambios.update(estadisticas.clave_categoria(libro.categoria) for libro in creados)
+        estadisticas.ajustar(cambios)
+        resultado.creados += len(creados)
+
+
+def importar(archivo, nombre, usuario='Sistema', tamano_lote=TAMANO_LOTE, al_procesar_lote=None):
+    """
+    Importa los libros de ``archivo`` (abierto en binario); ``nombre`` indica
+    el formato por su extensión. Devuelve un ``ResultadoImportacion``.
+
+    ``al_procesar_lote`` se llama con el resultado parcial después de cada
+    lote, para mostrar el avance.
+    """
+    resultado = ResultadoImportacion()
+    vistos = set()
+    inicio = time.perf_counter()
+    filas = leer_filas(archivo, nombre)
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        resultado.leidas += len(lote)
+        _procesar_lote(lote, vistos, usuario, resultado)
+        resultado.segundos = time.perf_counter() - inicio
+        if al_procesar_lote:
+            al_procesar_lote(resultado)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app1 import historial
+
+
+class Command(BaseCommand):
+    help = 'Resume el historial por día y tipo y archiva los movimientos antiguos (programar con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int,
+            help=f'Antigüedad en días a partir de la cual se archiva (por defecto HISTORIAL_DIAS_ACTIVO, {historial.DIAS_ACTIVO})',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        dias = historial.resumir()
+        archivados = historial.archivar(options['dias'])
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{dias} día(s) resumido(s); {archivados} movimiento(s) archivado(s) en {duracion:.1f} s'
+        ))
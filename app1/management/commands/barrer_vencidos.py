@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from app1 import vencimientos
+
+
+class Command(BaseCommand):
+    help = 'Marca como vencidos los préstamos atrasados y actualiza su multa acumulada (programar con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de corte AAAA-MM-DD (por defecto hoy)')
+
+    def handle(self, *args, **options):
+        hoy = None
+        if options['fecha']:
+            try:
+                hoy = parse_date(options['fecha'])
+            except ValueError:
+                hoy = None
+            if hoy is None:
+                raise CommandError('La fecha debe tener el formato AAAA-MM-DD.')
+
+        inicio = time.monotonic()
+        nuevos, actualizados = vencimientos.barrer_vencidos(hoy)
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{nuevos} préstamo(s) marcados como vencidos; {actualizados} con multa actualizada '
+            f'en {duracion:.1f} s'
+        ))
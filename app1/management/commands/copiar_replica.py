@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app1 import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base SQLite primaria sobre la réplica (DB_REPLICA_NAME) para probar '
+        'la réplica de lectura localmente; con --cada la mantiene al día'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cada', type=float, metavar='SEGUNDOS',
+                            help='Repite la copia cada tantos segundos hasta interrumpirla')
+
+    def handle(self, *args, **options):
+        if not replicas.hay_replica():
+            raise CommandError('No hay réplica configurada: definir DB_REPLICA_NAME.')
+        if {connections[replicas.PRIMARIA].vendor, connections[replicas.REPLICA].vendor} != {'sqlite'}:
+            raise CommandError('Solo para SQLite; en MySQL o PostgreSQL la réplica la mantiene el servidor.')
+
+        try:
+            while True:
+                inicio = time.monotonic()
+                replicas.copiar_sqlite()
+                self.stdout.write(self.style.SUCCESS(f'Réplica copiada en {time.monotonic() - inicio:.2f} s'))
+                if not options['cada']:
+                    return
+                time.sleep(options['cada'])
+        except KeyboardInterrupt:
+            self.stdout.write('Copia detenida.')
@@ -0,0 +1,140 @@
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from app1 import bitacora, circulacion, datos_prueba
+
+PREFIJO = 'EST'
+
+
+def _trabajar(numero, operaciones, codigos, resultados):
+    """
+    Presta un libro al azar del lote y lo devuelve en la siguiente vuelta,
+    como un mostrador; lo que no se pudo devolver se reintenta.
+    """
+    generador = random.Random(numero)
+    matricula = f'{PREFIJO}{numero:07d}'
+    conteo = Counter()
+    prestados = []
+    for vuelta in range(operaciones + 1):
+        try:
+            if prestados:
+                circulacion.devolver_lote(prestados)
+                conteo['operaciones'] += len(prestados)
+                prestados = []
+            if vuelta == operaciones:
+                break
+            codigo = generador.choice(codigos)
+            circulacion.prestar_lote(matricula, [codigo])
+            conteo['operaciones'] += 1
+            prestados = [codigo]
+        except circulacion.ErrorCirculacion:
+            conteo['rechazos'] += 1  # otro proceso tenía el libro: es lo esperado
+        except OperationalError as error:
+            conteo['bloqueos' if 'locked' in str(error) else 'errores'] += 1
+    # multiprocessing termina el hijo con os._exit: el atexit de la bitácora no corre
+    bitacora.vaciar()
+    conteo['historial_sin_escribir'] = bitacora.pendientes()
+    connections.close_all()
+    resultados.put(conteo)
+
+
+@contextmanager
+def base_temporal():
+    """
+    Apunta la conexión ``default`` a una base SQLite vacía y migrada en un
+    directorio temporal mientras dura el bloque; al salir la borra
+    (con sus archivos -wal y -shm) y regresa a la base de settings.
+    """
+    ajustes = connection.settings_dict
+    original = ajustes['NAME']
+    directorio = tempfile.mkdtemp(prefix='estresar_circulacion_')
+    connections.close_all()
+    ajustes['NAME'] = str(Path(directorio) / 'estres.sqlite3')
+    try:
+        call_command('migrate', verbosity=0)
+        yield
+    finally:
+        connections.close_all()
+        ajustes['NAME'] = original
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Presta y devuelve libros desde varios procesos a la vez sobre SQLite y reporta operaciones '
+        'por segundo y errores "database is locked". Cada corrida usa una base SQLite nueva en un '
+        'directorio temporal que se borra al terminar; la base del proyecto no se toca'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=4)
+        parser.add_argument('--operaciones', type=int, default=200, help='Intentos de préstamo por proceso')
+        parser.add_argument('--libros', type=int, default=100)
+        parser.add_argument('--comparar', action='store_true',
+                            help='Corre primero sin las opciones de SQLite de settings (journal DELETE, '
+                                 'transacciones diferidas, timeout de 5 s)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Esta prueba es para SQLite.')
+        self.stdout.write(f'{"configuración":<16}{"ops/s":>8}{"operaciones":>13}{"rechazos":>10}'
+                          f'{"bloqueos":>10}{"errores":>9}{"segundos":>10}')
+        if options['comparar']:
+            self._correr('original', options, sin_ajustes=True)
+        self._correr('settings', options)
+
+    def _correr(self, nombre, options, sin_ajustes=False):
+        # Base nueva en cada corrida: una devolución fallida deja libros prestados
+        with base_temporal():
+            datos_prueba.sembrar(
+                options['libros'], prefijo=PREFIJO, num_alumnos=options['procesos'],
+                num_prestamos=0, num_movimientos=0,
+            )
+            self._medir(nombre, options, sin_ajustes)
+
+    def _medir(self, nombre, options, sin_ajustes):
+        codigos = [f'{PREFIJO}-{i:07d}' for i in range(options['libros'])]
+        ajustes = connection.settings_dict['OPTIONS']
+        if sin_ajustes:
+            connection.settings_dict['OPTIONS'] = {}
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+        # Los hijos abren sus propias conexiones
+        connections.close_all()
+
+        contexto = multiprocessing.get_context('fork')
+        resultados = contexto.Queue()
+        procesos = [
+            contexto.Process(target=_trabajar, args=(numero, options['operaciones'], codigos, resultados))
+            for numero in range(options['procesos'])
+        ]
+        inicio = time.monotonic()
+        for proceso in procesos:
+            proceso.start()
+        total = sum((resultados.get() for _ in procesos), Counter())
+        for proceso in procesos:
+            proceso.join()
+        segundos = time.monotonic() - inicio
+
+        connection.settings_dict['OPTIONS'] = ajustes
+        connections.close_all()
+
+        estilo = self.style.ERROR if total['bloqueos'] or total['errores'] else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f'{nombre:<16}{total["operaciones"] / segundos:>8.0f}{total["operaciones"]:>13}{total["rechazos"]:>10}'
+            f'{total["bloqueos"]:>10}{total["errores"]:>9}{segundos:>10.1f}'
+        ))
+        if total['historial_sin_escribir']:
+            self.stdout.write(self.style.ERROR(
+                f'{total["historial_sin_escribir"]} movimiento(s) del historial no se pudieron escribir'
+            ))
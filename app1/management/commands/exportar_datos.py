@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from app1 import exportacion
+
+
+class Command(BaseCommand):
+    help = 'Exporta préstamos, multas o historial a CSV o XLSX con los mismos filtros de las listas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(exportacion.EXPORTACIONES))
+        parser.add_argument('--formato', choices=exportacion.FORMATOS, default='csv')
+        parser.add_argument('--salida',
+                            help='Archivo de destino (por defecto el CSV se escribe en la salida estándar)')
+        parser.add_argument('--estado', help='Estado del préstamo o de la multa')
+        parser.add_argument('--activo', choices=['true', 'false'], help='Solo préstamos activos o inactivos')
+        parser.add_argument('--tipo-movimiento', dest='tipo_filtro',
+                            help='Tipo de multa o de movimiento del historial')
+        parser.add_argument('--desde', help='Fecha inicial del historial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha final del historial (AAAA-MM-DD)')
+        parser.add_argument('-q', '--buscar', dest='q', help='Texto a buscar (alumno, matrícula o libro)')
+
+    def handle(self, *args, **options):
+        datos = exportacion.EXPORTACIONES[options['tipo']]
+        parametros = {
+            'estado': options['estado'],
+            'activo': options['activo'],
+            'tipo': options['tipo_filtro'],
+            'desde': options['desde'],
+            'hasta': options['hasta'],
+            'q': options['q'],
+        }
+        salida = options['salida']
+
+        if options['formato'] == 'xlsx':
+            if not salida:
+                salida = f"{options['tipo']}.xlsx"
+            exportacion.escribir_xlsx(datos, parametros, salida)
+        elif salida:
+            with open(salida, 'w', encoding='utf-8', newline='') as destino:
+                exportacion.escribir_csv(datos, parametros, destino)
+        else:
+            exportacion.escribir_csv(datos, parametros, self.stdout)
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Exportación guardada en {salida}'))
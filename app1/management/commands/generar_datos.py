@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app1 import datos_prueba
+
+
+class Command(BaseCommand):
+    help = (
+        'Llena la base con datos sintéticos para medir rendimiento '
+        '(por omisión 100k libros, 1M préstamos, 200k multas y 2M movimientos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=100_000)
+        parser.add_argument('--alumnos', type=int, default=None, help='Por omisión uno por cada cinco libros')
+        parser.add_argument('--prestamos', type=int, default=1_000_000)
+        parser.add_argument('--multas', type=int, default=200_000)
+        parser.add_argument('--movimientos', type=int, default=2_000_000)
+        parser.add_argument('--prefijo', default=datos_prueba.PREFIJO,
+                            help='Prefijo de códigos y matrículas, para borrarlos después')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--borrar', action='store_true',
+                            help='Borra los datos con ese prefijo en lugar de generarlos')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options['borrar']:
+            borrados = datos_prueba.borrar(options['prefijo'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{borrados} libro(s) de prueba borrados con sus préstamos, multas y movimientos '
+                f'({time.monotonic() - inicio:.1f} s).'
+            ))
+            return
+
+        creados = datos_prueba.sembrar(
+            options['libros'],
+            prefijo=options['prefijo'],
+            semilla=options['semilla'],
+            num_alumnos=options['alumnos'],
+            num_prestamos=options['prestamos'],
+            num_multas=options['multas'],
+            num_movimientos=options['movimientos'],
+        )
+        for modelo, total in creados.items():
+            self.stdout.write(f'{modelo}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'Datos generados en {time.monotonic() - inicio:.1f} s.'))
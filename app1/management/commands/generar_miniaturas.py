@@ -0,0 +1,46 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from app1 import portadas
+from app1.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas que falten de las portadas y, con --deduplicar, renombra los originales por su hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deduplicar', action='store_true',
+            help='Pasa las portadas subidas antes al nombre por hash y borra las copias repetidas',
+        )
+
+    def handle(self, *args, **options):
+        nombres = (
+            Libro.objects.exclude(portada='').exclude(portada=None)
+            .order_by().values_list('portada', flat=True).distinct()
+        )
+        originales = renombrados = escritas = 0
+        for nombre in list(nombres):
+            if options['deduplicar'] and not portadas.es_nombre_hash(nombre):
+                try:
+                    nuevo = portadas.deduplicar(nombre)
+                except OSError as error:
+                    # Sin la copia por hash los libros se quedan con el nombre anterior
+                    self.stderr.write(f'{nombre}: {error}')
+                    continue
+                # update() no dispara las señales: la portada no cambia nada más
+                Libro.objects.filter(portada=nombre).update(portada=nuevo)
+                default_storage.delete(nombre)
+                portadas.borrar_miniaturas(nombre)
+                nombre = nuevo
+                renombrados += 1
+            try:
+                escritas += portadas.generar_miniaturas(nombre)
+            except OSError as error:
+                self.stderr.write(f'{nombre}: {error}')
+                continue
+            originales += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'{originales} portada(s) revisada(s), {escritas} miniatura(s) generada(s), '
+            f'{renombrados} renombrada(s) por hash'
+        ))
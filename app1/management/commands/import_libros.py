@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app1 import importacion
+
+
+class Command(BaseCommand):
+    help = 'Importa libros en forma masiva desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument('--lote', type=int, default=importacion.TAMANO_LOTE,
+                            help='Filas por lote (una transacción por lote)')
+        parser.add_argument('--usuario', default='Sistema',
+                            help='Responsable que se registra en el historial')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+
+        def avance(resultado):
+            self.stdout.write(
+                f'{resultado.leidas} filas leídas, {resultado.creados} creadas '
+                f'({resultado.filas_por_segundo:.0f} filas/s)'
+            )
+
+        try:
+            with open(ruta, 'rb') as archivo:
+                resultado = importacion.importar(
+                    archivo, ruta, usuario=options['usuario'],
+                    tamano_lote=options['lote'], al_procesar_lote=avance,
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for fila, mensaje in resultado.detalles:
+            self.stdout.write(self.style.WARNING(f'Fila {fila}: {mensaje}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creados} libro(s) importado(s) de {resultado.leidas} fila(s); '
+            f'{resultado.duplicados} duplicada(s), {resultado.invalidas} con error. '
+            f'{resultado.segundos:.2f} s ({resultado.filas_por_segundo:.0f} filas/s)'
+        ))
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app1 import rendimiento
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide p50/p95, consultas y pico de memoria de cada ruta de app1, guarda el resultado en JSON '
+        'y, con --comparar, falla si hay regresiones respecto a una medición anterior'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', default='rendimiento.json')
+        parser.add_argument('--comparar', metavar='ANTERIOR', help='JSON de una medición anterior')
+        parser.add_argument('--repeticiones', type=int, default=rendimiento.REPETICIONES)
+        parser.add_argument('--max-segundos', type=float, default=rendimiento.MAX_SEGUNDOS,
+                            help='Tiempo máximo por ruta (se toman al menos 3 muestras)')
+        parser.add_argument('--tolerancia', type=float, default=rendimiento.TOLERANCIA)
+        parser.add_argument('--rutas', nargs='+', metavar='NOMBRE', help='Solo estas rutas')
+
+    def handle(self, *args, **options):
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    anterior = json.load(archivo)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {error}')
+
+        self.stdout.write(f'{"ruta":<24}{"estado":>7}{"p50 ms":>10}{"p95 ms":>10}{"consultas":>11}{"memoria KB":>12}')
+        resultado = rendimiento.medir(
+            options['repeticiones'], options['max_segundos'], options['rutas'], progreso=self._mostrar
+        )
+        for nombre, error in resultado['errores'].items():
+            self.stdout.write(self.style.ERROR(f'{nombre}: {error}'))
+        for nombre, motivo in resultado['omitidas'].items():
+            self.stdout.write(self.style.WARNING(f'{nombre}: omitida ({motivo})'))
+
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Resultado guardado en {options["salida"]}')
+
+        if anterior is None:
+            return
+        if anterior.get('registros') != resultado['registros']:
+            self.stdout.write(self.style.WARNING(
+                f'Las mediciones son sobre volúmenes distintos: {anterior.get("registros")} y {resultado["registros"]}'
+            ))
+        regresiones = rendimiento.comparar(anterior, resultado, options['tolerancia'])
+        if regresiones:
+            for nombre, metrica, antes, despues in regresiones:
+                self.stdout.write(self.style.ERROR(f'{nombre}: {metrica} {antes} → {despues}'))
+            raise CommandError(f'{len(regresiones)} regresión(es) respecto a {options["comparar"]}')
+        self.stdout.write(self.style.SUCCESS(f'Sin regresiones respecto a {options["comparar"]}.'))
+
+    def _mostrar(self, nombre, datos):
+        self.stdout.write(
+            f'{nombre:<24}{datos["estado"]:>7}{datos["p50_ms"]:>10}{datos["p95_ms"]:>10}'
+            f'{datos["consultas"]:>11}{datos["memoria_kb"]:>12}'
+        )
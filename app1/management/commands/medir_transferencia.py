@@ -0,0 +1,121 @@
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, RequestFactory
+from django.views.static import serve
+
+from app1 import archivos
+
+NAVEGADOR = {'HTTP_ACCEPT_ENCODING': 'gzip, deflate, br'}
+DENSIDAD = 2  # pantalla "retina": el navegador elige la imagen de 2x
+
+
+class _Recursos(HTMLParser):
+    """URLs que un navegador descargaría al mostrar la página"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+        self._picture = None
+
+    def _elegir(self, srcset, sizes):
+        candidatos = []
+        for candidato in srcset.split(','):
+            url, _, ancho = candidato.strip().partition(' ')
+            candidatos.append((int(ancho.strip().rstrip('w') or 0), url))
+        candidatos.sort()
+        coincidencia = re.match(r'(\d+)px', sizes or '')
+        necesario = int(coincidencia.group(1)) * DENSIDAD if coincidencia else candidatos[-1][0]
+        for ancho, url in candidatos:
+            if ancho >= necesario:
+                return url
+        return candidatos[-1][1]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'picture':
+            self._picture = []
+        elif tag == 'source' and self._picture is not None and attrs.get('srcset'):
+            self._picture.append(self._elegir(attrs['srcset'], attrs.get('sizes')))
+        elif tag == 'img':
+            if self._picture:
+                # El navegador usa el primer <source> que soporta (WebP)
+                self.urls.append(self._picture[0])
+            elif attrs.get('srcset'):
+                self.urls.append(self._elegir(attrs['srcset'], attrs.get('sizes')))
+            elif attrs.get('src'):
+                self.urls.append(attrs['src'])
+        elif tag == 'link' and attrs.get('rel') == 'stylesheet' and attrs.get('href'):
+            self.urls.append(attrs['href'])
+        elif tag == 'script' and attrs.get('src'):
+            self.urls.append(attrs['src'])
+
+    def handle_endtag(self, tag):
+        if tag == 'picture':
+            self._picture = None
+
+
+def _bytes(response):
+    cuerpo = b''.join(response.streaming_content) if response.streaming else response.content
+    cabeceras = sum(len(nombre) + len(valor) + 4 for nombre, valor in response.items())
+    return len(cuerpo) + cabeceras
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los bytes de estáticos y portadas que descarga un navegador en la primera visita '
+        'y en una repetida, con django.views.static.serve y con app1.archivos (correr collectstatic antes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', default=['/', '/libros/', '/libros/disponibles/'])
+
+    def handle(self, *args, **options):
+        cliente = Client()
+        recursos = []
+        for url in options['urls']:
+            parser = _Recursos()
+            parser.feed(cliente.get(url).content.decode())
+            recursos.extend(parser.urls)
+        locales = []
+        for url in dict.fromkeys(recursos):
+            if url.startswith(settings.STATIC_URL) or url.startswith(settings.MEDIA_URL):
+                locales.append(url)
+
+        self.stdout.write(f'{len(locales)} recurso(s) local(es) en {len(options["urls"])} página(s)')
+        self.stdout.write(f'{"servidor":<14}{"visita":<12}{"peticiones":>12}{"bytes":>12}')
+        for nombre, vista in [('static.serve', self._serve), ('archivos', self._archivos)]:
+            cache = {}
+            for visita in ('primera', 'repetida'):
+                peticiones = total = 0
+                for url in locales:
+                    anterior = cache.get(url)
+                    if anterior is not None and 'immutable' in anterior.get('Cache-Control', ''):
+                        continue  # la copia del navegador sigue vigente: ni siquiera se pregunta
+                    condiciones = {}
+                    if anterior is not None and anterior.has_header('ETag'):
+                        condiciones['HTTP_IF_NONE_MATCH'] = anterior['ETag']
+                    elif anterior is not None and anterior.has_header('Last-Modified'):
+                        condiciones['HTTP_IF_MODIFIED_SINCE'] = anterior['Last-Modified']
+                    response = vista(url, {**NAVEGADOR, **condiciones})
+                    peticiones += 1
+                    total += _bytes(response)
+                    if response.status_code == 200:
+                        cache[url] = response
+                self.stdout.write(f'{nombre:<14}{visita:<12}{peticiones:>12}{total:>12}')
+
+    def _serve(self, url, cabeceras):
+        """Lo que hacía biblioteca/urls.py con DEBUG: sin compresión ni Cache-Control"""
+        if url.startswith(settings.STATIC_URL):
+            ruta, raiz = url[len(settings.STATIC_URL):], settings.STATIC_ROOT
+        else:
+            ruta, raiz = url[len(settings.MEDIA_URL):], settings.MEDIA_ROOT
+        return serve(RequestFactory().get(url, **cabeceras), ruta, document_root=raiz)
+
+    def _archivos(self, url, cabeceras):
+        request = RequestFactory().get(url, **cabeceras)
+        if url.startswith(settings.STATIC_URL):
+            return archivos.servir_estatico(request, url[len(settings.STATIC_URL):])
+        return archivos.servir_media(request, url[len(settings.MEDIA_URL):])
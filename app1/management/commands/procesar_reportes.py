@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app1 import trabajos
+
+
+class Command(BaseCommand):
+    help = 'Worker que genera en segundo plano los reportes PDF en cola'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los trabajos pendientes y termina')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Esperando reportes en cola...')
+        try:
+            while True:
+                trabajo = trabajos.tomar_siguiente()
+                if trabajo is None:
+                    if options['una_vez']:
+                        return
+                    time.sleep(options['intervalo'])
+                    continue
+
+                inicio = time.monotonic()
+                trabajos.procesar(trabajo)
+                duracion = time.monotonic() - inicio
+                if trabajo.estado == 'terminado':
+                    self.stdout.write(self.style.SUCCESS(f'{trabajo} en {duracion:.1f} s'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'{trabajo}: {trabajo.error}'))
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
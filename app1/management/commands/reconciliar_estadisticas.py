@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app1 import estadisticas
+from app1 import alumnos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores del dashboard y los contadores de los alumnos contra las tablas reales (programar con cron)'
+
+    def handle(self, *args, **options):
+        diferencias = estadisticas.reconciliar()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Los contadores ya estaban al día.'))
+        else:
+            for clave, (anterior, actual) in sorted(diferencias.items()):
+                self.stdout.write(f'{clave}: {anterior} -> {actual}')
+            self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} contador(es) corregido(s).'))
+
+        corregidas = alumnos.reconciliar()
+        if not corregidas:
+            self.stdout.write(self.style.SUCCESS('Los contadores de los alumnos ya estaban al día.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(corregidas)} alumno(s) corregido(s).'))
@@ -0,0 +1,80 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app1 import trabajos
+from app1.models import Alumno, Libro, Prestamo, Multa, HistorialMovimiento
+
+
+def consultas_frecuentes():
+    """Consultas de las vistas que deben resolverse con un índice"""
+    hoy = timezone.now().date()
+    return [
+        ('home: préstamos por vencer', Prestamo.objects.filter(
+            activo=True,
+            fecha_vencimiento__lte=hoy + timedelta(days=3),
+            fecha_vencimiento__gte=hoy,
+        ).order_by()),
+        ('home: últimos movimientos', HistorialMovimiento.objects.all()[:10]),
+        ('archivar_historial: movimientos antiguos', HistorialMovimiento.objects.filter(
+            fecha__lt=timezone.now() - timedelta(days=180)
+        ).order_by('fecha').values('id')[:1000]),
+        ('lista_libros: primera página', Libro.objects.order_by('-creado_en', '-id')[:26]),
+        ('libros_disponibles: por categoría', Libro.objects.filter(
+            disponible=True, categoria='ficcion'
+        ).order_by()),
+        ('lista_prestamos: primera página', Prestamo.objects.order_by('-fecha_prestamo', '-id')[:26]),
+        ('lista_prestamos: vencidos', Prestamo.objects.filter(
+            activo=True, fecha_vencimiento__lt=hoy
+        ).order_by()),
+        ('libros_prestados: préstamo activo', Prestamo.objects.filter(
+            activo=True, libro_id__in=[1, 2, 3]
+        ).order_by()),
+        ('crear_prestamo: contadores del alumno', Alumno.objects.filter(matricula='0000')),
+        ('alumno: préstamos activos', Prestamo.objects.filter(
+            alumno='0000', activo=True
+        ).order_by()),
+        ('alumno: multas pendientes', Multa.objects.filter(
+            alumno='0000', estado='pendiente'
+        ).order_by()),
+        ('lista_multas: primera página', Multa.objects.order_by('-fecha_multa', '-id')[:26]),
+    ] + [
+        (f'huella de reportes: último cambio en {modelo._meta.label}', trabajos.ultimo_cambio(modelo)[:1])
+        for modelo in (Libro, Prestamo, Alumno, Multa)
+    ]
+
+
+def recorre_tabla(plan):
+    """True si el plan lee una tabla completa o tiene que ordenar en memoria"""
+    for linea in plan.splitlines():
+        if re.search(r'\bSCAN \w+$', linea.strip()):
+            return True
+        if 'TEMP B-TREE' in linea:
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Verifica con EXPLAIN QUERY PLAN que las consultas frecuentes usan índices'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este comando solo interpreta planes de SQLite.')
+
+        fallas = []
+        for nombre, queryset in consultas_frecuentes():
+            plan = queryset.explain()
+            if recorre_tabla(plan):
+                fallas.append(nombre)
+                self.stdout.write(self.style.ERROR(f'✗ {nombre}'))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {nombre}'))
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+        if fallas:
+            raise CommandError(f'{len(fallas)} consulta(s) sin índice: {", ".join(fallas)}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app1 import metricas
+
+
+class Command(BaseCommand):
+    help = (
+        'Verifica que las vistas con @presupuesto no pasen de su número de consultas '
+        'con 10 y con 1000 registros de prueba (los datos se revierten al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[10, 1000])
+
+    def handle(self, *args, **options):
+        try:
+            resultados = metricas.verificar_presupuestos(options['tamanos'])
+        except metricas.PresupuestoExcedido as error:
+            raise CommandError(str(error))
+
+        presupuestos = {url: metricas.presupuesto_de(url) for url in resultados}
+        for url, por_tamano in resultados.items():
+            consultas = ', '.join(f'{tamano}: {total}' for tamano, total in por_tamano.items())
+            self.stdout.write(f'✓ {url} ({consultas}; presupuesto {presupuestos[url]})')
+        self.stdout.write(self.style.SUCCESS(f'{len(resultados)} vista(s) dentro de su presupuesto.'))
@@ -0,0 +1,28 @@
+# app1/memo.py
+"""
+Memo de valores con vida de una sola petición.
+
+``MemoPeticionMiddleware`` abre un diccionario vacío al empezar cada
+petición y lo descarta al terminar; ``memo_peticion()`` lo devuelve para
+que cualquier código guarde ahí lo que no debe calcularse dos veces en la
+misma petición. Fuera de una petición (comandos, shell) devuelve None.
+"""
+from contextvars import ContextVar
+
+_memo = ContextVar('app1_memo_peticion', default=None)
+
+
+def memo_peticion():
+    return _memo.get()
+
+
+class MemoPeticionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _memo.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _memo.reset(token)
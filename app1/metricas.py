@@ -0,0 +1,322 @@
+# app1/metricas.py
+"""
+Consultas SQL y tiempos por vista.
+
+``MetricasMiddleware`` instala un ``execute_wrapper`` en cada conexión
+mientras atiende la petición y cuenta las consultas y el tiempo que pasan
+en la base de datos; ``PlantillasMedidas`` (el backend de plantillas en
+settings) suma el tiempo de render. Al terminar:
+
+* la respuesta lleva ``Server-Timing`` (``sql``, ``plantilla``, ``total``),
+  que las herramientas de desarrollo del navegador muestran por petición;
+* los números se acumulan por nombre de vista (``resolver_match``) en este
+  proceso y la vista ``metricas`` los entrega en JSON.
+
+El tiempo de plantilla incluye las consultas que se hacen al recorrerla
+(querysets perezosos, ``.count`` en la plantilla). Las respuestas en flujo
+(CSV, archivos) se miden hasta que empiezan a enviarse.
+
+Las vistas declaran cuántas consultas deben hacer con ``@presupuesto(n)``.
+``verificar_presupuesto`` mide una URL con el cliente de pruebas y falla si
+se pasa; ``verificar_presupuestos`` lo hace con todas las vistas que tienen
+presupuesto, primero con 10 y luego con 1000 registros de
+``datos_prueba``, para detectar consultas que crecen con los datos (N+1).
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from statistics import quantiles
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import URLResolver, get_resolver, resolve
+
+logger = logging.getLogger(__name__)
+
+MUESTRAS = 500
+METODOS_PRESUPUESTO = ('GET', 'HEAD')
+
+_actual = ContextVar('app1_metricas', default=None)
+# Petición de calentamiento de verificar_presupuesto: no se compara con el presupuesto
+_calentando = ContextVar('app1_metricas_calentando', default=False)
+_candado = threading.Lock()
+_vistas = {}
+
+
+def activas():
+    return getattr(settings, 'METRICAS_ACTIVAS', True)
+
+
+class Medicion:
+    """Lo que se midió durante una petición"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.sql = 0.0
+        self.plantilla = 0.0
+
+
+def percentiles(tiempos):
+    """``(p50, p95)`` de una lista no vacía de tiempos"""
+    tiempos = sorted(tiempos)
+    if len(tiempos) == 1:
+        return tiempos[0], tiempos[0]
+    cortes = quantiles(tiempos, n=20, method='inclusive')
+    return cortes[9], cortes[18]
+
+
+class Estadistica:
+    """Acumulado de una vista en este proceso"""
+
+    def __init__(self):
+        self.peticiones = 0
+        self.consultas = 0
+        self.consultas_max = 0
+        self.sql = 0.0
+        self.plantilla = 0.0
+        self.total = 0.0
+        self.tiempos = deque(maxlen=MUESTRAS)
+
+    def agregar(self, medicion, total):
+        self.peticiones += 1
+        self.consultas += medicion.consultas
+        self.consultas_max = max(self.consultas_max, medicion.consultas)
+        self.sql += medicion.sql
+        self.plantilla += medicion.plantilla
+        self.total += total
+        self.tiempos.append(total)
+
+    def resumen(self):
+        p50, p95 = percentiles(self.tiempos)
+        return {
+            'peticiones': self.peticiones,
+            'consultas_promedio': round(self.consultas / self.peticiones, 1),
+            'consultas_max': self.consultas_max,
+            'sql_ms_promedio': round(self.sql * 1000 / self.peticiones, 2),
+            'plantilla_ms_promedio': round(self.plantilla * 1000 / self.peticiones, 2),
+            'total_ms_promedio': round(self.total * 1000 / self.peticiones, 2),
+            'total_ms_p50': round(p50 * 1000, 2),
+            'total_ms_p95': round(p95 * 1000, 2),
+        }
+
+
+def _envoltura(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.sql += time.perf_counter() - inicio
+
+
+class PlantillaMedida(Template):
+    def render(self, context=None, request=None):
+        medicion = _actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.plantilla += time.perf_counter() - inicio
+
+
+class PlantillasMedidas(DjangoTemplates):
+    """Backend de plantillas de Django que mide el tiempo de render"""
+
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name).template, self)
+
+
+def presupuesto(consultas):
+    """
+    Declara cuántas consultas SQL puede hacer la vista como máximo en un GET,
+    contando las dos de la sesión y el usuario de una petición con sesión
+    iniciada. Los POST (validar, guardar, historial) no se comparan.
+    """
+    def decorar(vista):
+        vista.presupuesto_consultas = consultas
+        return vista
+    return decorar
+
+
+def _server_timing(medicion, total):
+    return ', '.join([
+        f'sql;dur={medicion.sql * 1000:.1f};desc="{medicion.consultas} consultas"',
+        f'plantilla;dur={medicion.plantilla * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not activas():
+            return self.get_response(request)
+
+        medicion = Medicion()
+        token = _actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as envolturas:
+                for alias in connections:
+                    envolturas.enter_context(connections[alias].execute_wrapper(_envoltura))
+                response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        total = time.perf_counter() - inicio
+
+        response['Server-Timing'] = _server_timing(medicion, total)
+        match = request.resolver_match
+        if match is not None:
+            registrar(match.view_name, medicion, total)
+            limite = getattr(match.func, 'presupuesto_consultas', None)
+            if (limite is not None and request.method in METODOS_PRESUPUESTO
+                    and medicion.consultas > limite and not _calentando.get()):
+                logger.warning(
+                    '%s hizo %s consultas (presupuesto: %s)', match.view_name, medicion.consultas, limite
+                )
+        return response
+
+
+def registrar(vista, medicion, total):
+    with _candado:
+        estadistica = _vistas.get(vista)
+        if estadistica is None:
+            estadistica = _vistas[vista] = Estadistica()
+        estadistica.agregar(medicion, total)
+
+
+def resumen():
+    """``{vista: {...}}`` con lo acumulado en este proceso, la más lenta primero"""
+    with _candado:
+        vistas = {vista: estadistica.resumen() for vista, estadistica in _vistas.items()}
+    presupuestos = _presupuestos()
+    for vista, datos in vistas.items():
+        datos['presupuesto'] = presupuestos.get(vista)
+    return dict(sorted(vistas.items(), key=lambda item: -item[1]['total_ms_promedio']))
+
+
+def reiniciar():
+    with _candado:
+        _vistas.clear()
+
+
+# ==================== PRESUPUESTOS DE CONSULTAS ====================
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+def _patrones(patrones=None, prefijo=''):
+    """``(ruta, URLPattern)`` de todas las URLs del proyecto"""
+    if patrones is None:
+        patrones = get_resolver().url_patterns
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            yield from _patrones(patron.url_patterns, prefijo + str(patron.pattern))
+        else:
+            yield prefijo + str(patron.pattern), patron
+
+
+def _presupuestos():
+    """``{nombre de vista: presupuesto}``"""
+    return {
+        patron.name: patron.callback.presupuesto_consultas
+        for _, patron in _patrones()
+        if patron.name and hasattr(patron.callback, 'presupuesto_consultas')
+    }
+
+
+def urls_con_presupuesto():
+    """URLs sin parámetros cuyas vistas declaran presupuesto"""
+    return sorted(
+        '/' + ruta
+        for ruta, patron in _patrones()
+        if hasattr(patron.callback, 'presupuesto_consultas') and '<' not in ruta
+    )
+
+
+def presupuesto_de(url):
+    return getattr(resolve(url.split('?')[0]).func, 'presupuesto_consultas', None)
+
+
+def verificar_presupuesto(cliente, url, presupuesto=None):
+    """
+    Pide ``url`` dos veces y cuenta las consultas de la segunda. La primera
+    llena lo que se guarda en el proceso (configuración, contadores); antes
+    de la segunda se vacía la caché para que se cuenten las consultas que
+    la caché ahorra solo a veces (el COUNT de la paginación). Lanza
+    ``PresupuestoExcedido`` con las consultas hechas si pasa del
+    presupuesto declarado en la vista. Devuelve el número de consultas.
+    """
+    from django.test.utils import CaptureQueriesContext
+
+    if presupuesto is None:
+        presupuesto = presupuesto_de(url)
+    if presupuesto is None:
+        raise ValueError(f'{url} no declara presupuesto de consultas')
+    token = _calentando.set(True)
+    try:
+        cliente.get(url)
+    finally:
+        _calentando.reset(token)
+    cache.clear()
+    with ExitStack() as pila:
+        # Todas las conexiones: las vistas de lectura pueden ir a la réplica
+        capturas = [pila.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+        response = cliente.get(url)
+    consultas = [consulta['sql'] for captura in capturas for consulta in captura.captured_queries]
+    if response.status_code >= 400:
+        raise PresupuestoExcedido(f'{url} respondió {response.status_code}')
+    if len(consultas) > presupuesto:
+        detalle = '\n'.join(f'  {sql}' for sql in consultas)
+        raise PresupuestoExcedido(
+            f'{url} hizo {len(consultas)} consultas (presupuesto: {presupuesto}):\n{detalle}'
+        )
+    return len(consultas)
+
+
+def verificar_presupuestos(tamanos=(10, 1000), urls=None):
+    """
+    Mide cada URL con presupuesto sobre ``datos_prueba`` de cada tamaño
+    (dentro de una transacción que se revierte; la caché se vacía después
+    para no dejar conteos de los datos revertidos). Devuelve
+    ``{url: {tamaño: consultas}}`` y lanza ``PresupuestoExcedido`` con
+    todas las fallas juntas si alguna vista se pasó.
+    """
+    from django.test import Client
+    from . import datos_prueba
+
+    urls = urls or urls_con_presupuesto()
+    cliente = Client()
+    resultados = {url: {} for url in urls}
+    fallas = []
+    for tamano in tamanos:
+        try:
+            with transaction.atomic():
+                datos_prueba.sembrar(tamano)
+                for url in urls:
+                    try:
+                        resultados[url][tamano] = verificar_presupuesto(cliente, url)
+                    except PresupuestoExcedido as error:
+                        fallas.append(f'[{tamano} registros] {error}')
+                transaction.set_rollback(True)
+        finally:
+            cache.clear()
+    if fallas:
+        raise PresupuestoExcedido('\n'.join(fallas))
+    return resultados
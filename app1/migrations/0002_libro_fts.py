@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+CREAR_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS app1_libro_fts USING fts5(
+    titulo, subtitulo, autor, editorial, descripcion, codigo_inventario,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POBLAR_FTS = """
+INSERT INTO app1_libro_fts (rowid, titulo, subtitulo, autor, editorial, descripcion, codigo_inventario)
+SELECT id, COALESCE(titulo, ''), COALESCE(subtitulo, ''), COALESCE(autor, ''),
+       COALESCE(editorial, ''), COALESCE(descripcion, ''), COALESCE(codigo_inventario, '')
+FROM app1_libro
+"""
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREAR_FTS)
+    schema_editor.execute(POBLAR_FTS)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS app1_libro_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
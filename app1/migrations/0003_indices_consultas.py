@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0002_libro_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialmovimiento',
+            index=models.Index(fields=['-fecha'], name='historial_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['-creado_en', '-id'], name='libro_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['categoria', 'disponible'], name='libro_cat_disp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['-fecha_multa', '-id'], name='multa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['alumno_matricula', 'estado'], name='multa_alumno_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['estado'], name='multa_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['-fecha_prestamo', '-id'], name='prestamo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['fecha_vencimiento'], name='prestamo_activo_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['alumno_matricula'], name='prestamo_alumno_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['libro'], name='prestamo_libro_activo_idx'),
+        ),
+    ]
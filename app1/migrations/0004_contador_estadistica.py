@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0003_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorEstadistica',
+            fields=[
+                ('clave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de Estadística',
+                'verbose_name_plural': 'Contadores de Estadísticas',
+            },
+        ),
+    ]
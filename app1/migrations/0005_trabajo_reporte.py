@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0004_contador_estadistica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('libros', 'Catálogo de libros'), ('prestamos', 'Préstamos'), ('multas', 'Multas')], max_length=20)),
+                ('huella', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='reportes/')),
+                ('error', models.TextField(blank=True)),
+                ('solicitado_por', models.CharField(blank=True, max_length=100)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reportes',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['tipo', 'huella', 'estado'], name='trabajo_tipo_huella_idx'), models.Index(fields=['estado', 'creado_en'], name='trabajo_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0005_trabajo_reporte'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historialmovimiento',
+            name='tipo',
+            field=models.CharField(choices=[('prestamo', 'Préstamo'), ('devolucion', 'Devolución'), ('renovacion', 'Renovación'), ('multa', 'Multa'), ('baja', 'Baja de libro'), ('alta', 'Alta de libro'), ('vencimiento', 'Préstamo vencido')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:30
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def calcular_saldos(apps, schema_editor):
+    Multa = apps.get_model('app1', 'Multa')
+    SaldoMultas = apps.get_model('app1', 'SaldoMultas')
+    cero = Decimal('0.00')
+    saldos = {}
+    for multa in Multa.objects.order_by('alumno_matricula', 'id').values(
+        'alumno_matricula', 'alumno_nombre', 'estado', 'monto'
+    ).iterator():
+        saldo = saldos.setdefault(multa['alumno_matricula'], SaldoMultas(
+            alumno_matricula=multa['alumno_matricula'],
+            alumno_nombre=multa['alumno_nombre'],
+            multas_pendientes=0,
+            saldo_pendiente=cero,
+            total_pagado=cero,
+            total_condonado=cero,
+        ))
+        if multa['estado'] == 'pendiente':
+            saldo.multas_pendientes += 1
+            saldo.saldo_pendiente += multa['monto']
+        elif multa['estado'] == 'pagada':
+            saldo.total_pagado += multa['monto']
+        elif multa['estado'] == 'condonada':
+            saldo.total_condonado += multa['monto']
+    SaldoMultas.objects.bulk_create(saldos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0006_historial_tipo_vencimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoMultas',
+            fields=[
+                ('alumno_matricula', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('alumno_nombre', models.CharField(max_length=200)),
+                ('multas_pendientes', models.IntegerField(default=0)),
+                ('saldo_pendiente', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_condonado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de Multas',
+                'verbose_name_plural': 'Saldos de Multas',
+                'ordering': ['-saldo_pendiente'],
+            },
+        ),
+        migrations.RunPython(calcular_saldos, migrations.RunPython.noop),
+    ]
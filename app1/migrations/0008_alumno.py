@@ -0,0 +1,194 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:10
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def crear_alumnos(apps, schema_editor):
+    """
+    Crea un Alumno por cada matrícula de préstamos, multas e historial.
+
+    Los datos se toman en orden (historial, multas, préstamos; cada uno del
+    más antiguo al más reciente), así que queda el último nombre, grado,
+    grupo y teléfono registrados. Los contadores se calculan en el mismo
+    recorrido.
+    """
+    Alumno = apps.get_model('app1', 'Alumno')
+    Prestamo = apps.get_model('app1', 'Prestamo')
+    Multa = apps.get_model('app1', 'Multa')
+    HistorialMovimiento = apps.get_model('app1', 'HistorialMovimiento')
+    cero = Decimal('0.00')
+    alumnos = {}
+
+    def anotar(matricula, nombre, **datos):
+        alumno = alumnos.get(matricula)
+        if alumno is None:
+            alumno = alumnos[matricula] = Alumno(
+                matricula=matricula,
+                nombre=nombre or matricula,
+                prestamos_activos=0,
+                multas_pendientes=0,
+                saldo_pendiente=cero,
+                total_pagado=cero,
+                total_condonado=cero,
+            )
+        if nombre:
+            alumno.nombre = nombre
+        for campo, valor in datos.items():
+            if valor:
+                setattr(alumno, campo, valor)
+        return alumno
+
+    # Los movimientos sin alumno guardaban la matrícula vacía
+    HistorialMovimiento.objects.filter(alumno_matricula='').update(alumno_matricula=None)
+    movimientos = (
+        HistorialMovimiento.objects.exclude(alumno_matricula=None)
+        .order_by('id').values_list('alumno_matricula', 'alumno_nombre')
+    )
+    for matricula, nombre in movimientos.iterator():
+        anotar(matricula, nombre)
+
+    multas = Multa.objects.order_by('id').values_list('alumno_matricula', 'alumno_nombre', 'estado', 'monto')
+    for matricula, nombre, estado, monto in multas.iterator():
+        alumno = anotar(matricula, nombre)
+        if estado == 'pendiente':
+            alumno.multas_pendientes += 1
+            alumno.saldo_pendiente += monto
+        elif estado == 'pagada':
+            alumno.total_pagado += monto
+        elif estado == 'condonada':
+            alumno.total_condonado += monto
+
+    prestamos = Prestamo.objects.order_by('id').values_list(
+        'alumno_matricula', 'alumno_nombre', 'alumno_grado', 'alumno_grupo', 'alumno_telefono', 'activo'
+    )
+    for matricula, nombre, grado, grupo, telefono, activo in prestamos.iterator():
+        alumno = anotar(matricula, nombre, grado=grado, grupo=grupo, telefono=telefono)
+        if activo:
+            alumno.prestamos_activos += 1
+
+    Alumno.objects.bulk_create(alumnos.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0007_saldo_multas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alumno',
+            fields=[
+                ('matricula', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=200)),
+                ('grado', models.CharField(blank=True, max_length=50, null=True)),
+                ('grupo', models.CharField(blank=True, max_length=10, null=True)),
+                ('telefono', models.CharField(blank=True, max_length=15, null=True)),
+                ('prestamos_activos', models.IntegerField(default=0)),
+                ('multas_pendientes', models.IntegerField(default=0)),
+                ('saldo_pendiente', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_condonado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Alumno',
+                'verbose_name_plural': 'Alumnos',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.RunPython(crear_alumnos, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='prestamo',
+            name='prestamo_alumno_activo_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='multa',
+            name='multa_alumno_estado_idx',
+        ),
+        # La columna alumno_matricula se conserva y pasa a ser la llave foránea
+        migrations.AlterField(
+            model_name='prestamo',
+            name='alumno_matricula',
+            field=models.CharField(db_column='alumno_matricula', max_length=50),
+        ),
+        migrations.RenameField(
+            model_name='prestamo',
+            old_name='alumno_matricula',
+            new_name='alumno',
+        ),
+        migrations.AlterField(
+            model_name='prestamo',
+            name='alumno',
+            field=models.ForeignKey(db_column='alumno_matricula', db_index=False, on_delete=django.db.models.deletion.PROTECT, to='app1.alumno'),
+        ),
+        migrations.AlterField(
+            model_name='multa',
+            name='alumno_matricula',
+            field=models.CharField(db_column='alumno_matricula', max_length=50),
+        ),
+        migrations.RenameField(
+            model_name='multa',
+            old_name='alumno_matricula',
+            new_name='alumno',
+        ),
+        migrations.AlterField(
+            model_name='multa',
+            name='alumno',
+            field=models.ForeignKey(db_column='alumno_matricula', db_index=False, on_delete=django.db.models.deletion.PROTECT, to='app1.alumno'),
+        ),
+        migrations.AlterField(
+            model_name='historialmovimiento',
+            name='alumno_matricula',
+            field=models.CharField(blank=True, db_column='alumno_matricula', max_length=50, null=True),
+        ),
+        migrations.RenameField(
+            model_name='historialmovimiento',
+            old_name='alumno_matricula',
+            new_name='alumno',
+        ),
+        migrations.AlterField(
+            model_name='historialmovimiento',
+            name='alumno',
+            field=models.ForeignKey(blank=True, db_column='alumno_matricula', db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app1.alumno'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['alumno'], name='prestamo_alumno_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['alumno', 'estado'], name='multa_alumno_estado_idx'),
+        ),
+        migrations.RemoveField(
+            model_name='prestamo',
+            name='alumno_nombre',
+        ),
+        migrations.RemoveField(
+            model_name='prestamo',
+            name='alumno_grado',
+        ),
+        migrations.RemoveField(
+            model_name='prestamo',
+            name='alumno_grupo',
+        ),
+        migrations.RemoveField(
+            model_name='prestamo',
+            name='alumno_telefono',
+        ),
+        migrations.RemoveField(
+            model_name='multa',
+            name='alumno_nombre',
+        ),
+        migrations.RemoveField(
+            model_name='historialmovimiento',
+            name='alumno_nombre',
+        ),
+        migrations.DeleteModel(
+            name='SaldoMultas',
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:40
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.utils import timezone
+
+
+def cerrar_prestamos_duplicados(apps, schema_editor):
+    """
+    Antes de circulacion.py dos mostradores podían prestar el mismo
+    ejemplar. De los préstamos activos de un mismo libro queda el más
+    reciente; los demás se cierran como devueltos con una nota en el
+    préstamo y un movimiento en el historial, para que la restricción se
+    pueda crear. Los contadores se ajustan aquí: no hay señales.
+    """
+    Prestamo = apps.get_model('app1', 'Prestamo')
+    Alumno = apps.get_model('app1', 'Alumno')
+    HistorialMovimiento = apps.get_model('app1', 'HistorialMovimiento')
+    ContadorEstadistica = apps.get_model('app1', 'ContadorEstadistica')
+
+    libros = (
+        Prestamo.objects.filter(activo=True).order_by().values('libro_id')
+        .annotate(total=Count('id')).filter(total__gt=1).values_list('libro_id', flat=True)
+    )
+    hoy = timezone.localdate()
+    cerrados = 0
+    for libro_id in list(libros):
+        vigente, *duplicados = Prestamo.objects.filter(libro_id=libro_id, activo=True).order_by(
+            '-fecha_prestamo', '-id'
+        )
+        for prestamo in duplicados:
+            nota = f'Cerrado al migrar: el libro tenía otro préstamo activo (#{vigente.pk})'
+            Prestamo.objects.filter(pk=prestamo.pk).update(
+                activo=False,
+                estado='devuelto',
+                fecha_devolucion_real=hoy,
+                notas_devolucion=nota,
+                recibido_por='Sistema',
+            )
+            Alumno.objects.filter(pk=prestamo.alumno_id).update(prestamos_activos=F('prestamos_activos') - 1)
+            HistorialMovimiento.objects.create(
+                tipo='devolucion',
+                libro_id=libro_id,
+                prestamo_id=prestamo.pk,
+                alumno_id=prestamo.alumno_id,
+                descripcion=nota,
+                usuario_responsable='Sistema',
+            )
+            cerrados += 1
+    if cerrados:
+        ContadorEstadistica.objects.filter(clave='prestamos_activos').update(valor=F('valor') - cerrados)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0008_alumno'),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_prestamos_duplicados, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='prestamo',
+            name='prestamo_libro_activo_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='prestamo',
+            constraint=models.UniqueConstraint(condition=models.Q(('activo', True)), fields=('libro',), name='prestamo_libro_activo_uniq'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0009_prestamo_libro_activo_uniq'),
+    ]
+
+    operations = [
+        # Solo cambia el valor por defecto que pone Django; la columna es la
+        # misma y en SQLite AlterField copiaría toda la tabla del historial
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='historialmovimiento',
+                    name='fecha',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+            ],
+        ),
+    ]
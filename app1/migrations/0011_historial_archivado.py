@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0010_historial_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMovimientos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('prestamo', 'Préstamo'), ('devolucion', 'Devolución'), ('renovacion', 'Renovación'), ('multa', 'Multa'), ('baja', 'Baja de libro'), ('alta', 'Alta de libro'), ('vencimiento', 'Préstamo vencido')], max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de movimientos',
+                'verbose_name_plural': 'Resumen diario de movimientos',
+                'ordering': ['-fecha', 'tipo'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tipo'), name='resumen_fecha_tipo_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HistorialArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('prestamo', 'Préstamo'), ('devolucion', 'Devolución'), ('renovacion', 'Renovación'), ('multa', 'Multa'), ('baja', 'Baja de libro'), ('alta', 'Alta de libro'), ('vencimiento', 'Préstamo vencido')], max_length=20)),
+                ('descripcion', models.TextField()),
+                ('usuario_responsable', models.CharField(max_length=100)),
+                ('fecha', models.DateTimeField()),
+                ('alumno', models.ForeignKey(blank=True, db_column='alumno_matricula', db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app1.alumno')),
+                ('libro', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app1.libro')),
+                ('prestamo', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app1.prestamo')),
+            ],
+            options={
+                'verbose_name': 'Movimiento archivado',
+                'verbose_name_plural': 'Movimientos archivados',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['-fecha'], name='archivado_fecha_idx')],
+            },
+        ),
+    ]
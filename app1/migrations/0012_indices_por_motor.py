@@ -0,0 +1,77 @@
+from django.db import migrations
+
+
+# MySQL no tiene índices parciales (Django omite los que tienen condición).
+# La unicidad de un préstamo activo por libro se logra con una columna
+# generada que solo tiene valor en los préstamos activos: un índice único
+# admite muchos NULL. Los otros dos se vuelven índices compuestos.
+MYSQL_CREAR = [
+    """
+    CREATE FULLTEXT INDEX libro_texto_ft
+    ON app1_libro (titulo, subtitulo, autor, editorial, descripcion, codigo_inventario)
+    """,
+    """
+    ALTER TABLE app1_prestamo
+    ADD COLUMN libro_activo bigint GENERATED ALWAYS AS (CASE WHEN activo THEN libro_id END) VIRTUAL
+    """,
+    'CREATE UNIQUE INDEX prestamo_libro_activo_my ON app1_prestamo (libro_activo)',
+    'CREATE INDEX prestamo_activo_venc_my ON app1_prestamo (activo, fecha_vencimiento)',
+    'CREATE INDEX prestamo_alumno_activo_my ON app1_prestamo (alumno_matricula, activo)',
+]
+
+MYSQL_ELIMINAR = [
+    'DROP INDEX prestamo_alumno_activo_my ON app1_prestamo',
+    'DROP INDEX prestamo_activo_venc_my ON app1_prestamo',
+    'DROP INDEX prestamo_libro_activo_my ON app1_prestamo',
+    'ALTER TABLE app1_prestamo DROP COLUMN libro_activo',
+    'DROP INDEX libro_texto_ft ON app1_libro',
+]
+
+# Debe ser la misma expresión que usa app1/busqueda.py para que PostgreSQL
+# use el índice. translate() quita los acentos (unaccent no es IMMUTABLE).
+POSTGRESQL_CREAR = [
+    """
+    CREATE INDEX libro_texto_gin ON app1_libro USING gin ((
+        to_tsvector('simple', translate(lower(
+            coalesce(titulo, '') || ' ' || coalesce(subtitulo, '') || ' ' || coalesce(autor, '') || ' ' ||
+            coalesce(editorial, '') || ' ' || coalesce(descripcion, '') || ' ' || coalesce(codigo_inventario, '')
+        ), 'áàäâéèëêíìïîóòöôúùüûñç', 'aaaaeeeeiiiioooouuuunc'))
+    ))
+    """,
+]
+
+POSTGRESQL_ELIMINAR = [
+    'DROP INDEX IF EXISTS libro_texto_gin',
+]
+
+SQL = {
+    'mysql': (MYSQL_CREAR, MYSQL_ELIMINAR),
+    'postgresql': (POSTGRESQL_CREAR, POSTGRESQL_ELIMINAR),
+}
+
+
+def crear_indices(apps, schema_editor):
+    for sentencia in SQL.get(schema_editor.connection.vendor, ([], []))[0]:
+        schema_editor.execute(sentencia)
+
+
+def eliminar_indices(apps, schema_editor):
+    for sentencia in SQL.get(schema_editor.connection.vendor, ([], []))[1]:
+        schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+    """
+    Índices que dependen del motor. SQLite ya tiene los parciales y el
+    índice FTS5 (0002_libro_fts); MySQL y PostgreSQL tienen aquí su índice
+    de texto completo para ``busqueda``, y MySQL los equivalentes de los
+    índices parciales de ``Prestamo``.
+    """
+
+    dependencies = [
+        ('app1', '0011_historial_archivado'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
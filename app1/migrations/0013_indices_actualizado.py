@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0012_indices_por_motor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alumno',
+            index=models.Index(fields=['actualizado_en'], name='alumno_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['actualizado_en'], name='libro_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['actualizado_en'], name='multa_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['actualizado_en'], name='prestamo_actualizado_idx'),
+        ),
+    ]
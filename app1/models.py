@@ -1,8 +1,12 @@
 # app1/models.py
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
+from uuid import uuid4
+
+from .memo import memo_peticion
 
 class Libro(models.Model):
     CATEGORIAS = [
@@ -53,11 +57,47 @@ class Libro(models.Model):
         verbose_name = 'Libro'
         verbose_name_plural = 'Libros'
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['-creado_en', '-id'], name='libro_creado_idx'),
+            # Django compara booleanos como columna sola, por eso la categoría va primero
+            models.Index(fields=['categoria', 'disponible'], name='libro_cat_disp_idx'),
+            # Último cambio de la tabla para la huella de los reportes (app1/trabajos.py)
+            models.Index(fields=['actualizado_en'], name='libro_actualizado_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
 
 
+class Alumno(models.Model):
+    matricula = models.CharField(max_length=50, primary_key=True)
+    nombre = models.CharField(max_length=200)
+    grado = models.CharField(max_length=50, blank=True, null=True)
+    grupo = models.CharField(max_length=10, blank=True, null=True)
+    telefono = models.CharField(max_length=15, blank=True, null=True)
+    
+    # Contadores mantenidos por las señales de Prestamo y Multa (ver app1/alumnos.py)
+    prestamos_activos = models.IntegerField(default=0)
+    multas_pendientes = models.IntegerField(default=0)
+    saldo_pendiente = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_condonado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Alumno'
+        verbose_name_plural = 'Alumnos'
+        ordering = ['nombre']
+        indexes = [
+            models.Index(fields=['actualizado_en'], name='alumno_actualizado_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.matricula})"
+
+
 class Prestamo(models.Model):
     ESTADOS = [
         ('activo', 'Activo'),
@@ -67,12 +107,8 @@ class Prestamo(models.Model):
     ]
     
     libro = models.ForeignKey(Libro, on_delete=models.PROTECT)
-    
-    alumno_nombre = models.CharField(max_length=200)
-    alumno_matricula = models.CharField(max_length=50)
-    alumno_grado = models.CharField(max_length=50, blank=True, null=True)
-    alumno_grupo = models.CharField(max_length=10, blank=True, null=True)
-    alumno_telefono = models.CharField(max_length=15, blank=True, null=True)
+    # El índice parcial de préstamos activos cubre las consultas por alumno
+    alumno = models.ForeignKey(Alumno, on_delete=models.PROTECT, db_column='alumno_matricula', db_index=False)
     
     fecha_prestamo = models.DateField(auto_now_add=True)
     fecha_vencimiento = models.DateField()
@@ -98,9 +134,33 @@ class Prestamo(models.Model):
         verbose_name = 'Préstamo'
         verbose_name_plural = 'Préstamos'
         ordering = ['-fecha_prestamo']
+        indexes = [
+            models.Index(fields=['-fecha_prestamo', '-id'], name='prestamo_fecha_idx'),
+            # Vencimientos de préstamos activos (vencidos y por vencer)
+            models.Index(
+                fields=['fecha_vencimiento'],
+                condition=models.Q(activo=True),
+                name='prestamo_activo_venc_idx',
+            ),
+            # Préstamos activos por alumno (límite de préstamos simultáneos)
+            models.Index(
+                fields=['alumno'],
+                condition=models.Q(activo=True),
+                name='prestamo_alumno_activo_idx',
+            ),
+            models.Index(fields=['actualizado_en'], name='prestamo_actualizado_idx'),
+        ]
+        constraints = [
+            # Un libro solo puede tener un préstamo activo (también sirve de índice)
+            models.UniqueConstraint(
+                fields=['libro'],
+                condition=models.Q(activo=True),
+                name='prestamo_libro_activo_uniq',
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.libro.titulo} - {self.alumno_nombre}"
+        return f"{self.libro.titulo} - {self.alumno.nombre}"
     
     def save(self, *args, **kwargs):
         if not self.fecha_vencimiento:
@@ -108,10 +168,8 @@ class Prestamo(models.Model):
             fecha_inicio = self.fecha_prestamo if self.fecha_prestamo else timezone.now().date()
             self.fecha_vencimiento = fecha_inicio + timedelta(days=config.dias_prestamo)
         
+        # La disponibilidad del libro la mantienen app1/circulacion.py y la señal sincronizar_libro
         super().save(*args, **kwargs)
-        
-        self.libro.disponible = not self.activo
-        self.libro.save()
 
 
 class Multa(models.Model):
@@ -130,9 +188,7 @@ class Multa(models.Model):
     
     prestamo = models.ForeignKey(Prestamo, on_delete=models.CASCADE, blank=True, null=True)
     libro = models.ForeignKey(Libro, on_delete=models.PROTECT, blank=True, null=True)
-    
-    alumno_nombre = models.CharField(max_length=200)
-    alumno_matricula = models.CharField(max_length=50)
+    alumno = models.ForeignKey(Alumno, on_delete=models.PROTECT, db_column='alumno_matricula', db_index=False)
     
     tipo = models.CharField(max_length=20, choices=TIPOS)
     monto = models.DecimalField(max_digits=10, decimal_places=2)
@@ -151,9 +207,15 @@ class Multa(models.Model):
         verbose_name = 'Multa'
         verbose_name_plural = 'Multas'
         ordering = ['-fecha_multa']
+        indexes = [
+            models.Index(fields=['-fecha_multa', '-id'], name='multa_fecha_idx'),
+            models.Index(fields=['alumno', 'estado'], name='multa_alumno_estado_idx'),
+            models.Index(fields=['estado'], name='multa_estado_idx'),
+            models.Index(fields=['actualizado_en'], name='multa_actualizado_idx'),
+        ]
     
     def __str__(self):
-        return f"Multa #{self.id} - {self.alumno_nombre} - ${self.monto}"
+        return f"Multa #{self.id} - {self.alumno_id} - ${self.monto}"
 
 
 class HistorialMovimiento(models.Model):
@@ -164,29 +226,92 @@ class HistorialMovimiento(models.Model):
         ('multa', 'Multa'),
         ('baja', 'Baja de libro'),
         ('alta', 'Alta de libro'),
+        ('vencimiento', 'Préstamo vencido'),
     ]
     
     tipo = models.CharField(max_length=20, choices=TIPOS)
     libro = models.ForeignKey(Libro, on_delete=models.SET_NULL, blank=True, null=True)
     prestamo = models.ForeignKey(Prestamo, on_delete=models.SET_NULL, blank=True, null=True)
-    
-    alumno_nombre = models.CharField(max_length=200, blank=True, null=True)
-    alumno_matricula = models.CharField(max_length=50, blank=True, null=True)
+    alumno = models.ForeignKey(Alumno, on_delete=models.SET_NULL, blank=True, null=True,
+                               db_column='alumno_matricula', db_index=False)
     
     descripcion = models.TextField()
     usuario_responsable = models.CharField(max_length=100)
     
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Se fija al crear el objeto: la bitácora lo escribe después (ver bitacora.py)
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         verbose_name = 'Historial de Movimiento'
         verbose_name_plural = 'Historial de Movimientos'
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['-fecha'], name='historial_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.fecha.strftime('%d/%m/%Y %H:%M')}"
 
 
+class HistorialArchivado(models.Model):
+    """
+    Movimientos del historial con más de ``HISTORIAL_DIAS_ACTIVO`` días (ver
+    ``historial.archivar``). Conserva el id original; las referencias no
+    tienen restricción en la base de datos para no frenar las bajas.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    tipo = models.CharField(max_length=20, choices=HistorialMovimiento.TIPOS)
+    libro = models.ForeignKey(Libro, on_delete=models.SET_NULL, blank=True, null=True,
+                              db_constraint=False, related_name='+')
+    prestamo = models.ForeignKey(Prestamo, on_delete=models.SET_NULL, blank=True, null=True,
+                                 db_constraint=False, related_name='+')
+    alumno = models.ForeignKey(Alumno, on_delete=models.SET_NULL, blank=True, null=True,
+                               db_column='alumno_matricula', db_index=False,
+                               db_constraint=False, related_name='+')
+    
+    descripcion = models.TextField()
+    usuario_responsable = models.CharField(max_length=100)
+    
+    fecha = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Movimiento archivado'
+        verbose_name_plural = 'Movimientos archivados'
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['-fecha'], name='archivado_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.fecha.strftime('%d/%m/%Y %H:%M')}"
+
+
+class ResumenMovimientos(models.Model):
+    """Movimientos por día y tipo, incluidos los ya archivados (ver ``historial.resumir``)"""
+    fecha = models.DateField()
+    tipo = models.CharField(max_length=20, choices=HistorialMovimiento.TIPOS)
+    total = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen diario de movimientos'
+        verbose_name_plural = 'Resumen diario de movimientos'
+        ordering = ['-fecha', 'tipo']
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'tipo'], name='resumen_fecha_tipo_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} - {self.get_tipo_display()}: {self.total}"
+
+
+# La versión es un valor que no se repite: si la caché descarta la clave,
+# la que se genere después no coincide con ninguna copia de un proceso
+CLAVE_VERSION_CONFIG = 'configuracion:version'
+
+# Copia de la configuración en este proceso: (versión, objeto)
+_config_proceso = {}
+
+
 class ConfiguracionSistema(models.Model):
     dias_prestamo = models.IntegerField(default=15)
     max_renovaciones = models.IntegerField(default=2)
@@ -210,14 +335,101 @@ class ConfiguracionSistema(models.Model):
     def save(self, *args, **kwargs):
         self.pk = 1
         super().save(*args, **kwargs)
+        # Los demás workers recargan la configuración en su siguiente petición
+        transaction.on_commit(ConfiguracionSistema.invalidar_cache)
     
     def delete(self, *args, **kwargs):
         pass
     
     @classmethod
     def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
+        """
+        Devuelve la configuración usando, en este orden, el memo de la
+        petición, la copia del proceso (si su versión sigue vigente en la
+        caché compartida) y por último la base de datos.
+        """
+        memo = memo_peticion()
+        if memo is not None and 'configuracion' in memo:
+            return memo['configuracion']
+        
+        version = cache.get(CLAVE_VERSION_CONFIG)
+        copia = _config_proceso.get('copia')
+        if version is not None and copia is not None and copia[0] == version:
+            obj = copia[1]
+        else:
+            obj, created = cls.objects.get_or_create(pk=1)
+            if version is None:
+                cache.add(CLAVE_VERSION_CONFIG, uuid4().hex, timeout=None)
+                version = cache.get(CLAVE_VERSION_CONFIG)
+            _config_proceso['copia'] = (version, obj)
+        
+        if memo is not None:
+            memo['configuracion'] = obj
         return obj
     
+    @staticmethod
+    def invalidar_cache():
+        """Cambia la versión para que todos los procesos recarguen la configuración"""
+        _config_proceso.pop('copia', None)
+        memo = memo_peticion()
+        if memo is not None:
+            memo.pop('configuracion', None)
+        cache.set(CLAVE_VERSION_CONFIG, uuid4().hex, timeout=None)
+    
+    def __str__(self):
+        return f"Configuración - {self.nombre_biblioteca}"
+
+
+class ContadorEstadistica(models.Model):
+    """Contadores del dashboard y bajas por tabla, mantenidos por señales (ver estadisticas.py y trabajos.py)"""
+    clave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+    
+    actualizado_en = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Contador de Estadística'
+        verbose_name_plural = 'Contadores de Estadísticas'
+    
+    def __str__(self):
+        return f"{self.clave}: {self.valor}"
+
+
+class TrabajoReporte(models.Model):
+    """Reporte PDF generado en segundo plano (ver app1/trabajos.py)"""
+    TIPOS = [
+        ('libros', 'Catálogo de libros'),
+        ('prestamos', 'Préstamos'),
+        ('multas', 'Multas'),
+    ]
+    
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('terminado', 'Terminado'),
+        ('error', 'Error'),
+    ]
+    
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    huella = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    
+    archivo = models.FileField(upload_to='reportes/', blank=True, null=True)
+    error = models.TextField(blank=True)
+    
+    solicitado_por = models.CharField(max_length=100, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(blank=True, null=True)
+    terminado_en = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reportes'
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['tipo', 'huella', 'estado'], name='trabajo_tipo_huella_idx'),
+            models.Index(fields=['estado', 'creado_en'], name='trabajo_estado_idx'),
+        ]
+    
     def __str__(self):
-        return f"Configuración - {self.nombre_biblioteca}"
\ No newline at end of file
+        return f"Reporte {self.get_tipo_display()} #{self.id} ({self.get_estado_display()})"
@@ -0,0 +1,189 @@
+# app1/paginacion.py
+"""
+Paginación por cursor (keyset) para las vistas de listas.
+
+En lugar de OFFSET, cada página se pide con un cursor que guarda los valores
+de ordenamiento del último (o primer) registro mostrado, así que el costo de
+una página no crece con el tamaño de la tabla. El ordenamiento es el de
+``Meta.ordering`` del modelo con ``id`` como desempate.
+
+Los resultados de búsqueda vienen ordenados por relevancia, un valor que
+calcula cada motor y no sirve de cursor: usan un desplazamiento, y para que
+ni las páginas lejanas ni el conteo recorran todas las coincidencias se
+limitan a las primeras ``MAX_RESULTADOS_BUSQUEDA``.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+POR_PAGINA = 25
+TIEMPO_CACHE_CONTEO = 60
+MAX_RESULTADOS_BUSQUEDA = 500
+
+
+class Pagina:
+    """Página de resultados con los cursores para moverse entre páginas."""
+
+    def __init__(self, object_list, cursor_siguiente=None, cursor_anterior=None, total=None, total_acotado=False):
+        self.object_list = object_list
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.total = total
+        # True si hay más resultados que ``total`` (búsquedas, ver MAX_RESULTADOS_BUSQUEDA)
+        self.total_acotado = total_acotado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def tiene_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.cursor_anterior is not None
+
+
+def codificar_cursor(datos):
+    texto = json.dumps(datos, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve el contenido del cursor o None si no es válido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        return None
+    return datos if isinstance(datos, dict) else None
+
+
+def orden_keyset(modelo):
+    """Ordenamiento del modelo con desempate estable por id."""
+    orden = list(modelo._meta.ordering)
+    if not any(campo.lstrip('-') in ('id', 'pk') for campo in orden):
+        descendente = orden[0].startswith('-') if orden else True
+        orden.append('-id' if descendente else 'id')
+    return orden
+
+
+def _filtro_keyset(modelo, orden, valores, hacia_adelante):
+    """Construye la condición lexicográfica (a, b) < (x, y) para el cursor."""
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        valor = modelo._meta.get_field(nombre).to_python(valor)
+        descendente = campo.startswith('-')
+        operador = 'lt' if descendente == hacia_adelante else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+def _valores(objeto, orden):
+    valores = []
+    for campo in orden:
+        campo_modelo = objeto._meta.get_field(campo.lstrip('-'))
+        valores.append(campo_modelo.value_to_string(objeto))
+    return valores
+
+
+def contar(queryset, limite=None):
+    """COUNT del queryset (hasta ``limite`` filas si se indica) guardado en caché unos segundos."""
+    queryset = queryset.order_by()
+    if limite is not None:
+        queryset = queryset[:limite]
+    sql, params = queryset.query.sql_with_params()
+    clave = 'conteo:' + hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave, total, TIEMPO_CACHE_CONTEO)
+    return total
+
+
+def paginar(queryset, cursor=None, por_pagina=POR_PAGINA, relevancia=False):
+    """
+    Devuelve la página de ``queryset`` indicada por ``cursor``.
+
+    Con ``relevancia=True`` se respeta el orden que ya trae el queryset
+    (por ejemplo el ranking de la búsqueda) y se pagina por desplazamiento
+    dentro de los primeros ``MAX_RESULTADOS_BUSQUEDA`` resultados.
+    """
+    datos = decodificar_cursor(cursor) or {}
+
+    if relevancia:
+        total = contar(queryset, MAX_RESULTADOS_BUSQUEDA + 1)
+        total_acotado = total > MAX_RESULTADOS_BUSQUEDA
+        total = min(total, MAX_RESULTADOS_BUSQUEDA)
+        try:
+            inicio = max(int(datos.get('o', 0)), 0)
+        except (TypeError, ValueError):
+            inicio = 0
+        # Un cursor armado a mano no puede pedir más allá del límite
+        inicio = min(inicio, (MAX_RESULTADOS_BUSQUEDA - 1) // por_pagina * por_pagina)
+        fin = min(inicio + por_pagina + 1, MAX_RESULTADOS_BUSQUEDA)
+        objetos = list(queryset[inicio:fin])
+        siguiente = None
+        if len(objetos) > por_pagina:
+            objetos = objetos[:por_pagina]
+            siguiente = codificar_cursor({'o': inicio + por_pagina})
+        anterior = None
+        if inicio > 0:
+            anterior = codificar_cursor({'o': max(inicio - por_pagina, 0)})
+        return Pagina(objetos, siguiente, anterior, total, total_acotado)
+
+    total = contar(queryset)
+
+    modelo = queryset.model
+    orden = orden_keyset(modelo)
+    valores = datos.get('v')
+    hacia_adelante = datos.get('d', 's') == 's'
+
+    try:
+        if not valores or len(valores) != len(orden):
+            raise ValueError('cursor incompleto')
+        queryset = queryset.filter(_filtro_keyset(modelo, orden, valores, hacia_adelante))
+    except (ValidationError, TypeError, ValueError):
+        valores = None
+        hacia_adelante = True
+
+    if hacia_adelante:
+        objetos = list(queryset.order_by(*orden)[:por_pagina + 1])
+    else:
+        invertido = [c[1:] if c.startswith('-') else f'-{c}' for c in orden]
+        objetos = list(queryset.order_by(*invertido)[:por_pagina + 1])
+
+    hay_mas = len(objetos) > por_pagina
+    objetos = objetos[:por_pagina]
+    if not hacia_adelante:
+        objetos.reverse()
+
+    siguiente = anterior = None
+    if objetos:
+        if hay_mas or not hacia_adelante:
+            siguiente = codificar_cursor({'d': 's', 'v': _valores(objetos[-1], orden)})
+        if valores and (hay_mas or hacia_adelante):
+            anterior = codificar_cursor({'d': 'a', 'v': _valores(objetos[0], orden)})
+    return Pagina(objetos, siguiente, anterior, total)
+
+
+def parametros_url(request):
+    """Parámetros GET actuales sin el cursor, para armar los enlaces."""
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    return parametros.urlencode()
@@ -0,0 +1,191 @@
+# app1/portadas.py
+"""
+Portadas de los libros: originales sin duplicados y miniaturas.
+
+La portada que se sube se guarda con el hash de su contenido como nombre
+(``portadas/<sha256>.<ext>``); si otro libro ya tiene la misma imagen se
+reutiliza el archivo en lugar de escribir una copia. De cada original se
+generan miniaturas WebP y JPEG en ``ANCHOS`` (``portadas/miniaturas/``),
+al guardar el libro o, para portadas anteriores, la primera vez que se
+muestran. Las plantillas las usan con ``srcset`` (ver
+``templatetags/portadas.py``) para no descargar la imagen completa en cada
+fila de las listas.
+"""
+import hashlib
+import io
+import os
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+ANCHOS = (80, 160, 320)
+CALIDAD = 80
+CARPETA_ORIGINALES = 'portadas'
+CARPETA_MINIATURAS = 'portadas/miniaturas'
+
+# extensión -> formato de Pillow, en el orden de preferencia del <picture>
+FORMATOS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+
+_NOMBRE_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+# Etiqueta EXIF de orientación (5-8: la imagen está girada 90°)
+ORIENTACION = 0x0112
+
+# Original -> anchos de sus miniaturas, ya comprobadas en este proceso
+_generadas = {}
+
+
+def calcular_hash(archivo):
+    """SHA-256 del contenido de ``archivo`` (lo deja al inicio para leerlo otra vez)"""
+    digest = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in archivo.chunks():
+        digest.update(bloque)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+def nombre_original(archivo, nombre):
+    extension = os.path.splitext(nombre)[1].lower() or '.jpg'
+    return f'{CARPETA_ORIGINALES}/{calcular_hash(archivo)}{extension}'
+
+
+def es_nombre_hash(nombre):
+    return bool(_NOMBRE_HASH.match(os.path.splitext(os.path.basename(nombre))[0]))
+
+
+def guardar_original(portada):
+    """
+    Guarda el archivo recién subido de ``portada`` (un ``FieldFile`` sin
+    guardar) con su hash como nombre, reutilizando el existente si ya hay
+    uno igual, y genera sus miniaturas.
+    """
+    storage = portada.storage
+    nombre = nombre_original(portada.file, portada.name)
+    if not storage.exists(nombre):
+        nombre = storage.save(nombre, portada.file)
+    # El archivo ya está en el storage: FileField.pre_save no lo vuelve a escribir
+    portada.name = nombre
+    portada._committed = True
+    generar_miniaturas(nombre, storage)
+    return nombre
+
+
+def nombre_miniatura(original, ancho, extension):
+    base = os.path.splitext(os.path.basename(original))[0]
+    return f'{CARPETA_MINIATURAS}/{base}-{ancho}.{extension}'
+
+
+def _convertir(imagen, formato):
+    """JPEG no admite transparencia: se pone sobre fondo blanco"""
+    if formato == 'JPEG' or imagen.mode not in ('RGB', 'RGBA'):
+        if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+            imagen = imagen.convert('RGBA')
+            if formato == 'JPEG':
+                fondo = Image.new('RGB', imagen.size, 'white')
+                fondo.paste(imagen, mask=imagen.getchannel('A'))
+                return fondo
+            return imagen
+        return imagen.convert('RGB')
+    return imagen
+
+
+def _anchos(ancho_original):
+    """
+    Pares ``(ancho, descriptor)`` de las miniaturas de un original de
+    ``ancho_original`` píxeles. Las imágenes no se agrandan: la primera
+    miniatura que no cabe queda del ancho del original y se describe así en
+    el ``srcset``; las siguientes serían iguales y se omiten.
+    """
+    anchos = []
+    for ancho in ANCHOS:
+        if ancho < ancho_original:
+            anchos.append((ancho, ancho))
+        else:
+            anchos.append((ancho, ancho_original))
+            break
+    return anchos
+
+
+def generar_miniaturas(original, storage=default_storage):
+    """
+    Crea las miniaturas de ``original`` que falten y devuelve cuántas
+    escribió. Si ya existen solo se leen las dimensiones del original.
+    """
+    with storage.open(original, 'rb') as archivo:
+        imagen = Image.open(archivo)
+        ancho_original = imagen.width
+        if imagen.getexif().get(ORIENTACION) in (5, 6, 7, 8):
+            ancho_original = imagen.height
+        anchos = _anchos(ancho_original)
+        faltantes = [
+            (ancho, extension)
+            for ancho, _ in anchos
+            for extension in FORMATOS
+            if not storage.exists(nombre_miniatura(original, ancho, extension))
+        ]
+        if faltantes:
+            imagen = ImageOps.exif_transpose(imagen)
+            imagen.load()
+
+    for ancho, extension in faltantes:
+        formato = FORMATOS[extension]
+        miniatura = _convertir(imagen, formato)
+        if miniatura is imagen:
+            miniatura = imagen.copy()
+        miniatura.thumbnail((ancho, ancho * 4), Image.Resampling.LANCZOS)
+        contenido = io.BytesIO()
+        miniatura.save(contenido, formato, quality=CALIDAD, optimize=True)
+        nombre = nombre_miniatura(original, ancho, extension)
+        # save() renombraría el archivo si otro proceso ya lo creó
+        if not storage.exists(nombre):
+            storage.save(nombre, ContentFile(contenido.getvalue()))
+    _generadas[original] = anchos
+    return len(faltantes)
+
+
+def miniaturas(portada):
+    """
+    Devuelve ``{extension: [(url, ancho), ...]}`` para el ``srcset`` de
+    ``portada``, generando las que falten la primera vez. Si el original no
+    se puede leer devuelve ``None`` y la plantilla usa la portada tal cual.
+    """
+    original = portada.name
+    if original not in _generadas:
+        try:
+            generar_miniaturas(original, portada.storage)
+        except (OSError, Image.DecompressionBombError):
+            return None
+    return {
+        extension: [
+            (portada.storage.url(nombre_miniatura(original, ancho, extension)), descriptor)
+            for ancho, descriptor in _generadas[original]
+        ]
+        for extension in FORMATOS
+    }
+
+
+def borrar_miniaturas(original, storage=default_storage):
+    for ancho in ANCHOS:
+        for extension in FORMATOS:
+            storage.delete(nombre_miniatura(original, ancho, extension))
+    _generadas.pop(original, None)
+
+
+def deduplicar(nombre, storage=default_storage):
+    """
+    Copia un original anterior a su nombre por hash y devuelve el nuevo
+    nombre (el mismo si ya lo tenía).
+    """
+    if es_nombre_hash(nombre):
+        return nombre
+    with storage.open(nombre, 'rb') as archivo:
+        nuevo = nombre_original(archivo, nombre)
+        if not storage.exists(nuevo):
+            nuevo = storage.save(nuevo, archivo)
+    return nuevo
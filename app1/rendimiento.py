@@ -0,0 +1,188 @@
+# app1/rendimiento.py
+"""
+Mediciones de rendimiento de todas las rutas de ``app1.urls``.
+
+``medir`` pide cada ruta con nombre al cliente de pruebas varias veces
+(después de una petición de calentamiento) y guarda su p50 y p95 de
+latencia, las consultas SQL y el pico de memoria de Python durante la
+petición (``tracemalloc``, en una pasada aparte para no inflar los
+tiempos). Las respuestas en flujo se consumen completas. Cada ruta se pide
+dentro de una transacción que se revierte, así que las que escriben
+(solicitar un reporte) no dejan rastro; si una vista lanza una excepción
+se anota en ``errores`` y se sigue con las demás. Las rutas con parámetros se piden
+con los valores de ``ARGUMENTOS``; si no hay datos para ellas se omiten.
+
+El resultado es un diccionario listo para JSON; ``comparar`` recibe dos de
+ellos y devuelve las regresiones. Se corre con ``medir_rendimiento`` sobre
+datos de ``generar_datos``.
+"""
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Libro, Alumno, Prestamo, Multa, HistorialMovimiento, TrabajoReporte
+from .urls import urlpatterns
+from .metricas import percentiles
+
+REPETICIONES = 10
+MAX_SEGUNDOS = 30  # por ruta; las lentas se quedan con menos muestras
+MUESTRAS_MINIMAS = 3
+
+# Una regresión es un aumento de más de TOLERANCIA que además supera el ruido
+TOLERANCIA = 0.2
+RUIDO_MS = 5.0
+RUIDO_KB = 64
+
+
+def _primero(queryset):
+    return queryset.order_by('pk').values_list('pk', flat=True).first()
+
+
+def _libro():
+    return {'pk': _primero(Libro.objects.all())}
+
+
+def _prestamo_activo():
+    return {'pk': _primero(Prestamo.objects.filter(activo=True))}
+
+
+ARGUMENTOS = {
+    'editar_libro': _libro,
+    'eliminar_libro': _libro,
+    'api_autocompletar': lambda: {'tipo': 'libros'},
+    'devolver_prestamo': _prestamo_activo,
+    'renovar_prestamo': _prestamo_activo,
+    'solicitar_reporte': lambda: {'tipo': 'libros'},
+    'estado_reporte': lambda: {'pk': _primero(TrabajoReporte.objects.all())},
+    'descargar_reporte': lambda: {'pk': _primero(TrabajoReporte.objects.filter(estado='terminado'))},
+    'exportar': lambda: {'tipo': 'prestamos', 'formato': 'csv'},
+}
+
+
+def rutas():
+    """``{nombre: url}`` de las rutas de app1 y ``{nombre: motivo}`` de las omitidas"""
+    encontradas, omitidas = {}, {}
+    for patron in urlpatterns:
+        if not patron.name:
+            continue
+        argumentos = ARGUMENTOS.get(patron.name, dict)()
+        if None in argumentos.values():
+            omitidas[patron.name] = 'no hay datos para sus parámetros'
+        elif patron.pattern.converters and not argumentos:
+            omitidas[patron.name] = 'falta en ARGUMENTOS'
+        else:
+            encontradas[patron.name] = reverse(patron.name, kwargs=argumentos)
+    return encontradas, omitidas
+
+
+def _pedir(cliente, url):
+    response = cliente.get(url)
+    if response.streaming:
+        # El cliente de pruebas cierra la respuesta al agotar el flujo
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def medir_url(cliente, url, repeticiones=REPETICIONES, max_segundos=MAX_SEGUNDOS):
+    with transaction.atomic():
+        response = _pedir(cliente, url)
+
+        tiempos = []
+        limite = time.perf_counter() + max_segundos
+        while len(tiempos) < repeticiones:
+            inicio = time.perf_counter()
+            _pedir(cliente, url)
+            tiempos.append(time.perf_counter() - inicio)
+            if len(tiempos) >= MUESTRAS_MINIMAS and time.perf_counter() > limite:
+                break
+
+        with CaptureQueriesContext(connection) as capturadas:
+            tracemalloc.start()
+            try:
+                _pedir(cliente, url)
+                pico = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        transaction.set_rollback(True)
+
+    p50, p95 = percentiles(tiempos)
+    return {
+        'url': url,
+        'estado': response.status_code,
+        'muestras': len(tiempos),
+        'p50_ms': round(p50 * 1000, 2),
+        'p95_ms': round(p95 * 1000, 2),
+        'consultas': len(capturadas),
+        'memoria_kb': round(pico / 1024, 1),
+    }
+
+
+def medir(repeticiones=REPETICIONES, max_segundos=MAX_SEGUNDOS, nombres=None, progreso=None):
+    """
+    Mide las rutas de app1 (o solo las de ``nombres``). ``progreso`` recibe
+    el nombre y el resultado de cada ruta al terminarla.
+    """
+    encontradas, omitidas = rutas()
+    if nombres:
+        encontradas = {nombre: url for nombre, url in encontradas.items() if nombre in nombres}
+        omitidas = {nombre: motivo for nombre, motivo in omitidas.items() if nombre in nombres}
+    cliente = Client()
+    resultados, errores = {}, {}
+    for nombre, url in encontradas.items():
+        try:
+            resultados[nombre] = medir_url(cliente, url, repeticiones, max_segundos)
+        except Exception as error:
+            # Una vista que truena no detiene la medición de las demás
+            errores[nombre] = f'{url}: {type(error).__name__}: {error}'
+            continue
+        if progreso is not None:
+            progreso(nombre, resultados[nombre])
+    return {
+        'fecha': timezone.now().isoformat(),
+        'base_de_datos': connection.vendor,
+        'registros': {
+            modelo._meta.model_name: modelo.objects.count()
+            for modelo in [Libro, Alumno, Prestamo, Multa, HistorialMovimiento]
+        },
+        'repeticiones': repeticiones,
+        'rutas': resultados,
+        'errores': errores,
+        'omitidas': omitidas,
+    }
+
+
+def _empeoro(antes, despues, ruido, tolerancia):
+    return despues > antes * (1 + tolerancia) and despues - antes > ruido
+
+
+def comparar(anterior, actual, tolerancia=TOLERANCIA):
+    """
+    Regresiones de ``actual`` respecto a ``anterior`` como tuplas
+    ``(ruta, métrica, antes, después)``: una ruta que antes respondía y
+    ahora lanza una excepción, cualquier consulta de más, un cambio de
+    código de estado, o p50, p95 o memoria que suban más de ``tolerancia``
+    y por encima del ruido.
+    """
+    regresiones = [
+        (nombre, 'error', 'ok', error)
+        for nombre, error in actual.get('errores', {}).items()
+        if nombre in anterior['rutas']
+    ]
+    for nombre, despues in actual['rutas'].items():
+        antes = anterior['rutas'].get(nombre)
+        if antes is None:
+            continue
+        if despues['estado'] != antes['estado']:
+            regresiones.append((nombre, 'estado', antes['estado'], despues['estado']))
+        if despues['consultas'] > antes['consultas']:
+            regresiones.append((nombre, 'consultas', antes['consultas'], despues['consultas']))
+        for metrica, ruido in [('p50_ms', RUIDO_MS), ('p95_ms', RUIDO_MS), ('memoria_kb', RUIDO_KB)]:
+            if _empeoro(antes[metrica], despues[metrica], ruido, tolerancia):
+                regresiones.append((nombre, metrica, antes[metrica], despues[metrica]))
+    return regresiones
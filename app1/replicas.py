@@ -0,0 +1,145 @@
+# app1/replicas.py
+"""
+Lecturas en la réplica.
+
+Si ``DATABASES`` tiene un alias ``replica`` (ver settings), ``Enrutador``
+manda a ella las consultas de las vistas marcadas con ``@lectura`` (listas,
+tablero, APIs de consulta, exportaciones) y las de los reportes que genera
+``procesar_reportes`` (``en_replica()``). Todo lo demás va a la primaria:
+las escrituras, las vistas sin marcar, las tablas de otras apps (sesiones,
+usuarios) y los modelos de ``SOLO_PRIMARIA``.
+
+La réplica va atrasada. Para que quien acaba de escribir vea su cambio
+(prestar y volver a la lista de préstamos) ``ReplicaMiddleware`` deja la
+cookie ``COOKIE`` durante ``REPLICA_RETRASO_MAXIMO`` segundos después de
+cualquier petición que no sea GET o HEAD; mientras el navegador la mande,
+sus lecturas van a la primaria. Dentro de una transacción también se lee
+de la primaria.
+
+Para probarlo localmente con dos archivos SQLite, ``DB_REPLICA_NAME``
+apunta al segundo y ``copiar_replica --cada 5`` lo mantiene al día.
+"""
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARIA = 'default'
+REPLICA = 'replica'
+COOKIE = 'leer_primaria'
+RETRASO_MAXIMO = 15
+METODOS_LECTURA = ('GET', 'HEAD')
+
+# La configuración se guarda en caché por versión (una copia atrasada
+# quedaría guardada con la versión nueva) y el estado de un reporte se
+# consulta justo después de pedirlo
+SOLO_PRIMARIA = {'app1.configuracionsistema', 'app1.trabajoreporte'}
+
+_en_replica = ContextVar('app1_replicas', default=False)
+
+
+def hay_replica():
+    return REPLICA in settings.DATABASES
+
+
+def retraso_maximo():
+    return getattr(settings, 'REPLICA_RETRASO_MAXIMO', RETRASO_MAXIMO)
+
+
+def lectura(vista):
+    """Marca una vista que no escribe: sus consultas pueden ir a la réplica"""
+    vista.lee_de_replica = True
+    return vista
+
+
+@contextmanager
+def en_replica():
+    """Manda a la réplica las lecturas del bloque (comandos, reportes)"""
+    token = _en_replica.set(True)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+
+
+def _iterar_en_replica(contenido):
+    """Las respuestas en flujo se recorren después de que termina la vista"""
+    iterador = iter(contenido)
+    while True:
+        with en_replica():
+            try:
+                parte = next(iterador)
+            except StopIteration:
+                return
+        yield parte
+
+
+class Enrutador:
+    def db_for_read(self, model, **hints):
+        if (
+            not _en_replica.get()
+            or not hay_replica()
+            or model._meta.app_label != 'app1'
+            or model._meta.label_lower in SOLO_PRIMARIA
+            or connections[PRIMARIA].in_atomic_block
+        ):
+            return PRIMARIA
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARIA, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema con los datos (copia o replicación)
+        if db == REPLICA:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                _en_replica.reset(request.replica_token)
+        if request.replica_token is not None and response.streaming:
+            response.streaming_content = _iterar_en_replica(response.streaming_content)
+        if hay_replica() and request.method not in METODOS_LECTURA:
+            response.set_cookie(COOKIE, '1', max_age=retraso_maximo(), httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            getattr(view_func, 'lee_de_replica', False)
+            and request.method in METODOS_LECTURA
+            and COOKIE not in request.COOKIES
+        ):
+            request.replica_token = _en_replica.set(True)
+
+
+def copiar_sqlite():
+    """
+    Copia la base SQLite primaria sobre la réplica con la API de respaldo
+    de SQLite: la copia es consistente aunque la primaria esté recibiendo
+    escrituras y quien lee la réplica sigue viendo la versión anterior
+    hasta que termina.
+    """
+    primaria = connections[PRIMARIA]
+    primaria.ensure_connection()
+    destino = sqlite3.connect(settings.DATABASES[REPLICA]['NAME'], timeout=30)
+    try:
+        primaria.connection.backup(destino)
+    finally:
+        destino.close()
@@ -0,0 +1,275 @@
+# app1/reportes.py
+"""
+Motor de reportes PDF en forma de tabla.
+
+Las filas se leen de la base de datos por bloques con ``.iterator()`` y se
+convierten en pequeñas tablas (``LongTable``) conforme reportlab las va
+necesitando, así que la memoria no depende del tamaño del catálogo. El
+encabezado de columnas y el número de página se dibujan en cada hoja desde
+las plantillas de página.
+"""
+import tempfile
+
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import (
+    BaseDocTemplate, Frame, LongTable, NextPageTemplate, PageTemplate, TableStyle,
+)
+
+from .models import ConfiguracionSistema, Libro, Prestamo, Multa
+
+FILAS_POR_BLOQUE = 200
+TAMANO_CHUNK = 2000
+
+MARGEN = 2 * cm
+ALTO_FILA = 0.6 * cm
+ALTO_TITULO = 2.5 * cm
+FUENTE = 'Helvetica'
+TAMANO_FUENTE = 9
+RELLENO_CELDA = 6
+
+
+class _HistoriaPerezosa(list):
+    """
+    Lista de flowables que se rellena desde un generador.
+
+    ``BaseDocTemplate.build`` consume la lista por el frente y consulta su
+    longitud en cada vuelta; aquí solo se mantienen unos cuantos elementos
+    cargados a la vez.
+    """
+
+    def __init__(self, generador, minimo=2):
+        super().__init__()
+        self._generador = generador
+        self._minimo = minimo
+        self._rellenar()
+
+    def _rellenar(self):
+        while self._generador is not None and super().__len__() < self._minimo:
+            try:
+                self.append(next(self._generador))
+            except StopIteration:
+                self._generador = None
+
+    def __len__(self):
+        self._rellenar()
+        return super().__len__()
+
+    def __getitem__(self, indice):
+        self._rellenar()
+        return super().__getitem__(indice)
+
+
+def _recortar(valor, ancho):
+    """Corta el texto para que quepa en la celda (descontando el relleno)."""
+    texto = '' if valor is None else str(valor)
+    disponible = ancho - 2 * RELLENO_CELDA
+    if stringWidth(texto, FUENTE, TAMANO_FUENTE) <= disponible:
+        return texto
+    while texto and stringWidth(texto + '...', FUENTE, TAMANO_FUENTE) > disponible:
+        texto = texto[:-1]
+    return texto.rstrip() + '...'
+
+
+class ReporteTabla:
+    """
+    Describe un reporte: título, columnas ``(encabezado, ancho)``, un
+    generador de filas y las columnas que van centradas.
+    """
+
+    def __init__(self, titulo, columnas, filas, centradas=()):
+        self.titulo = titulo
+        self.columnas = columnas
+        self.filas = filas
+        self.centradas = centradas
+
+    @property
+    def anchos(self):
+        return [ancho for _, ancho in self.columnas]
+
+    def estilo(self, encabezado=False):
+        comandos = [
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTSIZE', (0, 0), (-1, -1), TAMANO_FUENTE),
+        ]
+        if encabezado:
+            comandos += [
+                ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('FONT', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ]
+        for columna in self.centradas:
+            comandos.append(('ALIGN', (columna, 0), (columna, -1), 'CENTER'))
+        return TableStyle(comandos)
+
+    def bloques(self):
+        """Genera tablas de ``FILAS_POR_BLOQUE`` filas sin encabezado."""
+        bloque = []
+        for fila in self.filas:
+            bloque.append(fila)
+            if len(bloque) == FILAS_POR_BLOQUE:
+                yield self._tabla(bloque)
+                bloque = []
+        if bloque:
+            yield self._tabla(bloque)
+
+    def _tabla(self, filas):
+        filas = [
+            [_recortar(valor, ancho) for valor, ancho in zip(fila, self.anchos)]
+            for fila in filas
+        ]
+        tabla = LongTable(filas, colWidths=self.anchos, rowHeights=ALTO_FILA)
+        tabla.setStyle(self.estilo())
+        return tabla
+
+
+def generar_pdf(reporte, destino):
+    """Escribe el reporte en ``destino`` (ruta o archivo abierto en binario)."""
+    config = ConfiguracionSistema.load()
+    fecha_actual = timezone.now().strftime("%d/%m/%Y")
+    ancho, alto = A4
+
+    encabezado = LongTable([[c for c, _ in reporte.columnas]], colWidths=reporte.anchos,
+                           rowHeights=ALTO_FILA)
+    encabezado.setStyle(reporte.estilo(encabezado=True))
+    encabezado.wrap(ancho, alto)
+
+    def dibujar_pagina(canvas, doc, primera):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 9)
+        canvas.drawRightString(ancho - MARGEN, alto - 1.5 * cm, f"Fecha de generación: {fecha_actual}")
+        tope = alto - MARGEN
+        if primera:
+            canvas.setFont("Helvetica-Bold", 18)
+            canvas.drawCentredString(ancho / 2, alto - 2.5 * cm, config.nombre_biblioteca)
+            canvas.setFont("Helvetica", 13)
+            canvas.drawCentredString(ancho / 2, alto - 3.5 * cm, reporte.titulo)
+            tope -= ALTO_TITULO
+        encabezado.drawOn(canvas, MARGEN, tope - ALTO_FILA)
+        canvas.setFont("Helvetica", 8)
+        canvas.drawCentredString(ancho / 2, 1.2 * cm, f"Página {doc.page}")
+        canvas.restoreState()
+
+    def marco(descuento):
+        return Frame(MARGEN, MARGEN, ancho - 2 * MARGEN, alto - 2 * MARGEN - ALTO_FILA - descuento,
+                     leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0)
+
+    doc = BaseDocTemplate(destino, pagesize=A4, title=reporte.titulo, author=config.nombre_biblioteca)
+    doc.addPageTemplates([
+        PageTemplate(id='primera', frames=[marco(ALTO_TITULO)],
+                     onPage=lambda c, d: dibujar_pagina(c, d, True)),
+        PageTemplate(id='resto', frames=[marco(0)],
+                     onPage=lambda c, d: dibujar_pagina(c, d, False)),
+    ])
+
+    def historia():
+        yield NextPageTemplate('resto')
+        yield from reporte.bloques()
+
+    doc.build(_HistoriaPerezosa(historia()))
+
+
+def generar_pdf_temporal(reporte):
+    """Genera el reporte en un archivo temporal listo para leerse desde el inicio."""
+    archivo = tempfile.TemporaryFile()
+    generar_pdf(reporte, archivo)
+    archivo.seek(0)
+    return archivo
+
+
+# ==================== REPORTES DISPONIBLES ====================
+
+def reporte_libros():
+    """Catálogo general de libros"""
+    categorias = dict(Libro.CATEGORIAS)
+    libros = Libro.objects.only(
+        'codigo_inventario', 'titulo', 'autor', 'categoria', 'publicacion', 'disponible'
+    )
+
+    def filas():
+        for libro in libros.iterator(chunk_size=TAMANO_CHUNK):
+            yield [
+                libro.codigo_inventario,
+                libro.titulo,
+                libro.autor,
+                categorias.get(libro.categoria, libro.categoria),
+                libro.publicacion,
+                "Sí" if libro.disponible else "No",
+            ]
+
+    return ReporteTabla(
+        'Reporte General de Libros',
+        [("Código", 2.4 * cm), ("Título", 5.2 * cm), ("Autor", 3.6 * cm),
+         ("Categoría", 2.6 * cm), ("Año", 1.2 * cm), ("Disponible", 2 * cm)],
+        filas(),
+        centradas=(4, 5),
+    )
+
+
+def reporte_prestamos():
+    """Préstamos registrados, del más reciente al más antiguo"""
+    estados = dict(Prestamo.ESTADOS)
+    prestamos = Prestamo.objects.select_related('libro', 'alumno').only(
+        'libro__titulo', 'alumno__nombre',
+        'fecha_prestamo', 'fecha_vencimiento', 'estado'
+    )
+
+    def filas():
+        for prestamo in prestamos.iterator(chunk_size=TAMANO_CHUNK):
+            yield [
+                f"#{prestamo.id}",
+                prestamo.libro.titulo,
+                prestamo.alumno.nombre,
+                prestamo.alumno_id,
+                prestamo.fecha_prestamo.strftime("%d/%m/%Y"),
+                prestamo.fecha_vencimiento.strftime("%d/%m/%Y"),
+                estados.get(prestamo.estado, prestamo.estado),
+            ]
+
+    return ReporteTabla(
+        'Reporte de Préstamos',
+        [("Folio", 1.5 * cm), ("Libro", 4.5 * cm), ("Alumno", 3.5 * cm), ("Matrícula", 2 * cm),
+         ("Préstamo", 1.9 * cm), ("Vence", 1.9 * cm), ("Estado", 1.7 * cm)],
+        filas(),
+        centradas=(4, 5, 6),
+    )
+
+
+def reporte_multas():
+    """Multas registradas, de la más reciente a la más antigua"""
+    tipos = dict(Multa.TIPOS)
+    estados = dict(Multa.ESTADOS)
+    multas = Multa.objects.select_related('alumno').only(
+        'alumno__nombre', 'tipo', 'monto', 'estado', 'fecha_multa'
+    )
+
+    def filas():
+        for multa in multas.iterator(chunk_size=TAMANO_CHUNK):
+            yield [
+                f"#{multa.id}",
+                multa.alumno.nombre,
+                multa.alumno_id,
+                tipos.get(multa.tipo, multa.tipo),
+                f"${multa.monto:.2f}",
+                estados.get(multa.estado, multa.estado),
+                multa.fecha_multa.strftime("%d/%m/%Y"),
+            ]
+
+    return ReporteTabla(
+        'Reporte de Multas',
+        [("Folio", 1.5 * cm), ("Alumno", 4 * cm), ("Matrícula", 2.2 * cm), ("Tipo", 3.5 * cm),
+         ("Monto", 2 * cm), ("Estado", 1.9 * cm), ("Fecha", 1.9 * cm)],
+        filas(),
+        centradas=(4, 5, 6),
+    )
+
+
+REPORTES = {
+    'libros': reporte_libros,
+    'prestamos': reporte_prestamos,
+    'multas': reporte_multas,
+}
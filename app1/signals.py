@@ -0,0 +1,217 @@
+# app1/signals.py
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Alumno, Libro, Prestamo, Multa
+from . import busqueda
+from . import estadisticas
+from . import alumnos
+from . import portadas
+from . import trabajos
+
+
+def _guardar_estado(instance, campos):
+    """Recuerda los valores guardados de ``campos`` para calcular cambios"""
+    diferidos = instance.get_deferred_fields()
+    instance._estado_guardado = {
+        campo: getattr(instance, campo)
+        for campo in campos
+        if campo not in diferidos
+    }
+
+
+def _cambio(instance, campo, update_fields):
+    """Devuelve (anterior, nuevo) si ``campo`` cambió en este guardado"""
+    if update_fields is not None and campo not in update_fields:
+        return None
+    anterior = instance._estado_guardado.get(campo)
+    nuevo = getattr(instance, campo)
+    if campo not in instance._estado_guardado or anterior == nuevo:
+        return None
+    return anterior, nuevo
+
+
+# ==================== ÍNDICE DE BÚSQUEDA ====================
+
+@receiver(post_save, sender=Libro)
+def indexar_libro(sender, instance, **kwargs):
+    """Mantiene el índice de búsqueda al crear o editar un libro"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not set(update_fields) & busqueda.CAMPOS_TEXTO:
+        return
+    busqueda.indexar_libro(instance)
+
+
+@receiver(post_delete, sender=Libro)
+def desindexar_libro(sender, instance, **kwargs):
+    """Quita el libro del índice de búsqueda al eliminarlo"""
+    busqueda.desindexar_libro(instance.pk)
+
+
+# ==================== PORTADAS ====================
+
+@receiver(pre_save, sender=Libro)
+def guardar_portada(sender, instance, **kwargs):
+    """Guarda la portada recién subida por su hash y genera sus miniaturas"""
+    if instance.portada and not instance.portada._committed:
+        portadas.guardar_original(instance.portada)
+
+
+# ==================== ESTADÍSTICAS DEL DASHBOARD ====================
+
+@receiver(post_init, sender=Libro)
+def libro_cargado(sender, instance, **kwargs):
+    _guardar_estado(instance, ['disponible', 'categoria'])
+
+
+@receiver(post_save, sender=Libro)
+def contar_libro(sender, instance, created, update_fields=None, **kwargs):
+    cambios = {}
+    if created:
+        cambios[estadisticas.LIBROS] = 1
+        cambios[estadisticas.LIBROS_DISPONIBLES] = 1 if instance.disponible else 0
+        cambios[estadisticas.clave_categoria(instance.categoria)] = 1
+    else:
+        disponible = _cambio(instance, 'disponible', update_fields)
+        if disponible:
+            cambios[estadisticas.LIBROS_DISPONIBLES] = 1 if disponible[1] else -1
+        categoria = _cambio(instance, 'categoria', update_fields)
+        if categoria:
+            cambios[estadisticas.clave_categoria(categoria[0])] = -1
+            cambios[estadisticas.clave_categoria(categoria[1])] = 1
+    estadisticas.ajustar(cambios)
+    _guardar_estado(instance, ['disponible', 'categoria'])
+
+
+@receiver(post_delete, sender=Libro)
+def descontar_libro(sender, instance, **kwargs):
+    guardado = instance._estado_guardado
+    cambios = {estadisticas.LIBROS: -1}
+    if guardado.get('disponible'):
+        cambios[estadisticas.LIBROS_DISPONIBLES] = -1
+    if 'categoria' in guardado:
+        cambios[estadisticas.clave_categoria(guardado['categoria'])] = -1
+    estadisticas.ajustar(cambios)
+
+
+@receiver(post_init, sender=Prestamo)
+def prestamo_cargado(sender, instance, **kwargs):
+    _guardar_estado(instance, alumnos.CAMPOS_PRESTAMO)
+
+
+@receiver(post_save, sender=Prestamo)
+def contar_prestamo(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        if instance.activo:
+            estadisticas.ajustar({estadisticas.PRESTAMOS_ACTIVOS: 1})
+    else:
+        activo = _cambio(instance, 'activo', update_fields)
+        if activo:
+            estadisticas.ajustar({estadisticas.PRESTAMOS_ACTIVOS: 1 if activo[1] else -1})
+
+
+@receiver(post_delete, sender=Prestamo)
+def descontar_prestamo(sender, instance, **kwargs):
+    if instance._estado_guardado.get('activo'):
+        estadisticas.ajustar({estadisticas.PRESTAMOS_ACTIVOS: -1})
+
+
+@receiver(post_init, sender=Multa)
+def multa_cargada(sender, instance, **kwargs):
+    _guardar_estado(instance, alumnos.CAMPOS_MULTA)
+
+
+@receiver(post_save, sender=Multa)
+def contar_multa(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        if instance.estado == 'pendiente':
+            estadisticas.ajustar({estadisticas.MULTAS_PENDIENTES: 1})
+    else:
+        estado = _cambio(instance, 'estado', update_fields)
+        if estado and 'pendiente' in estado:
+            estadisticas.ajustar({estadisticas.MULTAS_PENDIENTES: 1 if estado[1] == 'pendiente' else -1})
+
+
+@receiver(post_delete, sender=Multa)
+def descontar_multa(sender, instance, **kwargs):
+    if instance._estado_guardado.get('estado') == 'pendiente':
+        estadisticas.ajustar({estadisticas.MULTAS_PENDIENTES: -1})
+
+
+# ==================== CONTADORES POR ALUMNO ====================
+
+def _registrar_en_alumno(instance, created, update_fields, campos, registrar):
+    if update_fields is not None and not set(update_fields) & set(campos):
+        return
+    guardado = instance._estado_guardado
+    if not created and any(campo not in guardado for campo in campos):
+        # Cargado con campos diferidos: no hay estado previo con qué comparar
+        return
+    nuevo = {campo: getattr(instance, campo) for campo in campos}
+    registrar(None if created else guardado, nuevo)
+
+
+@receiver(post_save, sender=Prestamo)
+def contar_prestamo_alumno(sender, instance, created, update_fields=None, **kwargs):
+    """Ajusta los préstamos activos del alumno"""
+    _registrar_en_alumno(instance, created, update_fields, alumnos.CAMPOS_PRESTAMO, alumnos.registrar_prestamo)
+
+
+@receiver(post_delete, sender=Prestamo)
+def descontar_prestamo_alumno(sender, instance, **kwargs):
+    guardado = instance._estado_guardado
+    if all(campo in guardado for campo in alumnos.CAMPOS_PRESTAMO):
+        alumnos.registrar_prestamo(guardado, None)
+
+
+@receiver(post_save, sender=Multa)
+def actualizar_saldo(sender, instance, created, update_fields=None, **kwargs):
+    """Ajusta el saldo del alumno al crear, pagar, condonar o editar una multa"""
+    _registrar_en_alumno(instance, created, update_fields, alumnos.CAMPOS_MULTA, alumnos.registrar_multa)
+
+
+@receiver(post_delete, sender=Multa)
+def descontar_saldo(sender, instance, **kwargs):
+    guardado = instance._estado_guardado
+    if all(campo in guardado for campo in alumnos.CAMPOS_MULTA):
+        alumnos.registrar_multa(guardado, None)
+
+
+# ==================== DISPONIBILIDAD DEL LIBRO ====================
+
+@receiver(post_save, sender=Prestamo)
+def sincronizar_libro(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Marca el libro prestado o disponible cuando un préstamo se crea activo o
+    cambia ``activo`` fuera de app1/circulacion.py (por ejemplo, desde el admin).
+    """
+    if not (instance.activo if created else _cambio(instance, 'activo', update_fields)):
+        return
+    libro = instance.libro
+    disponible = not instance.activo
+    if libro.disponible != disponible:
+        libro.disponible = disponible
+        libro.save(update_fields=['disponible', 'actualizado_en'])
+
+
+# ==================== HUELLA DE LOS REPORTES ====================
+
+@receiver(post_delete, sender=Libro)
+@receiver(post_delete, sender=Alumno)
+@receiver(post_delete, sender=Prestamo)
+@receiver(post_delete, sender=Multa)
+def contar_baja(sender, **kwargs):
+    """Cambia la huella de los reportes que incluyen la tabla (ver trabajos.huella_datos)"""
+    trabajos.registrar_baja(sender)
+
+
+# Van al final: los receptores anteriores comparan contra el estado previo al guardado
+@receiver(post_save, sender=Prestamo)
+def prestamo_guardado(sender, instance, **kwargs):
+    _guardar_estado(instance, alumnos.CAMPOS_PRESTAMO)
+
+
+@receiver(post_save, sender=Multa)
+def multa_guardada(sender, instance, **kwargs):
+    _guardar_estado(instance, alumnos.CAMPOS_MULTA)
+
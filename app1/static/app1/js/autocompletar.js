@@ -0,0 +1,57 @@
+// Select con búsqueda: el formulario solo trae la opción elegida y las demás
+// se piden a la API mientras se escribe (ver SelectAutocompletar en forms.py).
+document.addEventListener('DOMContentLoaded', function() {
+    const MIN_CARACTERES = 2;
+    const ESPERA_MS = 250;
+
+    document.querySelectorAll('select[data-autocompletar]').forEach(function(select) {
+        const buscador = document.createElement('input');
+        buscador.type = 'search';
+        buscador.className = 'form-control mb-2';
+        buscador.placeholder = 'Escriba para buscar (título, autor o código)...';
+        buscador.autocomplete = 'off';
+        select.parentNode.insertBefore(buscador, select);
+
+        const vacia = select.querySelector('option[value=""]');
+        let temporizador = null;
+        let peticion = null;
+
+        function mostrar(resultados) {
+            const elegido = select.value;
+            select.innerHTML = '';
+            if (vacia) {
+                select.appendChild(vacia);
+            }
+            resultados.forEach(function(resultado) {
+                const opcion = new Option(resultado.texto, resultado.id);
+                opcion.selected = String(resultado.id) === elegido;
+                select.appendChild(opcion);
+            });
+            if (resultados.length === 1) {
+                select.value = String(resultados[0].id);
+            }
+        }
+
+        function buscar() {
+            const texto = buscador.value.trim();
+            if (texto.length < MIN_CARACTERES) {
+                return;
+            }
+            if (peticion) {
+                peticion.abort();
+            }
+            peticion = new AbortController();
+            const url = new URL(select.dataset.autocompletar, window.location.origin);
+            url.searchParams.set('q', texto);
+            fetch(url, {signal: peticion.signal})
+                .then(respuesta => respuesta.json())
+                .then(datos => mostrar(datos.resultados))
+                .catch(() => {});
+        }
+
+        buscador.addEventListener('input', function() {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(buscar, ESPERA_MS);
+        });
+    });
+});
@@ -0,0 +1,25 @@
+# app1/templatetags/portadas.py
+from django import template
+
+from app1 import portadas
+
+register = template.Library()
+
+
+@register.inclusion_tag('app1/_portada.html')
+def imagen_portada(libro, ancho, clase='', estilo=''):
+    """
+    ``<picture>`` con las miniaturas WebP/JPEG de la portada de ``libro``.
+    ``ancho`` es el ancho en píxeles con que se muestra, para que el
+    navegador elija la miniatura según la densidad de la pantalla.
+    """
+    miniaturas = portadas.miniaturas(libro.portada)
+    return {
+        'libro': libro,
+        'tamanos': f'{ancho}px',
+        'webp': ', '.join(f'{url} {w}w' for url, w in miniaturas['webp']) if miniaturas else '',
+        'jpg': ', '.join(f'{url} {w}w' for url, w in miniaturas['jpg']) if miniaturas else '',
+        'src': miniaturas['jpg'][-1][0] if miniaturas else libro.portada.url,
+        'clase': clase,
+        'estilo': estilo,
+    }
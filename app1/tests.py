@@ -1,3 +1,572 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+import openpyxl
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    alumnos, archivos, bitacora, busqueda, circulacion, estadisticas, exportacion, historial, metricas,
+    paginacion, trabajos, vencimientos,
+)
+from .management.commands.verificar_indices import consultas_frecuentes, recorre_tabla
+from .models import (
+    CLAVE_VERSION_CONFIG, Alumno, ConfiguracionSistema, HistorialArchivado, HistorialMovimiento, Libro, Prestamo,
+    ResumenMovimientos, _config_proceso,
+)
+
+# Las pruebas no escriben en la caché de archivos del proyecto (conteos de
+# la paginación, versión de la configuración)
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Las vistas se renderizan como en un checkout sin collectstatic
+STATIC_ROOT_VACIO = os.path.join(tempfile.gettempdir(), 'app1-pruebas-sin-collectstatic')
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+@skipUnless(connection.vendor == 'sqlite', 'Los planes se interpretan con el formato de SQLite')
+class IndicesTests(TestCase):
+    def test_consultas_frecuentes_usan_indice(self):
+        for nombre, queryset in consultas_frecuentes():
+            with self.subTest(nombre):
+                plan = queryset.explain()
+                self.assertFalse(recorre_tabla(plan), f'{nombre} recorre la tabla:\n{plan}')
+
+
+@override_settings(CACHES=CACHE_LOCAL, STATIC_ROOT=STATIC_ROOT_VACIO)
+class PresupuestosTests(TestCase):
+    def test_vistas_dentro_de_su_presupuesto(self):
+        resultados = metricas.verificar_presupuestos()
+        self.assertEqual(set(resultados), set(metricas.urls_con_presupuesto()))
+
+    def test_presupuesto_excedido(self):
+        with self.assertRaises(metricas.PresupuestoExcedido):
+            metricas.verificar_presupuesto(self.client, '/', presupuesto=0)
+
+    def test_calentamiento_no_avisa(self):
+        # La primera petición llena la configuración y los contadores del proceso
+        with self.assertNoLogs('app1.metricas', 'WARNING'):
+            metricas.verificar_presupuesto(self.client, '/')
+
+    def test_estaticos_sin_manifiesto_enlazan_el_nombre_original(self):
+        plantilla = Template("{% load static %}{% static 'app1/css/style.css' %}")
+        self.assertEqual(plantilla.render(Context()), '/static/app1/css/style.css')
+
+    def test_post_no_se_compara_con_el_presupuesto(self):
+        with self.assertNoLogs('app1.metricas', 'WARNING'):
+            self.client.post('/libros/crear/', {})
+
+
+class ArchivosTests(SimpleTestCase):
+    CONTENIDO = b'0123456789' * 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        temporal = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(temporal.cleanup)
+        cls.media = temporal.name
+        for ruta, contenido in (
+            ('portadas/texto.txt', cls.CONTENIDO),
+            ('portadas/texto.txt.gz', gzip.compress(cls.CONTENIDO)),
+            ('reportes/privado.txt', b'privado'),
+        ):
+            completa = os.path.join(cls.media, ruta)
+            os.makedirs(os.path.dirname(completa), exist_ok=True)
+            with open(completa, 'wb') as archivo:
+                archivo.write(contenido)
+
+    def pedir(self, ruta, **cabeceras):
+        request = RequestFactory().get(f'/media/{ruta}', headers=cabeceras)
+        with self.settings(MEDIA_ROOT=self.media):
+            response = archivos.servir_media(request, ruta)
+        self.addCleanup(response.close)
+        return response
+
+    def cuerpo(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_rango(self):
+        self.assertEqual(archivos._rango('bytes=10-19', 100), (10, 19))
+        self.assertEqual(archivos._rango('bytes=90-', 100), (90, 99))
+        self.assertEqual(archivos._rango('bytes=95-200', 100), (95, 99))
+        self.assertEqual(archivos._rango('bytes=-10', 100), (90, 99))
+        self.assertEqual(archivos._rango('bytes=-500', 100), (0, 99))
+        self.assertIs(archivos._rango('bytes=100-', 100), False)
+        self.assertIs(archivos._rango('bytes=-0', 100), False)
+        self.assertIsNone(archivos._rango('bytes=0-1,5-6', 100))
+        self.assertIsNone(archivos._rango('bytes=20-10', 100))
+
+    def test_intervalo_responde_206(self):
+        response = self.pedir('portadas/texto.txt', Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.cuerpo(response), self.CONTENIDO[10:20])
+
+    def test_intervalo_sufijo(self):
+        response = self.pedir('portadas/texto.txt', Range='bytes=-5', Accept_Encoding='gzip')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(self.cuerpo(response), self.CONTENIDO[-5:])
+
+    def test_intervalo_fuera_del_archivo_responde_416(self):
+        response = self.pedir('portadas/texto.txt', Range='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_none_match_responde_304(self):
+        etag = self.pedir('portadas/texto.txt')['ETag']
+        response = self.pedir('portadas/texto.txt', If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_elige_la_variante_gz(self):
+        response = self.pedir('portadas/texto.txt', Accept_Encoding='br, gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(self.cuerpo(response)), self.CONTENIDO)
+
+    def test_sin_accept_encoding_va_sin_comprimir(self):
+        response = self.pedir('portadas/texto.txt')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(self.cuerpo(response), self.CONTENIDO)
+
+    def test_fuera_de_media_publico_responde_404(self):
+        for ruta in ('reportes/privado.txt', 'portadas/../reportes/privado.txt', 'portadas/../../etc/passwd'):
+            with self.subTest(ruta), self.assertRaises(Http404):
+                self.pedir(ruta)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class CirculacionTests(TestCase):
+    def setUp(self):
+        self.config = ConfiguracionSistema.load()
+        self.libro = Libro.objects.create(
+            titulo='Pedro Páramo', autor='Juan Rulfo', publicacion=1955, codigo_inventario='T-0001',
+        )
+        self.alumno = Alumno.objects.create(matricula='A001', nombre='Ana')
+        estadisticas.reconciliar()
+
+    def prestar(self, matricula='A001', nombre='Ana'):
+        prestamo = Prestamo(libro=self.libro, fecha_vencimiento=timezone.localdate() + timedelta(days=7))
+        return circulacion.prestar(prestamo, {'matricula': matricula, 'nombre': nombre})
+
+    def assertContadoresAlDia(self):
+        self.assertEqual(estadisticas.reconciliar(), {})
+        self.assertEqual(alumnos.reconciliar(), [])
+
+    def test_prestar(self):
+        # Savepoint, alumno, libro, préstamo, contadores, alumno, release
+        with self.assertNumQueries(7):
+            prestamo = self.prestar()
+        self.assertTrue(prestamo.activo)
+        self.assertFalse(Libro.objects.get(pk=self.libro.pk).disponible)
+        self.assertContadoresAlDia()
+
+    def test_prestar_a_alumno_nuevo(self):
+        with self.assertNumQueries(10):
+            self.prestar('A002', 'Beto')
+        self.assertEqual(Alumno.objects.get(pk='A002').prestamos_activos, 1)
+        self.assertContadoresAlDia()
+
+    def test_devolver_sin_multa(self):
+        prestamo = self.prestar()
+        with self.assertNumQueries(7):
+            _, multa = circulacion.devolver(prestamo.pk)
+        self.assertIsNone(multa)
+        self.assertTrue(Libro.objects.get(pk=self.libro.pk).disponible)
+        self.assertContadoresAlDia()
+
+    def test_devolver_con_multa(self):
+        prestamo = self.prestar()
+        hoy = prestamo.fecha_vencimiento + timedelta(days=self.config.dias_gracia + 3)
+        with self.assertNumQueries(8):
+            _, multa = circulacion.devolver(prestamo.pk, hoy=hoy)
+        self.assertEqual(multa.monto, 3 * self.config.multa_por_dia)
+        self.assertEqual(Alumno.objects.get(pk='A001').multas_pendientes, 1)
+        self.assertContadoresAlDia()
+
+    def test_api_devolver_lote_a_tiempo(self):
+        self.prestar()
+        response = self.client.post(
+            reverse('api_devolver_lote'), {'codigos': ['T-0001']}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['devoluciones'][0]['dias_retraso'], 0)
+
+    def vencer(self, prestamo, dias):
+        hoy = prestamo.fecha_vencimiento + timedelta(days=self.config.dias_gracia + dias)
+        vencimientos.barrer_vencidos(hoy)
+        prestamo.refresh_from_db()
+        self.assertEqual(prestamo.monto_multa, dias * self.config.multa_por_dia)
+
+    def test_barrido_repetido_no_reescribe_los_vencidos(self):
+        prestamo = self.prestar()
+        hoy = prestamo.fecha_vencimiento + timedelta(days=self.config.dias_gracia + 2)
+        self.assertEqual(vencimientos.barrer_vencidos(hoy), (1, 1))
+        prestamo.refresh_from_db()
+        self.assertEqual(vencimientos.barrer_vencidos(hoy), (0, 0))
+        self.assertEqual(Prestamo.objects.get(pk=prestamo.pk).actualizado_en, prestamo.actualizado_en)
+        # Al día siguiente la multa crece y el préstamo sí se actualiza
+        self.assertEqual(vencimientos.barrer_vencidos(hoy + timedelta(days=1)), (0, 1))
+
+    def test_renovar_quita_la_multa_acumulada(self):
+        prestamo = self.prestar()
+        self.vencer(prestamo, 4)
+        prestamo = circulacion.renovar(prestamo.pk)
+        prestamo.refresh_from_db()
+        self.assertEqual((prestamo.estado, prestamo.monto_multa, prestamo.tiene_multa), ('renovado', 0, False))
+
+    def test_devolver_sin_multa_quita_la_multa_acumulada(self):
+        prestamo = self.prestar()
+        self.vencer(prestamo, 4)
+        _, multa = circulacion.devolver(prestamo.pk, hoy=prestamo.fecha_vencimiento)
+        prestamo.refresh_from_db()
+        self.assertIsNone(multa)
+        self.assertEqual((prestamo.monto_multa, prestamo.tiene_multa), (0, False))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+@patch.object(paginacion, 'MAX_RESULTADOS_BUSQUEDA', 5)
+class PaginacionTests(TestCase):
+    def setUp(self):
+        Libro.objects.bulk_create([
+            Libro(titulo=f'Libro {n}', autor='Autor', publicacion=2000, codigo_inventario=f'P-{n:04d}')
+            for n in range(8)
+        ])
+        self.libros = Libro.objects.order_by('id')
+
+    def test_relevancia_no_pasa_del_maximo(self):
+        vistos, cursor = [], None
+        while True:
+            pagina = paginacion.paginar(self.libros, cursor, por_pagina=2, relevancia=True)
+            vistos += pagina
+            cursor = pagina.cursor_siguiente
+            if cursor is None:
+                break
+        self.assertEqual(vistos, list(self.libros[:5]))
+        self.assertEqual((pagina.total, pagina.total_acotado), (5, True))
+
+    def test_relevancia_con_cursor_fuera_del_maximo(self):
+        cursor = paginacion.codificar_cursor({'o': 1000})
+        with CaptureQueriesContext(connection) as capturadas:
+            pagina = paginacion.paginar(self.libros, cursor, por_pagina=2, relevancia=True)
+        self.assertEqual(list(pagina), list(self.libros[4:5]))
+        self.assertIsNone(pagina.cursor_siguiente)
+        self.assertTrue(all('LIMIT' in consulta['sql'] for consulta in capturadas.captured_queries))
+
+
+# InnoDB actualiza los índices FULLTEXT al confirmar: con TestCase (todo en
+# una transacción que se revierte) MySQL no encontraría nada
+@override_settings(CACHES=CACHE_LOCAL)
+class BusquedaTests(TransactionTestCase):
+    def setUp(self):
+        self.tecnologia = Libro.objects.create(
+            titulo='Tecnología educativa', autor='José Martínez', publicacion=2010, codigo_inventario='T-0101',
+        )
+        self.paramo = Libro.objects.create(
+            titulo='Pedro Páramo', autor='Juan Rulfo', publicacion=1955, codigo_inventario='T-0102',
+            descripcion='Novela sobre Comala',
+        )
+
+    def buscar(self, texto):
+        return list(busqueda.buscar_libros(Libro.objects.all(), texto))
+
+    def test_ignora_acentos(self):
+        self.assertEqual(self.buscar('tecnologia'), [self.tecnologia])
+        self.assertEqual(self.buscar('PÁRAMO'), [self.paramo])
+
+    def test_palabras_como_prefijo(self):
+        self.assertEqual(self.buscar('tecno'), [self.tecnologia])
+
+    def test_todas_las_palabras(self):
+        self.assertEqual(self.buscar('pedro rulfo'), [self.paramo])
+        self.assertEqual(self.buscar('pedro martinez'), [])
+
+    def test_otros_campos(self):
+        self.assertEqual(self.buscar('comala'), [self.paramo])
+        self.assertEqual(self.buscar('T-0101'), [self.tecnologia])
+
+    def test_texto_sin_palabras(self):
+        self.assertEqual(self.buscar('¿?'), [])
+
+    def test_q_libro(self):
+        alumno = Alumno.objects.create(matricula='A001', nombre='Ana')
+        prestamo = Prestamo.objects.create(
+            libro=self.paramo, alumno=alumno, fecha_vencimiento=timezone.localdate(),
+        )
+        self.assertEqual(list(Prestamo.objects.filter(busqueda.q_libro('paramo'))), [prestamo])
+        self.assertEqual(list(Prestamo.objects.filter(busqueda.q_libro('tecnologia'))), [])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class IndicesPorMotorTests(TransactionTestCase):
+    """Lo que crea 0012_indices_por_motor (o 0002 y 0009 en SQLite) en cada motor"""
+
+    ESPERADOS = {
+        'sqlite': {'app1_prestamo': {'prestamo_libro_activo_uniq'}},
+        'mysql': {
+            'app1_libro': {'libro_texto_ft'},
+            'app1_prestamo': {'prestamo_libro_activo_my', 'prestamo_activo_venc_my', 'prestamo_alumno_activo_my'},
+        },
+        'postgresql': {'app1_libro': {'libro_texto_gin'}, 'app1_prestamo': {'prestamo_libro_activo_uniq'}},
+    }
+
+    def indices(self, tabla):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, tabla))
+
+    def assertIndicesDelMotor(self):
+        for tabla, nombres in self.ESPERADOS.get(connection.vendor, {}).items():
+            with self.subTest(tabla):
+                self.assertLessEqual(nombres, self.indices(tabla))
+
+    def test_indices_del_motor(self):
+        self.assertIndicesDelMotor()
+        if connection.vendor == 'sqlite':
+            self.assertIn(busqueda.TABLA_FTS, connection.introspection.table_names())
+
+    def test_un_prestamo_activo_por_libro(self):
+        libro = Libro.objects.create(titulo='Aura', autor='Carlos Fuentes', publicacion=1962, codigo_inventario='T-0201')
+        alumno = Alumno.objects.create(matricula='A001', nombre='Ana')
+        datos = {'libro': libro, 'alumno': alumno, 'fecha_vencimiento': timezone.localdate()}
+        Prestamo.objects.bulk_create([Prestamo(**datos)])
+        with self.assertRaises(IntegrityError):
+            Prestamo.objects.bulk_create([Prestamo(**datos)])
+        Prestamo.objects.bulk_create([Prestamo(activo=False, **datos)])
+
+    def test_cierra_prestamos_activos_duplicados(self):
+        ejecutor = MigrationExecutor(connection)
+        ultima = ejecutor.loader.graph.leaf_nodes('app1')
+        anterior = [('app1', '0008_alumno')]
+        try:
+            ejecutor.migrate(anterior)
+            modelos = MigrationExecutor(connection).loader.project_state(anterior).apps
+            libro = modelos.get_model('app1', 'Libro').objects.create(
+                titulo='Aura', autor='Carlos Fuentes', publicacion=1962, codigo_inventario='T-0301', disponible=False,
+            )
+            alumno = modelos.get_model('app1', 'Alumno').objects.create(
+                matricula='A001', nombre='Ana', prestamos_activos=2,
+            )
+            prestamos = modelos.get_model('app1', 'Prestamo').objects
+            viejo = prestamos.create(libro=libro, alumno=alumno, fecha_vencimiento=timezone.localdate())
+            nuevo = prestamos.create(libro=libro, alumno=alumno, fecha_vencimiento=timezone.localdate())
+        finally:
+            MigrationExecutor(connection).migrate(ultima)
+        self.assertEqual(list(Prestamo.objects.filter(activo=True).values_list('pk', flat=True)), [nuevo.pk])
+        self.assertEqual(Prestamo.objects.get(pk=viejo.pk).estado, 'devuelto')
+        self.assertEqual(Alumno.objects.get(pk='A001').prestamos_activos, 1)
+        self.assertTrue(HistorialMovimiento.objects.filter(prestamo_id=viejo.pk, tipo='devolucion').exists())
+
+    def test_revertir_y_volver_a_aplicar(self):
+        ejecutor = MigrationExecutor(connection)
+        ultima = ejecutor.loader.graph.leaf_nodes('app1')
+        try:
+            ejecutor.migrate([('app1', '0011_historial_archivado')])
+            if connection.vendor == 'mysql':
+                self.assertNotIn('libro_texto_ft', self.indices('app1_libro'))
+        finally:
+            ejecutor = MigrationExecutor(connection)
+            ejecutor.migrate(ultima)
+        self.assertIndicesDelMotor()
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ConfiguracionTests(TestCase):
+    def setUp(self):
+        # La copia del proceso de otra prueba no coincide con una versión nueva
+        cache.clear()
+
+    def test_version_descartada_no_deja_copia_vieja(self):
+        ConfiguracionSistema.load()
+        copia_de_otro_worker = dict(_config_proceso)
+        # Se guarda un cambio, la caché descarta la versión y otro worker la vuelve a crear
+        ConfiguracionSistema.objects.filter(pk=1).update(dias_prestamo=30)
+        cache.delete(CLAVE_VERSION_CONFIG)
+        _config_proceso.clear()
+        ConfiguracionSistema.load()
+        # El primer worker aún tiene su copia anterior
+        _config_proceso.update(copia_de_otro_worker)
+        self.assertEqual(ConfiguracionSistema.load().dias_prestamo, 30)
+
+    def test_guardar_invalida_la_copia(self):
+        config = ConfiguracionSistema.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            ConfiguracionSistema.objects.filter(pk=1).update(max_renovaciones=5)
+            config.max_renovaciones = 5
+            config.save()
+        self.assertEqual(ConfiguracionSistema.load().max_renovaciones, 5)
+
+
+# TransactionTestCase: al salir se cierran las conexiones entre reintentos
+@override_settings(CACHES=CACHE_LOCAL, BITACORA_SINCRONA=False)
+class BitacoraTests(TransactionTestCase):
+    def tearDown(self):
+        bitacora._saliendo = False
+        del bitacora._cola[:]
+
+    def movimiento(self):
+        return HistorialMovimiento(tipo='alta', descripcion='Alta de prueba', usuario_responsable='pruebas')
+
+    def test_al_salir_reintenta_si_falla_la_base(self):
+        escribir = bitacora._escribir
+        intentos = []
+
+        def falla_la_primera_vez(tanda):
+            intentos.append(len(tanda))
+            if len(intentos) == 1:
+                raise DatabaseError('conexión perdida')
+            escribir(tanda)
+
+        bitacora._cola.append(self.movimiento())
+        with patch.object(bitacora, '_escribir', falla_la_primera_vez), \
+                patch.object(bitacora, 'PAUSA_REINTENTO', 0), \
+                self.assertLogs('app1.bitacora', 'ERROR'):
+            bitacora._al_salir()
+        self.assertEqual(intentos, [1, 1])
+        self.assertEqual(HistorialMovimiento.objects.count(), 1)
+
+    def test_al_salir_deja_en_el_log_lo_que_no_se_pudo_escribir(self):
+        bitacora._cola.append(self.movimiento())
+        with patch.object(bitacora, '_escribir', side_effect=DatabaseError('sin base')), \
+                patch.object(bitacora, 'PAUSA_REINTENTO', 0), \
+                self.assertLogs('app1.bitacora', 'ERROR') as logs:
+            bitacora._al_salir()
+        self.assertIn('Alta de prueba', logs.output[-1])
+        self.assertEqual(bitacora.pendientes(), 0)
+
+    def test_despues_de_salir_se_escribe_en_el_acto(self):
+        bitacora._saliendo = True
+        bitacora.registrar(self.movimiento())
+        self.assertEqual(HistorialMovimiento.objects.count(), 1)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class HuellaTests(TestCase):
+    def test_renombrar_alumno_cambia_la_huella(self):
+        alumno = Alumno.objects.create(matricula='A001', nombre='Ana')
+        antes = {tipo: trabajos.huella_datos(tipo) for tipo in ('prestamos', 'multas')}
+        Alumno.objects.filter(pk=alumno.pk).update(
+            nombre='Ana María', actualizado_en=timezone.now() + timedelta(seconds=1),
+        )
+        for tipo, huella in antes.items():
+            with self.subTest(tipo):
+                self.assertNotEqual(trabajos.huella_datos(tipo), huella)
+
+    def test_borrar_una_fila_antigua_cambia_la_huella(self):
+        antigua = Alumno.objects.create(matricula='A001', nombre='Ana')
+        Alumno.objects.create(matricula='A002', nombre='Beto')
+        antes = trabajos.huella_datos('multas')
+        antigua.delete()
+        self.assertNotEqual(trabajos.huella_datos('multas'), antes)
+
+    def test_huella_no_cuenta_filas(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            trabajos.huella_datos('prestamos')
+        self.assertFalse([c['sql'] for c in capturadas.captured_queries if 'COUNT(' in c['sql']])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ExportacionTests(TestCase):
+    PELIGROSOS = ['=HIPERVINCULO("http://x")', '+1', '-2+3', '@SUMA(A1)', '\t=1', '\r=1']
+
+    def setUp(self):
+        for texto in self.PELIGROSOS:
+            HistorialMovimiento.objects.create(tipo='alta', descripcion=texto, usuario_responsable='Sistema')
+        self.exportacion = exportacion.EXPORTACIONES['historial']
+
+    def test_csv_no_deja_formulas(self):
+        contenido = ''.join(exportacion.csv_en_flujo(self.exportacion, {}))
+        descripciones = [fila[6] for fila in csv.reader(io.StringIO(contenido.lstrip('\ufeff')))][1:]
+        self.assertCountEqual(descripciones, ["'" + texto for texto in self.PELIGROSOS])
+
+    def test_xlsx_no_deja_formulas(self):
+        archivo = exportacion.xlsx_temporal(self.exportacion, {})
+        self.addCleanup(archivo.close)
+        hoja = openpyxl.load_workbook(archivo).active
+        celdas = [fila[6] for fila in hoja.iter_rows(min_row=2)]
+        # El XML del XLSX guarda el \r como \n: basta con revisar el prefijo y el tipo
+        self.assertEqual(len(celdas), len(self.PELIGROSOS))
+        for celda in celdas:
+            with self.subTest(celda.value):
+                self.assertTrue(celda.value.startswith("'"))
+                self.assertEqual(celda.data_type, 's')
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class HistorialTests(TestCase):
+    HOY = date(2026, 6, 1)
+
+    def mover(self, dia, tipo='alta'):
+        return HistorialMovimiento.objects.create(
+            tipo=tipo, descripcion=f'{tipo} del {dia}', usuario_responsable='Sistema',
+            fecha=historial._inicio(dia) + timedelta(hours=12),
+        )
+
+    def resumen(self, dia):
+        return dict(ResumenMovimientos.objects.filter(fecha=dia).values_list('tipo', 'total'))
+
+    def test_resumir_vuelve_a_contar_el_ultimo_dia(self):
+        anteayer, ayer = self.HOY - timedelta(days=2), self.HOY - timedelta(days=1)
+        self.mover(anteayer)
+        self.mover(ayer)
+        self.assertEqual(historial.resumir(self.HOY), 2)
+        self.assertEqual(self.resumen(ayer), {'alta': 1})
+
+        # Llega tarde un movimiento de ayer (la bitácora escribe con retraso)
+        self.mover(ayer)
+        self.mover(ayer, 'baja')
+        self.assertEqual(historial.resumir(self.HOY), 1)
+        self.assertEqual(self.resumen(ayer), {'alta': 2, 'baja': 1})
+        self.assertEqual(self.resumen(anteayer), {'alta': 1})
+
+    def test_archivar_no_pasa_del_ultimo_resumido(self):
+        dias = [self.HOY - timedelta(days=400 - n) for n in range(3)]
+        movimientos = [self.mover(dia) for dia in dias]
+        self.assertEqual(historial.archivar(dias=180, hoy=self.HOY), 0)
+
+        # Se resumen los dos primeros días; el segundo es el último resumido
+        historial.resumir(dias[2])
+        self.assertEqual(historial.ultimo_resumido(), dias[1])
+        self.assertEqual(historial.archivar(dias=180, hoy=self.HOY), 1)
+        self.assertEqual(list(HistorialArchivado.objects.values_list('id', flat=True)), [movimientos[0].pk])
+        self.assertCountEqual(
+            HistorialMovimiento.objects.values_list('id', flat=True), [movimientos[1].pk, movimientos[2].pk],
+        )
+
+    def test_archivar_no_cambia_conteos_ni_movimientos(self):
+        desde = self.HOY - timedelta(days=10)
+        for n, tipo in enumerate(['alta', 'prestamo', 'devolucion', 'prestamo', 'baja'] * 2):
+            self.mover(desde + timedelta(days=n), tipo)
+        self.mover(self.HOY, 'prestamo')
+        historial.resumir(self.HOY)
+
+        antes = (historial.conteos(desde, self.HOY), list(historial.movimientos()))
+        self.assertEqual(historial.archivar(dias=3, hoy=self.HOY), 7)
+        self.assertEqual((historial.conteos(desde, self.HOY), list(historial.movimientos())), antes)
+        self.assertEqual(sum(sum(tipos.values()) for tipos in antes[0].values()), len(antes[1]))
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class EstadisticasTests(TestCase):
+    def test_reconciliar_bloquea_antes_de_contar(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            estadisticas.reconciliar()
+        consultas = [consulta['sql'] for consulta in capturadas.captured_queries if 'SELECT' in consulta['sql']]
+        self.assertIn('app1_contadorestadistica', consultas[0])
+        self.assertNotIn('COUNT', consultas[0])
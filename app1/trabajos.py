@@ -0,0 +1,163 @@
+# app1/trabajos.py
+"""
+Cola local de reportes en segundo plano.
+
+Las vistas solo registran un ``TrabajoReporte`` pendiente y el comando
+``procesar_reportes`` (un proceso aparte) genera los PDF. Cada archivo se
+identifica con una huella de los datos que contiene; si ya existe un
+reporte terminado con la misma huella se reutiliza sin volver a generarlo.
+"""
+import hashlib
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Alumno, Libro, Prestamo, Multa, ConfiguracionSistema, ContadorEstadistica, TrabajoReporte
+from . import replicas
+from . import reportes
+
+logger = logging.getLogger(__name__)
+
+REINTENTAR_TRAS = timedelta(minutes=15)
+
+# Tablas cuyo contenido aparece en cada reporte
+TABLAS_POR_REPORTE = {
+    'libros': [Libro],
+    'prestamos': [Prestamo, Libro, Alumno],
+    'multas': [Multa, Alumno],
+}
+
+# Contador (en ContadorEstadistica) de filas borradas de cada tabla
+PREFIJO_BAJAS = 'bajas_'
+
+
+def clave_bajas(modelo):
+    return f'{PREFIJO_BAJAS}{modelo._meta.label_lower}'
+
+
+def registrar_baja(modelo):
+    """Cuenta un borrado en ``modelo``: quitar una fila no mueve su último ``actualizado_en``."""
+    clave = clave_bajas(modelo)
+    if not ContadorEstadistica.objects.filter(clave=clave).update(
+        valor=F('valor') + 1, actualizado_en=timezone.now()
+    ):
+        ContadorEstadistica.objects.get_or_create(clave=clave, defaults={'valor': 1})
+
+
+def ultimo_cambio(modelo):
+    """Filas de ``modelo`` de la más reciente a la más antigua (se lee una del índice)."""
+    return modelo.objects.order_by('-actualizado_en').values_list('actualizado_en', flat=True)
+
+
+def huella_datos(tipo):
+    """
+    Hash de la versión de los datos que aparecen en el reporte: el último
+    ``actualizado_en`` de cada tabla y cuántas filas se le han borrado.
+    """
+    modelos = TABLAS_POR_REPORTE[tipo]
+    bajas = dict(
+        ContadorEstadistica.objects.filter(clave__in=[clave_bajas(modelo) for modelo in modelos])
+        .values_list('clave', 'valor')
+    )
+    partes = [tipo, ConfiguracionSistema.load().actualizado_en.isoformat()]
+    for modelo in modelos:
+        ultimo = ultimo_cambio(modelo).first()
+        ultimo = ultimo.isoformat() if ultimo else ''
+        partes.append(f"{modelo._meta.label}:{bajas.get(clave_bajas(modelo), 0)}:{ultimo}")
+    return hashlib.sha256('|'.join(partes).encode()).hexdigest()
+
+
+def reporte_vigente(tipo, huella):
+    """Trabajo terminado con la misma huella y cuyo archivo sigue en disco."""
+    trabajo = TrabajoReporte.objects.filter(tipo=tipo, huella=huella, estado='terminado').first()
+    if trabajo and trabajo.archivo and trabajo.archivo.storage.exists(trabajo.archivo.name):
+        return trabajo
+    return None
+
+
+def solicitar(tipo, usuario=''):
+    """
+    Devuelve un trabajo para el reporte ``tipo``: el terminado si los datos
+    no han cambiado, el que ya está en cola, o uno nuevo pendiente.
+    """
+    huella = huella_datos(tipo)
+    trabajo = reporte_vigente(tipo, huella)
+    if trabajo:
+        return trabajo
+
+    en_cola = TrabajoReporte.objects.filter(
+        tipo=tipo, huella=huella, estado__in=['pendiente', 'en_proceso']
+    ).first()
+    if en_cola:
+        return en_cola
+
+    return TrabajoReporte.objects.create(tipo=tipo, huella=huella, solicitado_por=usuario)
+
+
+def tomar_siguiente():
+    """Marca como 'en_proceso' el trabajo pendiente más antiguo y lo devuelve."""
+    # Trabajos de un worker que murió a medio proceso vuelven a la cola
+    TrabajoReporte.objects.filter(
+        estado='en_proceso', iniciado_en__lt=timezone.now() - REINTENTAR_TRAS
+    ).update(estado='pendiente')
+
+    while True:
+        trabajo = TrabajoReporte.objects.filter(estado='pendiente').order_by('creado_en').first()
+        if trabajo is None:
+            return None
+        # El UPDATE condicional evita que dos workers tomen el mismo trabajo
+        tomado = TrabajoReporte.objects.filter(pk=trabajo.pk, estado='pendiente').update(
+            estado='en_proceso', iniciado_en=timezone.now()
+        )
+        if tomado:
+            trabajo.refresh_from_db()
+            return trabajo
+
+
+def _replica_al_dia(trabajo):
+    """Indica si la réplica ya tiene los datos con los que se pidió el reporte."""
+    if not replicas.hay_replica():
+        return False
+    with replicas.en_replica():
+        return huella_datos(trabajo.tipo) == trabajo.huella
+
+
+def procesar(trabajo):
+    """
+    Genera el PDF del trabajo y lo guarda en MEDIA_ROOT/reportes/. Los datos
+    se leen de la réplica si ya está al día; si no, de la primaria.
+    """
+    try:
+        with replicas.en_replica() if _replica_al_dia(trabajo) else nullcontext():
+            archivo = reportes.generar_pdf_temporal(reportes.REPORTES[trabajo.tipo]())
+        with archivo:
+            nombre = f'{trabajo.tipo}_{trabajo.huella[:16]}.pdf'
+            trabajo.archivo.save(nombre, File(archivo), save=False)
+    except Exception as exc:
+        logger.exception('Error al generar el reporte #%s', trabajo.pk)
+        trabajo.estado = 'error'
+        trabajo.error = str(exc)
+    else:
+        trabajo.estado = 'terminado'
+    trabajo.terminado_en = timezone.now()
+    trabajo.save(update_fields=['archivo', 'estado', 'error', 'terminado_en'])
+    if trabajo.estado == 'terminado':
+        limpiar_anteriores(trabajo)
+    return trabajo
+
+
+@transaction.atomic
+def limpiar_anteriores(trabajo):
+    """Borra los archivos de reportes del mismo tipo que ya quedaron obsoletos."""
+    anteriores = TrabajoReporte.objects.filter(
+        tipo=trabajo.tipo, estado='terminado'
+    ).exclude(huella=trabajo.huella)
+    for anterior in anteriores:
+        if anterior.archivo:
+            anterior.archivo.delete(save=False)
+    anteriores.delete()
@@ -8,16 +8,35 @@ urlpatterns = [
     # Libros
     path('libros/', views.lista_libros, name='lista_libros'),
     path('libros/crear/', views.crear_libro, name='crear_libro'),
+    path('libros/importar/', views.importar_libros, name='importar_libros'),
     path('libros/<int:pk>/editar/', views.editar_libro, name='editar_libro'),
     path('libros/<int:pk>/eliminar/', views.eliminar_libro, name='eliminar_libro'),
     path('libros/disponibles/', views.libros_disponibles, name='libros_disponibles'),
     path('libros/prestados/', views.libros_prestados, name='libros_prestados'),
+    path('api/libros/', views.api_libros, name='api_libros'),
+    path('api/autocompletar/<str:tipo>/', views.api_autocompletar, name='api_autocompletar'),
     
     # Préstamos
     path('prestamos/', views.lista_prestamos, name='lista_prestamos'),
     path('prestamos/crear/', views.crear_prestamo, name='crear_prestamo'),
     path('prestamos/<int:pk>/devolver/', views.devolver_prestamo, name='devolver_prestamo'),
     path('prestamos/<int:pk>/renovar/', views.renovar_prestamo, name='renovar_prestamo'),
+    path('api/prestamos/', views.api_prestamos, name='api_prestamos'),
+    
+    # Mostrador con lector de códigos
+    path('mostrador/', views.mostrador, name='mostrador'),
+    path('api/circulacion/prestar/', views.api_prestar_lote, name='api_prestar_lote'),
+    path('api/circulacion/devolver/', views.api_devolver_lote, name='api_devolver_lote'),
 
+    # Reportes
     path('reporte/libros/pdf/', views.reporte_libros_pdf, name='reporte_libros_pdf'),
+    path('reportes/<str:tipo>/', views.solicitar_reporte, name='solicitar_reporte'),
+    path('reportes/trabajo/<int:pk>/estado/', views.estado_reporte, name='estado_reporte'),
+    path('reportes/trabajo/<int:pk>/descargar/', views.descargar_reporte, name='descargar_reporte'),
+
+    # Exportaciones
+    path('exportar/<str:tipo>/<str:formato>/', views.exportar, name='exportar'),
+
+    # Métricas
+    path('metricas/', views.metricas_vistas, name='metricas'),
 ]
\ No newline at end of file
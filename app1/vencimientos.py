@@ -0,0 +1,114 @@
+# app1/vencimientos.py
+"""
+Barrido de préstamos vencidos.
+
+Marca como ``vencido`` todos los préstamos activos cuya fecha de vencimiento
+ya pasó y calcula en la base de datos la multa acumulada hasta hoy
+(``dias_gracia`` y ``multa_por_dia`` de la configuración) con un solo
+``UPDATE``. Los préstamos que cambian de estado se registran en el historial
+con ``bulk_create``.
+
+El barrido es idempotente: volver a ejecutarlo el mismo día no genera
+movimientos nuevos ni reescribe los préstamos que ya tienen su monto. Se ejecuta con el comando
+``barrer_vencidos``. El monto es provisional: la devolución lo reemplaza
+por el de su multa (o cero) y la renovación lo regresa a cero.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, DateField, DecimalField, ExpressionWrapper, F, Func, IntegerField, Value, When,
+)
+from django.utils import timezone
+
+from .models import Prestamo, HistorialMovimiento, ConfiguracionSistema
+
+TAMANO_LOTE = 2000
+
+
+class DiasEntre(Func):
+    """Días entre dos fechas (``fin - inicio``) calculados en la base de datos."""
+    arity = 2
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='DATEDIFF(%(expressions)s)',
+            arg_joiner=', ',
+            **extra_context
+        )
+
+
+def multa_acumulada(hoy, config):
+    """Expresión con la multa por retraso de cada préstamo a la fecha ``hoy``."""
+    tipo_monto = DecimalField(max_digits=10, decimal_places=2)
+    dias_multa = DiasEntre(Value(hoy, output_field=DateField()), F('fecha_vencimiento')) - config.dias_gracia
+    return Case(
+        When(
+            fecha_vencimiento__lt=hoy - timedelta(days=config.dias_gracia),
+            then=ExpressionWrapper(dias_multa * Value(config.multa_por_dia), output_field=tipo_monto),
+        ),
+        default=Value(Decimal('0.00')),
+        output_field=tipo_monto,
+    )
+
+
+@transaction.atomic
+def barrer_vencidos(hoy=None, usuario='Sistema'):
+    """
+    Marca los préstamos vencidos y actualiza su multa acumulada.
+
+    Devuelve ``(nuevos, actualizados)``: los préstamos que pasaron a
+    ``vencido`` en esta ejecución y los que cambiaron de estado o de monto.
+    """
+    hoy = hoy or timezone.localdate()
+    config = ConfiguracionSistema.load()
+    vencidos = Prestamo.objects.filter(activo=True, fecha_vencimiento__lt=hoy)
+
+    # Movimientos solo para los que cambian de estado en este barrido
+    por_marcar = (
+        vencidos.exclude(estado='vencido')
+        .select_for_update()
+        .order_by()
+        .values_list('id', 'libro_id', 'libro__titulo', 'alumno_id', 'fecha_vencimiento')
+    )
+    nuevos = 0
+    lote = []
+    for prestamo_id, libro_id, titulo, matricula, vencimiento in por_marcar.iterator(chunk_size=TAMANO_LOTE):
+        lote.append(HistorialMovimiento(
+            tipo='vencimiento',
+            libro_id=libro_id,
+            prestamo_id=prestamo_id,
+            alumno_id=matricula,
+            descripcion=f'Préstamo de "{titulo}" vencido el {vencimiento.strftime("%d/%m/%Y")}',
+            usuario_responsable=usuario,
+        ))
+        if len(lote) == TAMANO_LOTE:
+            HistorialMovimiento.objects.bulk_create(lote)
+            nuevos += len(lote)
+            lote = []
+    if lote:
+        HistorialMovimiento.objects.bulk_create(lote)
+        nuevos += len(lote)
+
+    # Los que ya están vencidos con el monto de hoy se quedan como están: así
+    # no cambia su actualizado_en (ni la huella de los reportes) ni se bloquean
+    monto = multa_acumulada(hoy, config)
+    actualizados = vencidos.exclude(estado='vencido', monto_multa=monto).update(
+        estado='vencido',
+        monto_multa=monto,
+        actualizado_en=timezone.now(),
+    )
+    return nuevos, actualizados
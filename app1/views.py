@@ -1,89 +1,75 @@
-from django.http import HttpResponse
+import json
+
+from django.http import HttpResponseForbidden, JsonResponse, FileResponse, StreamingHttpResponse, Http404
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, Sum, Prefetch
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from datetime import timedelta, date
-from .models import Libro, Prestamo, Multa, HistorialMovimiento, ConfiguracionSistema
-from .forms import LibroForm, PrestamoForm, DevolucionForm, MultaForm
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib import colors
-
-from .models import Libro
-from .models import ConfiguracionSistema
-
-from django.utils import timezone
-
-
+from .models import Libro, Prestamo, Multa, HistorialMovimiento, ConfiguracionSistema, TrabajoReporte
+from .forms import LibroForm, PrestamoForm, DevolucionForm, MultaForm, ImportarLibrosForm, LibroImportacionForm
+from .paginacion import paginar, parametros_url
+from . import estadisticas
+from . import alumnos
+from . import autocompletar
+from . import bitacora
+from . import circulacion
+from . import exportacion
+from . import filtros
+from . import importacion
+from . import metricas
+from . import replicas
+from . import reportes
+from . import trabajos
+
+
+@metricas.presupuesto(5)
+@replicas.lectura
 def home(request):
     """Vista principal del dashboard"""
-    # Estadísticas generales
-    total_libros = Libro.objects.count()
-    libros_disponibles = Libro.objects.filter(disponible=True).count()
-    prestamos_activos = Prestamo.objects.filter(activo=True).count()
-    multas_pendientes = Multa.objects.filter(estado='pendiente').count()
+    # Estadísticas generales (contadores incrementales, una sola lectura)
+    stats = estadisticas.obtener()
     
     # Préstamos por vencer (próximos 3 días)
-    from datetime import timedelta
     fecha_limite = timezone.now().date() + timedelta(days=3)
     prestamos_por_vencer = Prestamo.objects.filter(
         activo=True,
         fecha_vencimiento__lte=fecha_limite,
         fecha_vencimiento__gte=timezone.now().date()
-    ).select_related('libro')[:5]
+    ).select_related('libro', 'alumno')[:5]
     
     # Últimos movimientos
     ultimos_movimientos = HistorialMovimiento.objects.all()[:10]
     
-    # Estadísticas por categoría
-    from django.db.models import Count
-    stats_categorias = Libro.objects.values('categoria').annotate(total=Count('id'))
-    categorias_dict = {stat['categoria']: stat['total'] for stat in stats_categorias}
-    
     context = {
-        'total_libros': total_libros,
-        'libros_disponibles': libros_disponibles,
-        'prestamos_activos': prestamos_activos,
-        'multas_pendientes': multas_pendientes,
+        'total_libros': stats['total_libros'],
+        'libros_disponibles': stats['libros_disponibles'],
+        'prestamos_activos': stats['prestamos_activos'],
+        'multas_pendientes': stats['multas_pendientes'],
         'prestamos_por_vencer': prestamos_por_vencer,
         'ultimos_movimientos': ultimos_movimientos,
-        'categorias_dict': categorias_dict,
+        'categorias_dict': stats['categorias_dict'],
     }
     return render(request, 'app1/home.html', context)
 
 
+@metricas.presupuesto(3)
+@replicas.lectura
 def lista_libros(request):
     """Vista para listar todos los libros con búsqueda y filtros"""
-    libros = Libro.objects.all()
-    
-    # Búsqueda
-    query = request.GET.get('q')
-    if query:
-        libros = libros.filter(
-            Q(titulo__icontains=query) |
-            Q(autor__icontains=query) |
-            Q(codigo_inventario__icontains=query)
-        )
-    
-    # Filtro por categoría
-    categoria = request.GET.get('categoria')
-    if categoria:
-        libros = libros.filter(categoria=categoria)
-    
-    # Filtro por disponibilidad
-    disponible = request.GET.get('disponible')
-    if disponible:
-        libros = libros.filter(disponible=disponible == 'true')
+    libros, query, categoria = filtros.filtrar_libros(request.GET, Libro.objects.all())
+    pagina = paginar(libros, request.GET.get('cursor'), relevancia=bool(query))
     
     categorias = Libro.CATEGORIAS
     
     context = {
-        'libros': libros,
+        'libros': pagina,
+        'pagina': pagina,
+        'total': pagina.total,
+        'parametros': parametros_url(request),
         'categorias': categorias,
         'query': query or '',
         'categoria_seleccionada': categoria or '',
@@ -91,6 +77,45 @@ def lista_libros(request):
     return render(request, 'app1/lista_libros.html', context)
 
 
+@metricas.presupuesto(3)
+@replicas.lectura
+def api_libros(request):
+    """Página de libros en JSON para carga continua (scroll infinito)"""
+    libros, query, categoria = filtros.filtrar_libros(request.GET, Libro.objects.all())
+    pagina = paginar(libros, request.GET.get('cursor'), relevancia=bool(query))
+    
+    resultados = [
+        {
+            'id': libro.pk,
+            'codigo_inventario': libro.codigo_inventario,
+            'titulo': libro.titulo,
+            'subtitulo': libro.subtitulo,
+            'autor': libro.autor,
+            'categoria': libro.get_categoria_display(),
+            'disponible': libro.disponible,
+        }
+        for libro in pagina
+    ]
+    return JsonResponse({
+        'resultados': resultados,
+        'total': pagina.total,
+        'siguiente': pagina.cursor_siguiente,
+    })
+
+
+@replicas.lectura
+def api_autocompletar(request, tipo):
+    """Opciones de los select con búsqueda (libros o préstamos) en JSON"""
+    if tipo not in autocompletar.BUSQUEDAS:
+        raise Http404('Búsqueda no encontrada')
+    
+    opciones = autocompletar.opciones(tipo, request.GET.get('q'), request.GET)
+    return JsonResponse({
+        'resultados': [{'id': pk, 'texto': texto} for pk, texto in opciones],
+    })
+
+
+@metricas.presupuesto(2)
 def crear_libro(request):
     """Vista para crear un nuevo libro"""
     if request.method == 'POST':
@@ -99,12 +124,12 @@ def crear_libro(request):
             libro = form.save()
             
             # Registrar en historial
-            HistorialMovimiento.objects.create(
+            bitacora.registrar(HistorialMovimiento(
                 tipo='alta',
                 libro=libro,
                 descripcion=f'Alta de libro: {libro.titulo}',
                 usuario_responsable=request.user.username if request.user.is_authenticated else 'Sistema'
-            )
+            ))
             
             messages.success(request, f'Libro "{libro.titulo}" agregado exitosamente.')
             return redirect('lista_libros')
@@ -118,6 +143,38 @@ def crear_libro(request):
     return render(request, 'app1/crear_libro.html', context)
 
 
+@metricas.presupuesto(2)
+def importar_libros(request):
+    """Vista para dar de alta libros en forma masiva desde un CSV o XLSX"""
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarLibrosForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            try:
+                resultado = importacion.importar(
+                    archivo,
+                    archivo.name,
+                    usuario=request.user.username if request.user.is_authenticated else 'Sistema'
+                )
+            except ValueError as error:
+                form.add_error('archivo', str(error))
+            else:
+                if resultado.creados:
+                    messages.success(request, f'Se importaron {resultado.creados} libro(s).')
+                if resultado.omitidas:
+                    messages.warning(request, f'{resultado.omitidas} fila(s) no se importaron.')
+    else:
+        form = ImportarLibrosForm()
+    
+    context = {
+        'form': form,
+        'resultado': resultado,
+        'columnas': list(LibroImportacionForm.base_fields),
+    }
+    return render(request, 'app1/importar_libros.html', context)
+
+
 def editar_libro(request, pk):
     """Vista para editar un libro existente"""
     libro = get_object_or_404(Libro, pk=pk)
@@ -128,12 +185,12 @@ def editar_libro(request, pk):
             libro = form.save()
             
             # Registrar en historial
-            HistorialMovimiento.objects.create(
+            bitacora.registrar(HistorialMovimiento(
                 tipo='alta',
                 libro=libro,
                 descripcion=f'Actualización de libro: {libro.titulo}',
                 usuario_responsable=request.user.username if request.user.is_authenticated else 'Sistema'
-            )
+            ))
             
             messages.success(request, f'Libro "{libro.titulo}" actualizado exitosamente.')
             return redirect('lista_libros')
@@ -161,11 +218,11 @@ def eliminar_libro(request, pk):
         titulo = libro.titulo
         
         # Registrar en historial antes de eliminar
-        HistorialMovimiento.objects.create(
+        bitacora.registrar(HistorialMovimiento(
             tipo='baja',
             descripcion=f'Baja de libro: {titulo} (ISBN: {libro.isbn})',
             usuario_responsable=request.user.username if request.user.is_authenticated else 'Sistema'
-        )
+        ))
         
         libro.delete()
         messages.success(request, f'Libro "{titulo}" eliminado exitosamente.')
@@ -177,29 +234,20 @@ def eliminar_libro(request, pk):
     return render(request, 'app1/eliminar_libro.html', context)
 
 
+@metricas.presupuesto(3)
+@replicas.lectura
 def libros_disponibles(request):
     """Vista para listar solo libros disponibles"""
-    libros = Libro.objects.filter(disponible=True)
-    
-    # Búsqueda
-    query = request.GET.get('q')
-    if query:
-        libros = libros.filter(
-            Q(titulo__icontains=query) |
-            Q(autor__icontains=query) |
-            Q(isbn__icontains=query) |
-            Q(codigo_inventario__icontains=query)
-        )
-    
-    # Filtro por categoría
-    categoria = request.GET.get('categoria')
-    if categoria:
-        libros = libros.filter(categoria=categoria)
+    libros, query, categoria = filtros.filtrar_libros(request.GET, Libro.objects.filter(disponible=True))
+    pagina = paginar(libros, request.GET.get('cursor'), relevancia=bool(query))
     
     categorias = Libro.CATEGORIAS
     
     context = {
-        'libros': libros,
+        'libros': pagina,
+        'pagina': pagina,
+        'total': pagina.total,
+        'parametros': parametros_url(request),
         'categorias': categorias,
         'query': query or '',
         'categoria_seleccionada': categoria or '',
@@ -209,39 +257,37 @@ def libros_disponibles(request):
     return render(request, 'app1/libros_disponibles.html', context)
 
 
+@metricas.presupuesto(4)
+@replicas.lectura
 def libros_prestados(request):
     """Vista para listar solo libros prestados (no disponibles)"""
-    from datetime import date
-    libros = Libro.objects.filter(disponible=False).select_related()
-    
-    # Obtener información de préstamos activos
-    libros_con_prestamo = []
-    for libro in libros:
-        prestamo_activo = Prestamo.objects.filter(libro=libro, activo=True).first()
-        libros_con_prestamo.append({
-            'libro': libro,
-            'prestamo': prestamo_activo
-        })
-    
-    # Búsqueda
-    query = request.GET.get('q')
-    if query:
-        libros = libros.filter(
-            Q(titulo__icontains=query) |
-            Q(autor__icontains=query) |
-            Q(isbn__icontains=query) |
-            Q(codigo_inventario__icontains=query)
+    libros, query, categoria = filtros.filtrar_libros(request.GET, Libro.objects.filter(disponible=False))
+    
+    # Préstamo activo de cada libro en una sola consulta adicional
+    libros = libros.prefetch_related(
+        Prefetch(
+            'prestamo_set',
+            queryset=Prestamo.objects.filter(activo=True).select_related('alumno'),
+            to_attr='prestamos_activos'
         )
+    )
+    pagina = paginar(libros, request.GET.get('cursor'), relevancia=bool(query))
     
-    # Filtro por categoría
-    categoria = request.GET.get('categoria')
-    if categoria:
-        libros = libros.filter(categoria=categoria)
+    libros_con_prestamo = [
+        {
+            'libro': libro,
+            'prestamo': libro.prestamos_activos[0] if libro.prestamos_activos else None
+        }
+        for libro in pagina
+    ]
     
     categorias = Libro.CATEGORIAS
     
     context = {
         'libros_con_prestamo': libros_con_prestamo,
+        'pagina': pagina,
+        'total': pagina.total,
+        'parametros': parametros_url(request),
         'categorias': categorias,
         'query': query or '',
         'categoria_seleccionada': categoria or '',
@@ -254,29 +300,12 @@ def libros_prestados(request):
 
 # ==================== VISTAS DE PRÉSTAMOS ====================
 
+@metricas.presupuesto(4)
+@replicas.lectura
 def lista_prestamos(request):
     """Vista para listar todos los préstamos"""
-    prestamos = Prestamo.objects.all().select_related('libro')
-    
-    # Filtros
-    estado = request.GET.get('estado')
-    if estado:
-        prestamos = prestamos.filter(estado=estado)
-    
-    activo = request.GET.get('activo')
-    if activo == 'true':
-        prestamos = prestamos.filter(activo=True)
-    elif activo == 'false':
-        prestamos = prestamos.filter(activo=False)
-    
-    # Búsqueda
-    query = request.GET.get('q')
-    if query:
-        prestamos = prestamos.filter(
-            Q(alumno_nombre__icontains=query) |
-            Q(alumno_matricula__icontains=query) |
-            Q(libro__titulo__icontains=query)
-        )
+    prestamos, query = filtros.filtrar_prestamos(request.GET, Prestamo.objects.all().select_related('libro', 'alumno'))
+    pagina = paginar(prestamos, request.GET.get('cursor'))
     
     # Préstamos vencidos
     prestamos_vencidos = prestamos.filter(
@@ -285,7 +314,10 @@ def lista_prestamos(request):
     ).count()
     
     context = {
-        'prestamos': prestamos,
+        'prestamos': pagina,
+        'pagina': pagina,
+        'total': pagina.total,
+        'parametros': parametros_url(request),
         'prestamos_vencidos': prestamos_vencidos,
         'query': query or '',
         'today': date.today(),
@@ -293,50 +325,48 @@ def lista_prestamos(request):
     return render(request, 'app1/lista_prestamos.html', context)
 
 
+@metricas.presupuesto(3)
+@replicas.lectura
+def api_prestamos(request):
+    """Página de préstamos en JSON para carga continua (scroll infinito)"""
+    prestamos, query = filtros.filtrar_prestamos(request.GET, Prestamo.objects.all().select_related('libro', 'alumno'))
+    pagina = paginar(prestamos, request.GET.get('cursor'))
+    
+    resultados = [
+        {
+            'id': prestamo.pk,
+            'libro': prestamo.libro.titulo,
+            'alumno_nombre': prestamo.alumno.nombre,
+            'alumno_matricula': prestamo.alumno_id,
+            'fecha_prestamo': prestamo.fecha_prestamo.isoformat(),
+            'fecha_vencimiento': prestamo.fecha_vencimiento.isoformat(),
+            'estado': prestamo.estado,
+            'activo': prestamo.activo,
+        }
+        for prestamo in pagina
+    ]
+    return JsonResponse({
+        'resultados': resultados,
+        'total': pagina.total,
+        'siguiente': pagina.cursor_siguiente,
+    })
+
+
+@metricas.presupuesto(3)
 def crear_prestamo(request):
     """Vista para crear un nuevo préstamo"""
     if request.method == 'POST':
         form = PrestamoForm(request.POST)
         if form.is_valid():
-            prestamo = form.save(commit=False)
+            usuario = request.user.username if request.user.is_authenticated else 'Sistema'
             
-            # Verificar si el libro está disponible
-            if not prestamo.libro.disponible:
-                messages.error(request, 'Este libro no está disponible para préstamo.')
+            # Disponibilidad, límite de préstamos e historial en una sola transacción
+            try:
+                prestamo = circulacion.prestar(form.save(commit=False), form.datos_alumno(), usuario)
+            except circulacion.ErrorCirculacion as error:
+                messages.error(request, str(error))
                 return redirect('crear_prestamo')
             
-            # Verificar límite de préstamos simultáneos
-            config = ConfiguracionSistema.load()
-            prestamos_activos = Prestamo.objects.filter(
-                alumno_matricula=prestamo.alumno_matricula,
-                activo=True
-            ).count()
-            
-            if prestamos_activos >= config.max_prestamos_simultaneos:
-                messages.error(
-                    request, 
-                    f'El alumno ya tiene {prestamos_activos} préstamos activos. '
-                    f'Máximo permitido: {config.max_prestamos_simultaneos}'
-                )
-                return redirect('crear_prestamo')
-            
-            # Asignar usuario responsable
-            prestamo.prestado_por = request.user.username if request.user.is_authenticated else 'Sistema'
-            
-            # Guardar préstamo
-            prestamo.save()
-            
-            # Registrar en historial
-            HistorialMovimiento.objects.create(
-                tipo='prestamo',
-                libro=prestamo.libro,
-                prestamo=prestamo,
-                alumno_nombre=prestamo.alumno_nombre,
-                alumno_matricula=prestamo.alumno_matricula,
-                descripcion=f'Préstamo de "{prestamo.libro.titulo}" a {prestamo.alumno_nombre}',
-                usuario_responsable=request.user.username if request.user.is_authenticated else 'Sistema'
-            )
-            
             messages.success(
                 request, 
                 f'Préstamo registrado exitosamente. Fecha de devolución: {prestamo.fecha_vencimiento.strftime("%d/%m/%Y")}'
@@ -357,71 +387,38 @@ def crear_prestamo(request):
 
 def devolver_prestamo(request, pk):
     """Vista para devolver un libro prestado"""
-    prestamo = get_object_or_404(Prestamo, pk=pk)
-    
-    if not prestamo.activo:
-        messages.warning(request, 'Este préstamo ya fue devuelto.')
-        return redirect('lista_prestamos')
-    
     if request.method == 'POST':
         form = DevolucionForm(request.POST)
         if form.is_valid():
-            # Actualizar préstamo
-            prestamo.activo = False
-            prestamo.estado = 'devuelto'
-            prestamo.fecha_devolucion_real = timezone.now().date()
-            prestamo.notas_devolucion = form.cleaned_data['notas_devolucion']
-            prestamo.recibido_por = request.user.username if request.user.is_authenticated else 'Sistema'
+            usuario = request.user.username if request.user.is_authenticated else 'Sistema'
+            try:
+                prestamo, multa = circulacion.devolver(pk, form.cleaned_data['notas_devolucion'], usuario)
+            except Prestamo.DoesNotExist:
+                raise Http404('Préstamo no encontrado')
+            except circulacion.ErrorCirculacion as error:
+                messages.warning(request, str(error))
+                return redirect('lista_prestamos')
             
-            # Verificar si hay retraso y generar multa
-            if prestamo.fecha_devolucion_real > prestamo.fecha_vencimiento:
+            if multa:
                 dias_retraso = (prestamo.fecha_devolucion_real - prestamo.fecha_vencimiento).days
-                config = ConfiguracionSistema.load()
-                
-                if dias_retraso > config.dias_gracia:
-                    dias_multa = dias_retraso - config.dias_gracia
-                    monto_multa = dias_multa * config.multa_por_dia
-                    
-                    # Crear multa
-                    multa = Multa.objects.create(
-                        prestamo=prestamo,
-                        libro=prestamo.libro,
-                        alumno_nombre=prestamo.alumno_nombre,
-                        alumno_matricula=prestamo.alumno_matricula,
-                        tipo='retraso',
-                        monto=monto_multa,
-                        descripcion=f'Multa por {dias_multa} días de retraso en la devolución de "{prestamo.libro.titulo}"'
-                    )
-                    
-                    prestamo.tiene_multa = True
-                    prestamo.monto_multa = monto_multa
-                    
-                    messages.warning(
-                        request,
-                        f'Libro devuelto con {dias_retraso} días de retraso. '
-                        f'Se generó una multa de ${monto_multa:.2f}'
-                    )
-            
-            prestamo.save()
-            
-            # Registrar en historial
-            HistorialMovimiento.objects.create(
-                tipo='devolucion',
-                libro=prestamo.libro,
-                prestamo=prestamo,
-                alumno_nombre=prestamo.alumno_nombre,
-                alumno_matricula=prestamo.alumno_matricula,
-                descripcion=f'Devolución de "{prestamo.libro.titulo}" por {prestamo.alumno_nombre}',
-                usuario_responsable=request.user.username if request.user.is_authenticated else 'Sistema'
-            )
-            
-            if not prestamo.tiene_multa:
+                messages.warning(
+                    request,
+                    f'Libro devuelto con {dias_retraso} días de retraso. '
+                    f'Se generó una multa de ${multa.monto:.2f}'
+                )
+            else:
                 messages.success(request, 'Libro devuelto exitosamente.')
             
             return redirect('lista_prestamos')
     else:
         form = DevolucionForm()
     
+    prestamo = get_object_or_404(Prestamo.objects.select_related('libro', 'alumno'), pk=pk)
+    
+    if not prestamo.activo:
+        messages.warning(request, 'Este préstamo ya fue devuelto.')
+        return redirect('lista_prestamos')
+    
     # Calcular días de retraso si los hay
     dias_retraso = 0
     if timezone.now().date() > prestamo.fecha_vencimiento:
@@ -437,42 +434,15 @@ def devolver_prestamo(request, pk):
 
 def renovar_prestamo(request, pk):
     """Vista para renovar un préstamo"""
-    prestamo = get_object_or_404(Prestamo, pk=pk)
-    config = ConfiguracionSistema.load()
-    
-    if not prestamo.activo:
-        messages.error(request, 'No se puede renovar un préstamo que ya fue devuelto.')
-        return redirect('lista_prestamos')
-    
-    if prestamo.renovaciones >= config.max_renovaciones:
-        messages.error(
-            request, 
-            f'Este préstamo ya alcanzó el máximo de renovaciones ({config.max_renovaciones}).'
-        )
-        return redirect('lista_prestamos')
-    
-    # Verificar que no tenga multas pendientes
-    if Multa.objects.filter(alumno_matricula=prestamo.alumno_matricula, estado='pendiente').exists():
-        messages.error(request, 'El alumno tiene multas pendientes. Debe pagarlas antes de renovar.')
-        return redirect('lista_prestamos')
-    
     if request.method == 'POST':
-        # Renovar préstamo
-        prestamo.renovaciones += 1
-        prestamo.fecha_vencimiento = timezone.now().date() + timedelta(days=config.dias_prestamo)
-        prestamo.estado = 'renovado'
-        prestamo.save()
-        
-        # Registrar en historial
-        HistorialMovimiento.objects.create(
-            tipo='renovacion',
-            libro=prestamo.libro,
-            prestamo=prestamo,
-            alumno_nombre=prestamo.alumno_nombre,
-            alumno_matricula=prestamo.alumno_matricula,
-            descripcion=f'Renovación #{prestamo.renovaciones} de "{prestamo.libro.titulo}" para {prestamo.alumno_nombre}',
-            usuario_responsable=request.user.username if request.user.is_authenticated else 'Sistema'
-        )
+        usuario = request.user.username if request.user.is_authenticated else 'Sistema'
+        try:
+            prestamo = circulacion.renovar(pk, usuario)
+        except Prestamo.DoesNotExist:
+            raise Http404('Préstamo no encontrado')
+        except circulacion.ErrorCirculacion as error:
+            messages.error(request, str(error))
+            return redirect('lista_prestamos')
         
         messages.success(
             request,
@@ -480,6 +450,15 @@ def renovar_prestamo(request, pk):
         )
         return redirect('lista_prestamos')
     
+    prestamo = get_object_or_404(Prestamo.objects.select_related('libro', 'alumno'), pk=pk)
+    config = ConfiguracionSistema.load()
+    
+    try:
+        circulacion.validar_renovacion(prestamo, config)
+    except circulacion.ErrorCirculacion as error:
+        messages.error(request, str(error))
+        return redirect('lista_prestamos')
+    
     context = {
         'prestamo': prestamo,
         'config': config,
@@ -487,38 +466,129 @@ def renovar_prestamo(request, pk):
     return render(request, 'app1/renovar_prestamo.html', context)
 
 
+# ==================== MOSTRADOR (LECTOR DE CÓDIGOS) ====================
+
+@metricas.presupuesto(2)
+def mostrador(request):
+    """Pantalla de préstamo y devolución por lote con lector de códigos de barras"""
+    context = {
+        'config': ConfiguracionSistema.load(),
+        'max_lote': circulacion.MAX_LOTE,
+    }
+    return render(request, 'app1/mostrador.html', context)
+
+
+def _leer_json(request):
+    """Cuerpo JSON de la petición como diccionario, o None si no es válido"""
+    try:
+        datos = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return datos if isinstance(datos, dict) else None
+
+
+def _error_json(mensaje, status, codigos=()):
+    return JsonResponse({'error': mensaje, 'codigos': list(codigos)}, status=status)
+
+
+@require_POST
+def api_prestar_lote(request):
+    """
+    Presta los libros escaneados a un alumno en una sola transacción.
+    Recibe ``{"matricula": "...", "codigos": [...], "nombre": "..."}``
+    (``nombre`` solo hace falta para un alumno nuevo).
+    """
+    datos = _leer_json(request)
+    if datos is None or not str(datos.get('matricula') or '').strip() or not isinstance(datos.get('codigos'), list):
+        return _error_json('Envíe un JSON con "matricula" y la lista "codigos".', 400)
+    
+    try:
+        alumno, prestamos = circulacion.prestar_lote(
+            str(datos['matricula']).strip(),
+            datos['codigos'],
+            usuario=request.user.username if request.user.is_authenticated else 'Sistema',
+            nombre=str(datos.get('nombre') or '').strip() or None,
+        )
+    except circulacion.ErrorCirculacion as error:
+        return _error_json(str(error), 409, error.codigos)
+    
+    return JsonResponse({
+        'alumno': {
+            'matricula': alumno.matricula,
+            'nombre': alumno.nombre,
+            'prestamos_activos': alumno.prestamos_activos,
+        },
+        'prestamos': [
+            {
+                'id': prestamo.pk,
+                'codigo_inventario': prestamo.libro.codigo_inventario,
+                'titulo': prestamo.libro.titulo,
+                'fecha_vencimiento': prestamo.fecha_vencimiento.isoformat(),
+            }
+            for prestamo in prestamos
+        ],
+    }, status=201)
+
+
+@require_POST
+def api_devolver_lote(request):
+    """
+    Registra la devolución de los libros escaneados en una sola transacción
+    y genera la multa por retraso de cada uno. Recibe ``{"codigos": [...]}``.
+    """
+    datos = _leer_json(request)
+    if datos is None or not isinstance(datos.get('codigos'), list):
+        return _error_json('Envíe un JSON con la lista "codigos".', 400)
+    
+    try:
+        devoluciones = circulacion.devolver_lote(
+            datos['codigos'],
+            usuario=request.user.username if request.user.is_authenticated else 'Sistema',
+            notas=str(datos.get('notas') or ''),
+        )
+    except circulacion.ErrorCirculacion as error:
+        return _error_json(str(error), 409, error.codigos)
+    
+    return JsonResponse({
+        'devoluciones': [
+            {
+                'id': prestamo.pk,
+                'codigo_inventario': prestamo.libro.codigo_inventario,
+                'titulo': prestamo.libro.titulo,
+                'alumno': prestamo.alumno.nombre,
+                'matricula': prestamo.alumno_id,
+                'dias_retraso': max((prestamo.fecha_devolucion_real - prestamo.fecha_vencimiento).days, 0),
+                'multa': f'{multa.monto:.2f}' if multa else None,
+            }
+            for prestamo, multa in devoluciones
+        ],
+        'total_multas': f'{sum(multa.monto for _, multa in devoluciones if multa):.2f}',
+    })
+
+
 # ==================== VISTAS DE MULTAS ====================
 
+@metricas.presupuesto(4)
+@replicas.lectura
 def lista_multas(request):
     """Vista para listar todas las multas"""
-    multas = Multa.objects.all().select_related('libro', 'prestamo')
-    
-    # Filtros
-    estado = request.GET.get('estado')
-    if estado:
-        multas = multas.filter(estado=estado)
-    
-    tipo = request.GET.get('tipo')
-    if tipo:
-        multas = multas.filter(tipo=tipo)
-    
-    # Búsqueda
-    query = request.GET.get('q')
-    if query:
-        multas = multas.filter(
-            Q(alumno_nombre__icontains=query) |
-            Q(alumno_matricula__icontains=query) |
-            Q(libro__titulo__icontains=query)
-        )
+    multas, query = filtros.filtrar_multas(request.GET, Multa.objects.all().select_related('libro', 'prestamo', 'alumno'))
+    pagina = paginar(multas, request.GET.get('cursor'))
     
     # Estadísticas
-    multas_pendientes = multas.filter(estado='pendiente').count()
-    total_pendiente = sum(m.monto for m in multas.filter(estado='pendiente'))
+    pendientes = Q(estado='pendiente')
+    resumen = multas.order_by().aggregate(
+        multas_pendientes=Count('id', filter=pendientes),
+        total_pendiente=Sum('monto', filter=pendientes, default=0),
+    )
     
     context = {
-        'multas': multas,
-        'multas_pendientes': multas_pendientes,
-        'total_pendiente': total_pendiente,
+        'multas': pagina,
+        'pagina': pagina,
+        'total': pagina.total,
+        'parametros': parametros_url(request),
+        'multas_pendientes': resumen['multas_pendientes'],
+        'total_pendiente': resumen['total_pendiente'],
         'query': query or '',
     }
     return render(request, 'app1/lista_multas.html', context)
@@ -529,7 +599,14 @@ def crear_multa(request):
     if request.method == 'POST':
         form = MultaForm(request.POST)
         if form.is_valid():
-            multa = form.save()
+            # La multa y el saldo del alumno se guardan juntos
+            with transaction.atomic():
+                multa = form.save(commit=False)
+                multa.alumno = alumnos.registrar(
+                    form.cleaned_data['alumno_matricula'],
+                    form.cleaned_data['alumno_nombre'],
+                )
+                multa.save()
             
             messages.success(request, f'Multa de ${multa.monto:.2f} creada exitosamente.')
             return redirect('lista_multas')
@@ -553,15 +630,24 @@ def pagar_multa(request, pk):
     if request.method == 'POST':
         recibo = request.POST.get('recibo', '')
         
-        multa.estado = 'pagada'
-        multa.fecha_pago = timezone.now().date()
-        multa.recibo = recibo
-        multa.save()
-        
-        # Actualizar préstamo si existe
-        if multa.prestamo:
-            multa.prestamo.multa_pagada = True
-            multa.prestamo.save()
+        with transaction.atomic():
+            # Bloquear la multa para que un pago doble no descuente dos veces el saldo
+            multa = get_object_or_404(Multa.objects.select_for_update(), pk=pk)
+            if multa.estado == 'pagada':
+                messages.warning(request, 'Esta multa ya fue pagada.')
+                return redirect('lista_multas')
+            
+            multa.estado = 'pagada'
+            multa.fecha_pago = timezone.now().date()
+            multa.recibo = recibo
+            multa.save(update_fields=['estado', 'fecha_pago', 'recibo', 'actualizado_en'])
+            
+            # Solo cambia la marca del préstamo: no se carga ni dispara sus señales
+            if multa.prestamo_id:
+                Prestamo.objects.filter(pk=multa.prestamo_id).update(
+                    multa_pagada=True,
+                    actualizado_en=timezone.now(),
+                )
         
         messages.success(request, f'Multa de ${multa.monto:.2f} pagada exitosamente.')
         return redirect('lista_multas')
@@ -581,8 +667,14 @@ def condonar_multa(request, pk):
         return redirect('lista_multas')
     
     if request.method == 'POST':
-        multa.estado = 'condonada'
-        multa.save()
+        with transaction.atomic():
+            multa = get_object_or_404(Multa.objects.select_for_update(), pk=pk)
+            if multa.estado != 'pendiente':
+                messages.warning(request, 'Solo se pueden condonar multas pendientes.')
+                return redirect('lista_multas')
+            
+            multa.estado = 'condonada'
+            multa.save()
         
         messages.success(request, f'Multa de ${multa.monto:.2f} condonada exitosamente.')
         return redirect('lista_multas')
@@ -592,83 +684,91 @@ def condonar_multa(request, pk):
     }
     return render(request, 'app1/condonar_multa.html', context)
 
+# ==================== VISTAS DE REPORTES ====================
+
 def reporte_libros_pdf(request):
-    # Configuración de la respuesta HTTP
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="reporte_libros.pdf"'
+    """Reporte PDF del catálogo completo"""
+    return solicitar_reporte(request, 'libros')
 
-    # Crear el PDF
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
 
-    # Cargar configuración del sistema
-    config = ConfiguracionSistema.load()
+def _descargar(trabajo):
+    return FileResponse(
+        trabajo.archivo.open('rb'),
+        filename=f'reporte_{trabajo.tipo}.pdf',
+        content_type='application/pdf'
+    )
+
+
+def solicitar_reporte(request, tipo):
+    """Entrega el reporte si ya está generado con los datos actuales o lo pone en cola"""
+    if tipo not in reportes.REPORTES:
+        raise Http404('Reporte no encontrado')
+    
+    trabajo = trabajos.solicitar(
+        tipo,
+        usuario=request.user.username if request.user.is_authenticated else 'Sistema'
+    )
+    if trabajo.estado == 'terminado':
+        return _descargar(trabajo)
+    
+    context = {
+        'trabajo': trabajo,
+    }
+    return render(request, 'app1/reporte_estado.html', context)
+
+
+def estado_reporte(request, pk):
+    """Estado de un trabajo de reporte en JSON (la página de espera lo consulta)"""
+    trabajo = get_object_or_404(TrabajoReporte, pk=pk)
+    datos = {
+        'estado': trabajo.estado,
+        'estado_display': trabajo.get_estado_display(),
+        'error': trabajo.error,
+    }
+    if trabajo.estado == 'terminado':
+        datos['url'] = reverse('descargar_reporte', args=[trabajo.pk])
+    return JsonResponse(datos)
 
-    # Título
-    p.setFont("Helvetica-Bold", 18)
-    p.drawCentredString(width / 2, height - 2.5 * cm, config.nombre_biblioteca)
 
-    p.setFont("Helvetica", 13)
-    p.drawCentredString(width / 2, height - 3.5 * cm, "Reporte General de Libros")
+def descargar_reporte(request, pk):
+    """Descarga el PDF de un trabajo terminado"""
+    trabajo = get_object_or_404(TrabajoReporte, pk=pk, estado='terminado')
+    return _descargar(trabajo)
 
 
-    # Fecha
-    p.setFont("Helvetica", 9)
-    fecha_actual = timezone.now().strftime("%d/%m/%Y")
-    p.drawRightString(
-        width - 2 * cm,
-        height - 1.5 * cm,
-        f"Fecha de generación: {fecha_actual}"
+# ==================== EXPORTACIONES ====================
+
+@replicas.lectura
+def exportar(request, tipo, formato):
+    """Descarga préstamos, multas o historial en CSV o XLSX con los filtros de la lista"""
+    datos = exportacion.EXPORTACIONES.get(tipo)
+    if datos is None or formato not in exportacion.FORMATOS:
+        raise Http404('Exportación no encontrada')
+    
+    nombre = f'{tipo}_{timezone.localdate():%Y%m%d}.{formato}'
+    if formato == 'xlsx':
+        return FileResponse(
+            exportacion.xlsx_temporal(datos, request.GET),
+            as_attachment=True,
+            filename=nombre,
+            content_type=exportacion.TIPO_XLSX
+        )
+    
+    response = StreamingHttpResponse(
+        exportacion.csv_en_flujo(datos, request.GET),
+        content_type='text/csv; charset=utf-8'
     )
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
 
 
-    # Espacio
-    y = height - 4.5 * cm
+# ==================== MÉTRICAS ====================
 
-    # Encabezados de tabla
-    data = [
-        [
-            "Código",
-            "Título",
-            "Autor",
-            "Categoría",
-            "Año",
-            "Disponible"
-        ]
-    ]
+LOCALES = ('127.0.0.1', '::1')
 
-    # Obtener libros
-    libros = Libro.objects.all()
-
-    for libro in libros:
-        data.append([
-            libro.codigo_inventario,
-            libro.titulo[:40],  # evitar textos muy largos
-            libro.autor,
-            libro.get_categoria_display(),
-            libro.publicacion,
-            "Sí" if libro.disponible else "No"
-        ])
-
-    # Crear tabla
-    table = Table(data, colWidths=[3*cm, 5*cm, 4*cm, 3*cm, 2*cm, 2*cm])
-
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (4, 1), (5, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-    ]))
-
-    # Dibujar tabla
-    table.wrapOn(p, width, height)
-    table.drawOn(p, 2 * cm, height - 6 * cm)
-
-    # Finalizar PDF
-    p.showPage()
-    p.save()
 
-    return response
+def metricas_vistas(request):
+    """Consultas y tiempos por vista de este proceso (solo desde el servidor o para staff)"""
+    if request.META.get('REMOTE_ADDR') not in LOCALES and not request.user.is_staff:
+        return HttpResponseForbidden('Solo disponible localmente.')
+    return JsonResponse({'vistas': metricas.resumen()})
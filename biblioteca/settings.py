@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'app1.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,13 +51,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app1.memo.MemoPeticionMiddleware',
+    'app1.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'biblioteca.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (app1.metricas)
+        'BACKEND': 'app1.metricas.PlantillasMedidas',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,11 +79,119 @@ WSGI_APPLICATION = 'biblioteca.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+#
+# SQLite (db.sqlite3) por omisión. Para pasar del límite de un solo
+# escritor de SQLite, DB_ENGINE elige otro motor y los datos de conexión
+# salen de DB_NAME, DB_USER, DB_PASSWORD, DB_HOST y DB_PORT:
+# - mysql: MySQL 8 o MariaDB con mysql-connector-python (requirements.txt);
+# - postgresql: PostgreSQL con psycopg; el pool necesita psycopg[pool];
+# - o la ruta de cualquier backend (django.db.backends.mysql para mysqlclient).
+# Las diferencias de índices y búsqueda de texto entre motores las resuelve
+# la migración 0012_indices_por_motor y app1/busqueda.py.
+# Ejemplo: DB_ENGINE=mysql DB_NAME=biblioteca DB_USER=biblioteca DB_PASSWORD=... DB_HOST=127.0.0.1
+
+MOTORES_BD = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'mysql': 'mysql.connector.django',
+    'postgresql': 'django.db.backends.postgresql',
+}
+MOTOR_BD = MOTORES_BD.get(os.environ.get('DB_ENGINE', 'sqlite'), os.environ.get('DB_ENGINE'))
+
+# SQLite con varios workers de gunicorn:
+# - WAL: los lectores no bloquean al que escribe ni al revés, y con
+#   synchronous=NORMAL cada commit no espera a fsync (solo los checkpoints).
+# - BEGIN IMMEDIATE: la transacción pide el candado de escritura al empezar.
+#   Una transacción diferida que lee y luego escribe falla con "database is
+#   locked" sin esperar, porque otro ya escribe y su lectura quedó vieja.
+# - timeout: segundos que una conexión espera el candado (busy_timeout)
+#   antes de fallar.
+# - mmap_size y cache_size: lecturas sin copiar páginas y 64 MB de caché
+#   por conexión.
+# El comando estresar_circulacion mide préstamos y devoluciones por
+# segundo con varios procesos.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negativo: en KiB
+}
+
+if MOTOR_BD == MOTORES_BD['sqlite']:
+    DATABASES = {
+        'default': {
+            'ENGINE': MOTOR_BD,
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {pragma}={valor}' for pragma, valor in SQLITE_PRAGMAS.items()),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': MOTOR_BD,
+            'NAME': os.environ.get('DB_NAME', 'biblioteca'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'OPTIONS': {},
+        }
+    }
+
+# Conexiones persistentes: cada worker reutiliza su conexión entre
+# peticiones (en MySQL hace las veces de pool) y la revisa antes de usarla
+# por si el servidor la cerró.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 300))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+if 'mysql' in MOTOR_BD:
+    DATABASES['default']['OPTIONS'] = {'charset': 'utf8mb4'}
+    # Intercalación sin acentos ni mayúsculas, también para la base de pruebas
+    # (en MariaDB, DB_COLLATION=utf8mb4_unicode_ci)
+    DATABASES['default']['TEST'] = {
+        'CHARSET': 'utf8mb4',
+        'COLLATION': os.environ.get('DB_COLLATION', 'utf8mb4_0900_ai_ci'),
+    }
+    # MySQL no tiene índices parciales; 0012_indices_por_motor crea los equivalentes
+    SILENCED_SYSTEM_CHECKS = ['models.W036', 'models.W037']
+elif 'postgresql' in MOTOR_BD and int(os.environ.get('DB_POOL', 10)):
+    # Pool de psycopg compartido por los hilos del worker (DB_POOL=0 lo apaga)
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {'min_size': 2, 'max_size': int(os.environ.get('DB_POOL', 10)), 'timeout': 10},
+    }
+    # Con pool Django no admite conexiones persistentes: las guarda el pool
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Réplica de lectura (app1/replicas.py): listas, tablero, exportaciones y
+# reportes leen de ella. Mismo motor y opciones que la primaria; se activa
+# con DB_REPLICA_NAME (otro archivo en SQLite, que copiar_replica mantiene)
+# o DB_REPLICA_HOST. Quien escribe lee de la primaria los siguientes
+# REPLICA_RETRASO_MAXIMO segundos, que deben cubrir el atraso de la réplica.
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default'].get('PORT', '')),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['app1.replicas.Enrutador']
+REPLICA_RETRASO_MAXIMO = 15
 
-DATABASES = {
+# Cache
+# Compartida en disco para que todos los workers de gunicorn vean las mismas
+# versiones (configuración del sistema, conteos de las listas).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
     }
 }
 
@@ -120,3 +233,30 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# collectstatic guarda los estáticos con hash en el nombre y sus variantes
+# .gz/.br (app1.archivos); hay que correrlo en cada despliegue:
+#
+#   python manage.py collectstatic --noinput
+#
+# Sin él las páginas cargan igual, pero enlazan los estáticos sin hash y
+# /static/ responde 404 hasta que STATIC_ROOT tenga los archivos
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'app1.archivos.ManifestComprimido',
+    },
+}
+
+# El historial de movimientos se escribe en segundo plano (app1.bitacora);
+# con True se escribe en la misma transacción (pruebas, scripts)
+BITACORA_SINCRONA = False
+
+# Días que los movimientos se quedan en el historial activo antes de que
+# archivar_historial los pase a la tabla de archivo
+HISTORIAL_DIAS_ACTIVO = 180
+
+# Consultas y tiempos por vista: cabecera Server-Timing y /metricas/
+METRICAS_ACTIVAS = True
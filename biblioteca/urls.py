@@ -1,16 +1,19 @@
 # proyectoFinal/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from app1 import archivos
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('app1.urls')),
 ]
 
-# Para servir archivos media en desarrollo
+# Estáticos y portadas servidos por Django (con DEBUG, runserver sirve los
+# estáticos directamente desde las apps)
 
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+urlpatterns += [
+    re_path(r'^%s(?P<ruta>.*)$' % settings.STATIC_URL.lstrip('/'), archivos.servir_estatico),
+    re_path(r'^%s(?P<ruta>.*)$' % settings.MEDIA_URL.lstrip('/'), archivos.servir_media),
+]